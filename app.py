@@ -1,8 +1,22 @@
 import streamlit as st
+import functools
+import uuid
 from datetime import datetime, timedelta
 import flight_data
+import seat_inventory
+import seat_assign
+import pnr_allocator
+import ticket_worker
+import ticket_cache
 import pricing
+import fare_calendar
+import flight_results
+import round_trips
+import search_cache
+import seat_map
+import storage
 import utils
+import db
 
 # Page Configuration
 st.set_page_config(
@@ -12,6 +26,15 @@ st.set_page_config(
     initial_sidebar_state="collapsed"
 )
 
+# Apply schema migrations once per process, never on the checkout path,
+# and start replaying any bookings journaled while the database was down
+@st.cache_resource
+def bootstrap_db():
+    db.get_journal()
+    return db.init_db()
+
+bootstrap_db()
+
 # Load CSS
 with open("styles.css") as f:
     st.markdown(f"<style>{f.read()}</style>", unsafe_allow_html=True)
@@ -19,6 +42,8 @@ with open("styles.css") as f:
 # Session State Initialization
 if 'step' not in st.session_state:
     st.session_state.step = 1
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
 if 'booking_data' not in st.session_state:
     st.session_state.booking_data = {
         'departure_city': 'Hyderabad (HYD)',
@@ -27,13 +52,150 @@ if 'booking_data' not in st.session_state:
         'return_date': datetime.now().date() + timedelta(days=4),
         'passengers': {'adults': 1, 'children': 0, 'infants': 0},
         'travel_class': 'Economy',
-        'selected_outbound': None,
-        'selected_return': None,
+        # Selected flights are kept as IDs plus the price quoted at selection;
+        # the Flight records themselves stay in the shared search cache
+        'outbound_flight_id': None,
+        'return_flight_id': None,
+        'quoted_prices': {'outbound': None, 'return': None},
         'passenger_details': [],
         'seats': {'outbound': [], 'return': []},
         'addons': {'meals': [], 'baggage': [], 'insurance': False}
     }
 
+# Flights come from the persistent inventory (or the deterministic generator without a database)
+# through one size-bounded, expiring cache shared by every session; the next
+# days of each route are loaded in the background at startup
+@st.cache_resource
+def get_search_cache():
+    flights_cache = search_cache.FlightSearchCache(functools.partial(db.get_flights, quiet=True))
+    flights_cache.start_warmup([("HYD", "GOI"), ("GOI", "HYD")])
+    return flights_cache
+
+def get_flights(from_city, to_city, date):
+    return get_search_cache().get(from_city, to_city, date)
+
+def get_flight(fid):
+    """A Flight by ID, from the same cached schedule as the results list."""
+    _, from_city, to_city, day = flight_data.parse_flight_id(fid)
+    return next((f for f in get_flights(from_city, to_city, day.date()) if f.id == fid), None)
+
+def checkout_booking_data():
+    """booking_data with the selected Flights resolved, as db.save_booking and the ticket renderer expect."""
+    data = st.session_state.booking_data
+    return {**data, 'selected_outbound': get_flight(data['outbound_flight_id']),
+            'selected_return': get_flight(data['return_flight_id'])}
+
+# Process-wide fare calendar, fed from the same cached schedules as the results list
+@st.cache_resource
+def get_fare_calendar():
+    return fare_calendar.FareCalendar(get_flights)
+
+# Shared seat inventory: holds are visible across sessions and expire in the background.
+# It is per process; saving a booking claims its seats in the database (see seat_inventory)
+@st.cache_resource
+def get_seat_inventory():
+    layout = seat_inventory.SeatLayout()
+    inv = seat_inventory.SeatInventory(
+        layout,
+        loader=lambda flight_id: seat_inventory.presold_seats(flight_id, layout) + db.booked_seats(flight_id)
+    )
+    inv.start_sweeper()
+    return inv
+
+# Unique PNRs from per-process blocks of a database sequence
+@st.cache_resource
+def get_pnr_allocator():
+    return pnr_allocator.PnrAllocator(db.reserve_pnr_block)
+
+# Ticket PDFs render on a process pool, off the checkout request path;
+# rendered tickets are kept on disk so reruns and re-downloads skip FPDF
+@st.cache_resource
+def get_ticket_renderer():
+    return ticket_worker.TicketRenderer(cache=ticket_cache.TicketCache())
+
+@st.fragment(run_every=1)
+def wait_for_ticket(pnr):
+    """Polls the renderer; rerunning the page once the PDF is done stops the polling."""
+    renderer = get_ticket_renderer()
+    if renderer.result(pnr) is not None or renderer.error(pnr) is not None:
+        st.rerun()
+    st.info("Preparing your e-ticket PDF...")
+
+def render_ticket_download(pnr):
+    """The ticket download button, or a polling placeholder while the PDF renders."""
+    renderer = get_ticket_renderer()
+    pdf_bytes = renderer.result(pnr)
+    if renderer.error(pnr) is not None:
+        st.error(f"Could not render your ticket: {renderer.error(pnr)}")
+        return
+    if pdf_bytes is None:
+        wait_for_ticket(pnr)
+        return
+    # Sent once with the page, not on every poll
+    st.download_button(
+        label="📄 Download Ticket PDF",
+        data=pdf_bytes,
+        file_name=f"SkyConnect_Ticket_{pnr}.pdf",
+        mime="application/pdf",
+        type="primary",
+        on_click="ignore"
+    )
+
+def render_fare_strip(from_city, to_city, center_date, travel_class, days_each_side=3):
+    """Cheapest fare per day around the selected date, cheapest day highlighted."""
+    start = center_date - timedelta(days=days_each_side)
+    end = center_date + timedelta(days=days_each_side)
+    fares = get_fare_calendar().lowest_fares(from_city, to_city, travel_class, start, end)
+    priced = [f['min_fare'] for f in fares if f['min_fare'] is not None]
+    if not priced:
+        return
+    cheapest = min(priced)
+    
+    cells = []
+    for f in fares:
+        is_center = f['date'] == center_date
+        is_cheapest = f['min_fare'] == cheapest
+        border = "2px solid #00529B" if is_center else "1px solid #e5e7eb"
+        color = "#059669" if is_cheapest else "#1f2937"
+        price = utils.format_currency(f['min_fare']) if f['min_fare'] is not None else "—"
+        cells.append(f"""
+            <div style="flex: 1; text-align: center; padding: 0.5rem; border: {border}; border-radius: 10px; background: white;">
+                <div style="font-size: 0.8rem; color: #6b7280;">{f['date'].strftime('%a %d %b')}</div>
+                <div style="font-weight: 600; color: {color};">{price}</div>
+            </div>""")
+    st.markdown(f"""
+        <div style="display: flex; gap: 0.5rem; margin: 0.5rem 0 1rem 0;">{''.join(cells)}</div>
+    """, unsafe_allow_html=True)
+
+def render_booking_details(booking):
+    st.markdown(f"**PNR `{booking['pnr']}`** · {booking['status']}")
+    st.caption(f"Booked {booking['booking_date']:%d %b %Y %H:%M} · {utils.format_currency(float(booking['total_amount'] or 0))}")
+    st.write(f"Outbound: {booking['outbound_flight_id']}")
+    st.write(f"Return: {booking['return_flight_id']}")
+    for p in booking['passengers']:
+        st.write(f"- {p['first_name']} {p['last_name']} · seats {p['seat_outbound']} / {p['seat_return']}")
+
+def render_manage_booking():
+    """Sidebar lookup by PNR plus a passenger's last name or the contact email/phone."""
+    with st.sidebar:
+        st.markdown("### 🔎 Manage Booking")
+        pnr = st.text_input("PNR", key="manage_pnr").strip()
+        proof = st.text_input("Last name, email or phone", key="manage_proof").strip()
+        if st.button("Find Booking", key="manage_find") and pnr and proof:
+            st.session_state.manage_lookup = (pnr, proof)
+        # Shown until either field changes, so other reruns don't clear it
+        if st.session_state.get('manage_lookup') != (pnr, proof):
+            return
+
+        if not pnr_allocator.is_pnr(pnr):
+            st.info(f"A PNR is {pnr_allocator.PNR_LENGTH} letters and digits, as shown on your ticket.")
+            return
+        booking = db.lookup_booking(pnr, proof)
+        if booking:
+            render_booking_details(booking)
+        else:
+            st.info("No booking matches that PNR and name or contact.")
+
 def next_step():
     st.session_state.step += 1
 
@@ -48,6 +210,8 @@ st.markdown("""
     </div>
 """, unsafe_allow_html=True)
 
+render_manage_booking()
+
 # Progress Indicator
 steps = ["Search", "Select Flights", "Passengers", "Seats", "Add-ons", "Payment"]
 current_step = st.session_state.step
@@ -103,6 +267,9 @@ if st.session_state.step == 1:
             infants = st.number_input("Infants (<2)", min_value=0, max_value=9, value=st.session_state.booking_data['passengers']['infants'])
     
         travel_class = st.selectbox("Class", ["Economy", "Premium Economy", "Business"], index=0 if st.session_state.booking_data['travel_class'] == "Economy" else 1 if st.session_state.booking_data['travel_class'] == "Premium Economy" else 2)
+        
+        st.markdown("**Cheapest days around your departure**")
+        render_fare_strip("HYD", "GOI", dep_date, travel_class)
     
         st.markdown("<br>", unsafe_allow_html=True)
         if st.button("Search Flights ➔", use_container_width=True):
@@ -121,91 +288,60 @@ if st.session_state.step == 1:
 elif st.session_state.step == 2:
     st.markdown("### ✈️ Select Flights")
     
-    # Generate flights (Cached to prevent randomization on rerun)
-    @st.cache_data
-    def get_flights(from_city, to_city, date):
-        return flight_data.generate_flights(from_city, to_city, date)
-
     outbound_flights = get_flights("HYD", "GOI", st.session_state.booking_data['departure_date'])
     return_flights = get_flights("GOI", "HYD", st.session_state.booking_data['return_date'])
     
+    # Price each result list in one vectorized pass instead of once per card
+    today = datetime.now().date()
+    travel_class = st.session_state.booking_data['travel_class']
+    outbound_prices = pricing.price_flights(outbound_flights, today, travel_class)
+    return_prices = pricing.price_flights(return_flights, today, travel_class)
+
+    # Best full round trips (fees and GST included), picked without pairing every flight
+    with st.expander("💡 Best round-trip combinations", expanded=True):
+        sort_label = st.radio("Sort by", ["Cheapest", "Fastest"], horizontal=True, key="round_trip_sort")
+        trips = round_trips.top_round_trips(outbound_flights, outbound_prices, return_flights, return_prices,
+                                            st.session_state.booking_data['passengers'], k=3,
+                                            sort_by="price" if sort_label == "Cheapest" else "duration")
+        if not trips:
+            st.caption("No outbound and return flights combine on these dates.")
+        for trip in trips:
+            col_trip, col_pick = st.columns([4, 1])
+            with col_trip:
+                st.markdown(
+                    f"**{trip.outbound.flight_number}** {trip.outbound.departure_time.strftime('%H:%M')} → "
+                    f"**{trip.return_flight.flight_number}** {trip.return_flight.departure_time.strftime('%H:%M')} · "
+                    f"{utils.format_duration(trip.duration)} · **{utils.format_currency(trip.total)}** total"
+                )
+            with col_pick:
+                if st.button("Select both", key=f"trip_{trip.outbound.id}_{trip.return_flight.id}", use_container_width=True):
+                    st.session_state.booking_data['outbound_flight_id'] = trip.outbound.id
+                    st.session_state.booking_data['return_flight_id'] = trip.return_flight.id
+                    st.session_state.booking_data['quoted_prices'] = {'outbound': trip.outbound_price,
+                                                                      'return': trip.return_price}
+                    st.rerun()
+
     tab1, tab2 = st.tabs(["Outbound: HYD → GOI", "Return: GOI → HYD"])
     
-    def render_flight_header():
-        st.markdown("""
-        <div style="display: grid; grid-template-columns: 2fr 1.5fr 1.5fr 1.5fr 1.5fr; gap: 1rem; padding: 0.5rem 1.5rem; color: #6b7280; font-weight: 600; font-size: 0.9rem;">
-            <div>AIRLINE</div>
-            <div style="text-align: center;">DEPARTURE</div>
-            <div style="text-align: center;">DURATION</div>
-            <div style="text-align: center;">ARRIVAL</div>
-            <div style="text-align: right;">PRICE</div>
-        </div>
-        """, unsafe_allow_html=True)
-
-    def render_flight_card(flight, selected_id, key_prefix):
-        price = pricing.calculate_price(flight['base_price'], flight, datetime.now().date(), st.session_state.booking_data['travel_class'], st.session_state.booking_data['passengers'])
-        
-        is_selected = selected_id == flight['id']
-        card_class = "flight-card flight-card-selected" if is_selected else "flight-card"
-        
-        # HTML Structure matching CSS Grid
-        card_html = f"""
-        <div class="{card_class}">
-            <div>
-                <div class="fc-airline">{flight['airline']}</div>
-                <div class="fc-sub">{flight['flight_number']}</div>
-            </div>
-            <div style="text-align: center;">
-                <div class="fc-time">{flight['departure_time'].strftime('%H:%M')}</div>
-                <div class="fc-sub">{flight['from_city']}</div>
-            </div>
-            <div style="text-align: center;">
-                <div class="fc-duration">{utils.format_duration(flight['duration'])}</div>
-                <div class="fc-sub">{flight['stops']}</div>
-            </div>
-            <div style="text-align: center;">
-                <div class="fc-time">{flight['arrival_time'].strftime('%H:%M')}</div>
-                <div class="fc-sub">{flight['to_city']}</div>
-            </div>
-            <div class="fc-price">
-                {utils.format_currency(price)}
-            </div>
-        </div>
-        """
-        st.markdown(card_html, unsafe_allow_html=True)
-        
-        if st.button("Select", key=f"{key_prefix}_{flight['id']}", type="primary" if is_selected else "secondary", use_container_width=True):
-            return flight, price
-        return None, None
+    def select_flight(leg, flight, price):
+        st.session_state.booking_data[f'{leg}_flight_id'] = flight.id
+        st.session_state.booking_data['quoted_prices'][leg] = price
 
+    # Each list is one component showing a page of results; sorting, filtering
+    # and the selection all go through it
     with tab1:
+        render_fare_strip("HYD", "GOI", st.session_state.booking_data['departure_date'], travel_class)
         st.write(f"Flights for {utils.get_day_name(st.session_state.booking_data['departure_date'])}, {st.session_state.booking_data['departure_date']}")
-        render_flight_header()
-        
-        # We need to track selection.
-        selected_out = st.session_state.booking_data.get('selected_outbound')
-        current_selected = selected_out.get('id') if selected_out else None
-        
-        for flight in outbound_flights:
-            sel_flight, sel_price = render_flight_card(flight, current_selected, "out")
-            if sel_flight:
-                st.session_state.booking_data['selected_outbound'] = sel_flight
-                st.session_state.booking_data['selected_outbound']['price'] = sel_price
-                st.rerun()
+        flight_results.render_flight_results(outbound_flights, outbound_prices,
+                                             st.session_state.booking_data['outbound_flight_id'], "results_out",
+                                             functools.partial(select_flight, 'outbound'))
 
     with tab2:
+        render_fare_strip("GOI", "HYD", st.session_state.booking_data['return_date'], travel_class)
         st.write(f"Flights for {utils.get_day_name(st.session_state.booking_data['return_date'])}, {st.session_state.booking_data['return_date']}")
-        render_flight_header()
-        
-        selected_ret = st.session_state.booking_data.get('selected_return')
-        current_selected = selected_ret.get('id') if selected_ret else None
-        
-        for flight in return_flights:
-            sel_flight, sel_price = render_flight_card(flight, current_selected, "ret")
-            if sel_flight:
-                st.session_state.booking_data['selected_return'] = sel_flight
-                st.session_state.booking_data['selected_return']['price'] = sel_price
-                st.rerun()
+        flight_results.render_flight_results(return_flights, return_prices,
+                                             st.session_state.booking_data['return_flight_id'], "results_ret",
+                                             functools.partial(select_flight, 'return'))
 
     col_prev, col_next = st.columns([1, 1])
     with col_prev:
@@ -214,15 +350,15 @@ elif st.session_state.step == 2:
             st.rerun()
     with col_next:
         # Validation
-        outbound = st.session_state.booking_data.get('selected_outbound')
-        return_flight = st.session_state.booking_data.get('selected_return')
+        outbound = st.session_state.booking_data['outbound_flight_id']
+        return_flight = st.session_state.booking_data['return_flight_id']
         
         if not outbound or not return_flight:
             st.warning("Please select both outbound and return flights.")
         else:
             # Debug info (Hidden in production, useful now)
-            # st.write(f"Selected Out: {outbound['id']}")
-            # st.write(f"Selected Ret: {return_flight['id']}")
+            # st.write(f"Selected Out: {outbound}")
+            # st.write(f"Selected Ret: {return_flight}")
             
             if st.button("Continue to Passengers ➔", type="primary"):
                 next_step()
@@ -237,7 +373,7 @@ elif st.session_state.step == 3:
         total_pax = st.session_state.booking_data['passengers']['adults'] + st.session_state.booking_data['passengers']['children']
         
         for i in range(total_pax):
-            st.markdown(f"**Passenger {i+1}**")
+            st.markdown(f"**Passenger {i+1}** ({'Adult' if i < st.session_state.booking_data['passengers']['adults'] else 'Child'})")
             c1, c2, c3 = st.columns(3)
             with c1:
                 fname = st.text_input(f"First Name", key=f"fname_{i}")
@@ -270,98 +406,31 @@ elif st.session_state.step == 4:
     
     tab1, tab2 = st.tabs(["Outbound Seats", "Return Seats"])
     
+    seat_preferences = {"No preference": None, "Window": "window", "Aisle": "aisle"}
+
     def render_seat_map(flight_type):
         st.markdown(f"**Select seats for {flight_type} flight**")
-        
-        # Column Headers
-        cols = ["A", "B", "C", "D", "E", "F"]
-        
-        # Create a header row for column labels
-        header_cols = st.columns(7) # 1 for row number, 6 for seats
-        with header_cols[0]:
-            st.write("") # Spacer
-        for idx, c in enumerate(cols):
-            with header_cols[idx+1]:
-                st.markdown(f"<div style='text-align: center; font-weight: bold; color: #666;'>{c}</div>", unsafe_allow_html=True)
-
-        # Mock seat map (6 columns: ABC - DEF)
-        rows = 10
-        
-        selected_seats = st.session_state.booking_data['seats'][flight_type]
-        
-        # Simple grid for demo
-        for r in range(1, rows + 1):
-            cols_ui = st.columns(7)
-            
-            # Row Number
-            with cols_ui[0]:
-                st.markdown(f"<div style='display: flex; align-items: center; justify-content: center; height: 45px; font-weight: bold; color: #666;'>{r}</div>", unsafe_allow_html=True)
-            
-            for idx, c in enumerate(cols):
-                seat_id = f"{r}{c}"
-                is_selected = seat_id in selected_seats
-                
-                # Mock occupied logic
-                is_occupied = (r * idx) % 7 == 0 
-                
-                # Determine button type/style via key/args, but styling is handled by CSS mostly.
-                # Streamlit buttons don't support custom classes directly easily without hacks or component.
-                # However, we can use the `type` arg for primary/secondary.
-                # But for specific colors (Red/White), we rely on our CSS targeting the button.
-                # We need to distinguish Occupied vs Available in CSS.
-                # Since we can't add classes to st.button, we might need a workaround or just rely on `disabled` state for occupied.
-                # If disabled, it gets a specific class in Streamlit we can target? 
-                # Or we use `type="primary"` for selected, `type="secondary"` for available.
-                # For occupied, we disable it.
-                
-                disabled = is_occupied
-                btn_type = "primary" if is_selected else "secondary"
-                
-                # Tooltip via help
-                tooltip = f"Seat {seat_id}"
-                if is_occupied:
-                    tooltip += " (Occupied)"
-                elif is_selected:
-                    tooltip += " (Selected)"
+        passengers = st.session_state.booking_data['passengers']
+        flight_id = st.session_state.booking_data[f'{flight_type}_flight_id']
+        selected = st.session_state.booking_data['seats'][flight_type]
+
+        # Or let the optimizer seat the party together, children beside adults
+        c_pref, c_auto = st.columns([2, 1])
+        with c_pref:
+            preference = st.selectbox("Seat preference", list(seat_preferences), key=f"seat_pref_{flight_type}")
+        with c_auto:
+            if st.button("✨ Auto-assign seats", key=f"auto_assign_{flight_type}", use_container_width=True):
+                kinds = [seat_assign.ADULT] * passengers['adults'] + [seat_assign.CHILD] * passengers['children']
+                seats = seat_assign.auto_assign(get_seat_inventory(), flight_id, st.session_state.session_id,
+                                                kinds, seat_preferences[preference])
+                if seats is None:
+                    st.warning("Not enough free seats left to seat your party.")
                 else:
-                    tooltip += " (Available)"
+                    selected[:] = seats
 
-                # We use a unique key.
-                # We use label=" " to make it a square box (styled by CSS).
-                # But wait, if we use " ", the text is empty.
-                # The user wants to "see the number" while floating. `help` does that.
-                
-                # CSS HACK: We need to target occupied seats to make them red.
-                # Streamlit disabled buttons are grey by default.
-                # We can try to inject specific CSS for this specific button ID? No, IDs are dynamic.
-                # Alternative: Use `st.markdown` with HTML/CSS for the seat map instead of `st.button`?
-                # But `st.button` handles state.
-                # Let's stick to `st.button`.
-                # We updated CSS `.seat.occupied`. But how to apply `.occupied` class to `st.button`? We can't.
-                # We can only style based on `disabled` attribute in CSS.
-                # `button:disabled` -> Red.
-                
-                with cols_ui[idx+1]:
-                    # Show seat ID on the button itself for visibility
-                    btn_label = seat_id 
-                    if is_selected:
-                        btn_label = f"{seat_id} ✓"
-                    
-                    if cols_ui[idx+1].button(btn_label, 
-                                           key=f"{flight_type}_{seat_id}", 
-                                           disabled=disabled, 
-                                           type=btn_type,
-                                           help=tooltip):
-                        if is_selected:
-                            st.session_state.booking_data['seats'][flight_type].remove(seat_id)
-                        else:
-                            # Limit selection to num passengers
-                            total_pax = st.session_state.booking_data['passengers']['adults'] + st.session_state.booking_data['passengers']['children']
-                            if len(st.session_state.booking_data['seats'][flight_type]) < total_pax:
-                                st.session_state.booking_data['seats'][flight_type].append(seat_id)
-                            else:
-                                st.warning(f"You can only select {total_pax} seats.")
-                        st.rerun()
+        # The whole cabin is one component backed by the shared seat inventory
+        seat_map.render_seat_map(get_seat_inventory(), flight_id, st.session_state.session_id, selected,
+                                 passengers['adults'] + passengers['children'], key=f"seat_map_{flight_type}")
 
     with tab1:
         render_seat_map('outbound')
@@ -425,9 +494,16 @@ elif st.session_state.step == 5:
 elif st.session_state.step == 6:
     st.markdown("### 💳 Payment & Confirmation")
     
+    # One idempotency key per checkout so a retried or double-clicked payment books only once,
+    # and one booking date, so the saved booking and its e-ticket agree
+    if 'checkout_key' not in st.session_state.booking_data:
+        st.session_state.booking_data['checkout_key'] = uuid.uuid4().hex
+        st.session_state.booking_data['booking_date'] = datetime.now()
+    
     # Calculate Totals
-    out_price = st.session_state.booking_data['selected_outbound']['price']
-    ret_price = st.session_state.booking_data['selected_return']['price']
+    checkout = checkout_booking_data()
+    out_price = st.session_state.booking_data['quoted_prices']['outbound']
+    ret_price = st.session_state.booking_data['quoted_prices']['return']
     
     addons_cost = 0
     num_pax = st.session_state.booking_data['passengers']['adults'] + st.session_state.booking_data['passengers']['children']
@@ -445,8 +521,8 @@ elif st.session_state.step == 6:
     
     with c1:
         st.markdown("#### Flight Summary")
-        st.info(f"**Outbound**: {st.session_state.booking_data['selected_outbound']['airline']} | {st.session_state.booking_data['selected_outbound']['flight_number']}")
-        st.info(f"**Return**: {st.session_state.booking_data['selected_return']['airline']} | {st.session_state.booking_data['selected_return']['flight_number']}")
+        st.info(f"**Outbound**: {checkout['selected_outbound'].airline} | {checkout['selected_outbound'].flight_number}")
+        st.info(f"**Return**: {checkout['selected_return'].airline} | {checkout['selected_return'].flight_number}")
         
         st.markdown("#### Passenger Details")
         for p in st.session_state.booking_data['passenger_details']:
@@ -470,38 +546,65 @@ elif st.session_state.step == 6:
         st.markdown("---")
         st.markdown(f"### Total: {utils.format_currency(fare_breakdown['total'])}")
         
-        if st.button("Pay & Book ➔", type="primary", use_container_width=True):
-            st.success("Booking Confirmed! 🎉")
+        confirmation = st.session_state.booking_data.get('confirmation')
+        
+        if not confirmation and st.button("Pay & Book ➔", type="primary", use_container_width=True):
+            # Lock in the selected seats on both legs (all-or-nothing), once per checkout
+            legs = [(st.session_state.booking_data[f'{leg}_flight_id'], st.session_state.booking_data['seats'][leg])
+                    for leg in ('outbound', 'return')]
+            if st.session_state.booking_data.get('seats_confirmed_for') != st.session_state.booking_data['checkout_key']:
+                if not get_seat_inventory().confirm_all(st.session_state.session_id, legs):
+                    st.error("Some of your selected seats are no longer available. Please go back and pick again.")
+                    st.stop()
+                st.session_state.booking_data['seats_confirmed_for'] = st.session_state.booking_data['checkout_key']
+            
+            # Don't wait on a database the journal knows is down: use the blocks in hand,
+            # then the offline namespace, which never collides with block PNRs
+            journal = db.get_journal()
+            allocator = get_pnr_allocator()
+            pnr = allocator.allocate(reserve=journal is None or journal.db_available) or allocator.allocate_offline()
+            
+            # Save to Database (returns the original PNR if this checkout was already booked)
+            try:
+                saved_pnr = db.save_booking(checkout, pnr, fare_breakdown,
+                                            st.session_state.booking_data['checkout_key'])
+            except storage.SeatTaken:
+                # Another process sold one of the seats: free the party's seats, pick up that sale
+                for flight_id, seats in legs:
+                    get_seat_inventory().unconfirm(flight_id, seats)
+                    get_seat_inventory().refresh(flight_id)
+                st.session_state.booking_data.pop('seats_confirmed_for', None)
+                st.error("Some of your selected seats are no longer available. Please go back and pick again.")
+                st.stop()
+            if saved_pnr:
+                pnr = saved_pnr
+                st.toast("Booking saved to database!", icon="💾")
+            
+            # Render the e-ticket in the background; the download button appears when it's ready
+            get_ticket_renderer().submit(checkout, pnr, fare_breakdown)
+            
+            confirmation = {'pnr': pnr, 'fare_breakdown': fare_breakdown}
+            st.session_state.booking_data['confirmation'] = confirmation
             st.balloons()
-            pnr = utils.generate_pnr()
+        
+        if confirmation:
+            pnr = confirmation['pnr']
+            st.success("Booking Confirmed! 🎉")
             st.markdown(f"### PNR: `{pnr}`")
             st.write("Your e-ticket has been sent to your email.")
             
             # PDF Download
-            pdf_bytes = utils.generate_ticket_pdf(st.session_state.booking_data, pnr, fare_breakdown)
-            
-            # Save to Database
-            import db
-            # Initialize DB (safe to call multiple times, checks for table existence)
-            db.init_db()
-            saved = db.save_booking(st.session_state.booking_data, pnr, fare_breakdown)
-            if saved:
-                st.toast("Booking saved to database!", icon="💾")
-            
-            st.download_button(
-                label="📄 Download Ticket PDF",
-                data=pdf_bytes,
-                file_name=f"SkyConnect_Ticket_{pnr}.pdf",
-                mime="application/pdf",
-                type="primary"
-            )
+            render_ticket_download(pnr)
             
             # Reset button
             if st.button("Book Another Flight"):
+                del st.session_state.booking_data
                 st.session_state.step = 1
                 st.rerun()
 
-    if st.button("⬅ Back"):
+    if not confirmation and st.button("⬅ Back"):
+        st.session_state.booking_data.pop('checkout_key', None)
+        st.session_state.booking_data.pop('booking_date', None)
         prev_step()
         st.rerun()
 
@@ -0,0 +1,183 @@
+"""
+Archival of old booking partitions.
+
+Bookings and passengers are partitioned by booking month (migration 9). This
+job keeps upcoming months' partitions created and moves months older than
+--keep-months out of the database: both partitions are detached, dumped to
+gzip-compressed CSV and dropped. Schedule it daily (e.g. from cron); it is a
+no-op when there is nothing to do, and a run that dies halfway is finished by
+the next one, since detached partitions are only dropped once their archive
+files are safely on disk. Their booking_keys rows are kept, so archived PNRs
+and idempotency keys are never handed out again. A --restore'd month is archived again by the next
+run unless --keep-months covers it.
+
+    python archive_bookings.py --out archive/ --keep-months 24
+    python archive_bookings.py --out archive/ --dry-run
+    python archive_bookings.py --out archive/ --restore 2024-01
+"""
+import argparse
+import gzip
+import os
+import re
+import sys
+import time
+from datetime import date
+import migrations
+
+KEEP_MONTHS = 24
+# DETACH needs a brief exclusive lock on the parent tables; give up rather than
+# queue behind a long query (and stall checkouts queued behind us)
+LOCK_TIMEOUT = "5s"
+PARTITION_RE = re.compile(r"^bookings_(\d{4})_(\d{2})$")
+
+def add_months(month, n):
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_months(conn):
+    """[(month, attached)] for every bookings_YYYY_MM table, oldest first."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT c.relname, i.inhparent IS NOT NULL
+        FROM pg_class c
+        LEFT JOIN pg_inherits i ON i.inhrelid = c.oid
+        WHERE c.relkind = 'r' AND c.relname ~ '^bookings_[0-9]{4}_[0-9]{2}$' AND pg_table_is_visible(c.oid)
+        ORDER BY c.relname;
+    """)
+    months = []
+    for name, attached in cur.fetchall():
+        year, month = PARTITION_RE.match(name).groups()
+        months.append((date(int(year), int(month), 1), attached))
+    cur.close()
+    conn.commit()
+    return months
+
+def archive_paths(out_dir, month):
+    return (os.path.join(out_dir, f"bookings_{month:%Y_%m}.csv.gz"),
+            os.path.join(out_dir, f"passengers_{month:%Y_%m}.csv.gz"))
+
+def dump_table(conn, table, path):
+    """COPYs a table to gzip-compressed CSV via a temp file; fsynced before the rename."""
+    cur = conn.cursor()
+    with open(path + ".tmp", "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            cur.copy_expert(f"COPY {table} TO STDOUT WITH (FORMAT csv, HEADER)", gz)
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(path + ".tmp", path)
+    cur.execute(f"SELECT count(*) FROM {table};")
+    rows = cur.fetchone()[0]
+    cur.close()
+    return rows
+
+def archive_month(conn, month, out_dir, attached=True):
+    """
+    Detaches, dumps and drops one month of bookings and passengers.
+    Returns (bookings archived, passengers archived).
+    """
+    bookings, passengers = f"bookings_{month:%Y_%m}", f"passengers_{month:%Y_%m}"
+    cur = conn.cursor()
+    try:
+        if attached:
+            cur.execute("SELECT set_config('lock_timeout', %s, true);", (LOCK_TIMEOUT,))
+            cur.execute(f"ALTER TABLE passengers DETACH PARTITION {passengers};")
+            cur.execute(f"ALTER TABLE bookings DETACH PARTITION {bookings};")
+            conn.commit()
+
+        bookings_path, passengers_path = archive_paths(out_dir, month)
+        counts = (dump_table(conn, bookings, bookings_path), dump_table(conn, passengers, passengers_path))
+
+        # booking_keys rows stay: archived PNRs and idempotency keys must never be reused
+        cur.execute(f"DROP TABLE {passengers}, {bookings};")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return counts
+
+def restore_month(conn, month, in_dir):
+    """Loads an archived month back into its (re-created) partitions. Returns the bookings restored."""
+    cur = conn.cursor()
+    try:
+        cur.execute("SELECT create_booking_partitions(%s, %s);", (month, month))
+        for parent, path in zip(("bookings", "passengers"), archive_paths(in_dir, month)):
+            with gzip.open(path, "rt", newline="") as f:
+                header = f.readline().strip()
+            columns = header.split(",")
+            if not all(re.fullmatch(r"\w+", c) for c in columns):
+                raise ValueError(f"{path}: unexpected header {header!r}")
+            with gzip.open(path, "rb") as f:
+                cur.copy_expert(f"COPY {parent} ({header}) FROM STDIN WITH (FORMAT csv, HEADER)", f)
+        # Keys are kept on archive; this only re-adds those of older archives, which dropped them
+        cur.execute(f"""
+            INSERT INTO booking_keys (pnr, idempotency_key, booking_date)
+            SELECT pnr, idempotency_key, booking_date FROM bookings_{month:%Y_%m}
+            ON CONFLICT DO NOTHING;
+        """)
+        cur.execute(f"SELECT count(*) FROM bookings_{month:%Y_%m};")
+        restored = cur.fetchone()[0]
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return restored
+
+def maintain(conn, out_dir, keep_months=KEEP_MONTHS, dry_run=False, progress=None):
+    """
+    Creates upcoming partitions and archives every month before the last
+    `keep_months` (the current month counts as one). Returns [(month, bookings, passengers)].
+    """
+    if keep_months < 1:
+        raise ValueError("keep_months must be at least 1")
+    if not dry_run:
+        migrations.ensure_partitions(conn)
+    cutoff = add_months(date.today().replace(day=1), 1 - keep_months)
+    os.makedirs(out_dir, exist_ok=True)
+    archived = []
+    for month, attached in partition_months(conn):
+        if month >= cutoff:
+            continue
+        counts = (None, None) if dry_run else archive_month(conn, month, out_dir, attached)
+        archived.append((month, *counts))
+        if progress:
+            progress(month, *counts)
+    return archived
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Archive old monthly booking partitions.")
+    parser.add_argument("--out", required=True, help="Archive directory")
+    parser.add_argument("--keep-months", type=int, default=KEEP_MONTHS,
+                        help="Months kept online, including the current one")
+    parser.add_argument("--dry-run", action="store_true", help="Only list the months that would be archived")
+    parser.add_argument("--restore", metavar="YYYY-MM", help="Load an archived month back instead")
+    args = parser.parse_args(argv)
+
+    conn = migrations.connect()
+    start = time.perf_counter()
+    try:
+        if args.restore:
+            month = date.fromisoformat(args.restore + "-01")
+            print(f"Restored {restore_month(conn, month, args.out):,} bookings for {month:%Y-%m}")
+            return 0
+
+        def report(month, bookings, passengers):
+            if bookings is None:
+                print(f"{month:%Y-%m}: would archive")
+            else:
+                print(f"{month:%Y-%m}: archived {bookings:,} bookings, {passengers:,} passengers")
+
+        archived = maintain(conn, args.out, args.keep_months, args.dry_run, progress=report)
+    finally:
+        conn.close()
+    if not archived:
+        print("Nothing to archive")
+    elif not args.dry_run:
+        print(f"Archived {len(archived)} month(s) in {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
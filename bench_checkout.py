@@ -0,0 +1,119 @@
+"""
+Benchmark: the full checkout write path on one machine.
+
+Each simulated session picks flights, holds and confirms seats in the shared
+seat inventory, allocates a PNR from the backend's blocks, prices the trip
+and saves the booking through the storage backend. Runs against an embedded
+SQLite file by default, or any DATABASE_URL-style URL via --url.
+
+    python bench_checkout.py [--sessions 16] [--checkouts 200]
+    python bench_checkout.py --url postgresql://... [--sslmode disable]
+"""
+import argparse
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+import db
+import migrations
+import pnr_allocator
+import pricing
+import seat_inventory
+import storage
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def first_free(layout, free_mask, n):
+    """Labels of the n lowest free seats (without listing the whole cabin)."""
+    seats = []
+    while free_mask and len(seats) < n:
+        low = free_mask & -free_mask
+        seats.append(layout.label(low.bit_length() - 1))
+        free_mask ^= low
+    return seats
+
+def make_backend(url, sslmode):
+    path = storage.sqlite_path(url)
+    if path:
+        return storage.SQLiteStorage(path)
+    backend = db.PostgresStorage(db.ConnectionPool(url, minconn=1, maxconn=20, sslmode=sslmode))
+    backend.init()
+    return backend
+
+def session(backend, inv, allocator, flights, session_id, checkouts, latencies, failures, gate):
+    rng = random.Random(session_id)
+    booking_date = datetime.now().date()
+    local, failed = [], 0
+    gate.wait()
+    for i in range(checkouts):
+        start = time.perf_counter()
+        outbound, ret = rng.choice(flights[0]), rng.choice(flights[1])
+        num_pax = rng.randint(1, 4)
+        # Seats: take the first free block; a full flight counts as a failed checkout
+        legs = []
+        for flight in (outbound, ret):
+            occupied, held, _ = inv.snapshot(flight.id, session_id)
+            free = first_free(inv.layout, inv.layout.all_mask & ~(occupied | held), num_pax)
+            legs.append((flight.id, free))
+        if any(len(seats) < num_pax for _, seats in legs) or not inv.confirm_all(session_id, legs):
+            failed += 1
+            continue
+        pnr = allocator.allocate()
+        fare = pricing.calculate_total_fare(
+            pricing.calculate_price(outbound.base_price, outbound, booking_date, "Economy", num_pax),
+            pricing.calculate_price(ret.base_price, ret, booking_date, "Economy", num_pax),
+            {'adults': num_pax, 'children': 0})
+        booking_data = {
+            'selected_outbound': outbound, 'selected_return': ret,
+            'contact': {'email': f"{session_id}@example.com", 'phone': "9999999999"},
+            'passenger_details': [{'first_name': f"P{j}", 'last_name': session_id, 'gender': "Other"}
+                                  for j in range(num_pax)],
+            'seats': {'outbound': legs[0][1], 'return': legs[1][1]},
+        }
+        backend.save_booking(db.booking_params(booking_data, pnr, fare, f"{session_id}-{i}"))
+        local.append((time.perf_counter() - start) * 1000)
+    latencies.extend(local)
+    failures.append(failed)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Storage URL (default: a temporary SQLite file)")
+    parser.add_argument("--sslmode", help="Postgres sslmode (default: DB_SSLMODE, else require)")
+    parser.add_argument("--sessions", type=int, default=16)
+    parser.add_argument("--checkouts", type=int, default=200, help="Checkouts per session")
+    args = parser.parse_args()
+
+    url = args.url or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "bench.db")
+    backend = make_backend(url, args.sslmode or migrations.load_sslmode())
+
+    day = datetime.now() + timedelta(days=7)
+    flights = (backend.get_flights("HYD", "GOI", day), backend.get_flights("GOI", "HYD", day + timedelta(days=3)))
+    inv = seat_inventory.SeatInventory(seat_inventory.SeatLayout(rows=200), loader=backend.booked_seats)
+    allocator = pnr_allocator.PnrAllocator(backend.reserve_pnr_block)
+    latencies, failures = [], []
+    gate = threading.Barrier(args.sessions + 1)
+    threads = [threading.Thread(target=session, args=(backend, inv, allocator, flights, f"s{i}", args.checkouts,
+                                                      latencies, failures, gate))
+               for i in range(args.sessions)]
+    for t in threads:
+        t.start()
+    gate.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+
+    print(f"backend: {backend.name}, sessions: {args.sessions}, checkouts: {len(latencies)} "
+          f"({sum(failures)} sold out)")
+    print(f"throughput: {len(latencies) / elapsed:,.0f} checkouts/s")
+    print(f"latency: p50 {percentile(latencies, 50):.2f} ms, p99 {percentile(latencies, 99):.2f} ms")
+    if hasattr(backend, "stats"):
+        print(f"writer: {backend.stats()}")
+    backend.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+Benchmark: flight selection rerun time, per-card widgets vs the results component.
+
+Reruns a page showing N flights (through streamlit's AppTest harness, so
+script execution and element serialization are both counted) two ways: the
+previous layout, one markdown card and one Select button per flight, and
+flight_results.render_flight_results, one component showing a page.
+
+    python bench_flight_results.py [--sizes 10 100 1000] [--reruns 20]
+"""
+import argparse
+import statistics
+import time
+from datetime import date, timedelta
+from streamlit.testing.v1 import AppTest
+import flight_data
+import pricing
+
+def per_card_page(flights, prices):
+    """The selection list as it was: a markdown card and a button per flight."""
+    import streamlit as st
+    import utils
+
+    for flight, price in zip(flights, prices):
+        st.markdown(f"""
+        <div class="flight-card">
+            <div>
+                <div class="fc-airline">{flight.airline}</div>
+                <div class="fc-sub">{flight.flight_number}</div>
+            </div>
+            <div style="text-align: center;">
+                <div class="fc-time">{flight.departure_time.strftime('%H:%M')}</div>
+                <div class="fc-sub">{flight.from_city}</div>
+            </div>
+            <div style="text-align: center;">
+                <div class="fc-duration">{utils.format_duration(flight.duration)}</div>
+                <div class="fc-sub">{flight.stops}</div>
+            </div>
+            <div style="text-align: center;">
+                <div class="fc-time">{flight.arrival_time.strftime('%H:%M')}</div>
+                <div class="fc-sub">{flight.to_city}</div>
+            </div>
+            <div class="fc-price">
+                {utils.format_currency(price)}
+            </div>
+        </div>
+        """, unsafe_allow_html=True)
+        st.button("Select", key=f"out_{flight.id}", use_container_width=True)
+
+def component_page(flights, prices):
+    import flight_results
+
+    flight_results.render_flight_results(flights, prices, None, "results_out", lambda flight, price: None)
+
+def rerun_ms(script, flights, prices, reruns):
+    """Median rerun time in ms, and the number of elements on the page."""
+    at = AppTest.from_function(script, args=(flights, prices), default_timeout=120)
+    at.run()
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return statistics.median(samples), len(at.main.children)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    day = date.today() + timedelta(days=30)
+    routes = [("HYD", f"X{i:02d}") for i in range(max(args.sizes) // 5 + 1)]
+    schedule = flight_data.generate_schedule(routes, day)
+
+    print(f"{'flights':>8} | {'per-card ms':>11} {'elements':>8} | {'component ms':>12} {'elements':>8} | speedup")
+    for n in args.sizes:
+        flights = schedule[:n]
+        prices = pricing.price_flights(flights, date.today(), "Economy")
+        before, before_elements = rerun_ms(per_card_page, flights, prices, args.reruns)
+        after, after_elements = rerun_ms(component_page, flights, prices, args.reruns)
+        print(f"{n:>8} | {before:>11.1f} {before_elements:>8} | {after:>12.1f} {after_elements:>8} | {before / after:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Benchmark: connecting-itinerary search on a synthetic national schedule.
+
+Builds a hub-and-spoke network (--hubs hubs served from every other hub, each
+of --cities spoke cities served from 2-3 hubs, plus some direct spoke pairs),
+generates two days of flights for it and times RouteNetwork construction and
+random origin/destination searches ranked by price and by duration.
+
+    python bench_itineraries.py [--cities 60] [--hubs 6] [--queries 500] [--k 10]
+"""
+import argparse
+import random
+import time
+from collections import Counter
+from datetime import date, timedelta
+import flight_data
+import itineraries
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def city_codes(n):
+    """n distinct three-letter airport codes."""
+    codes = []
+    for i in range(n):
+        a, b = divmod(i, 26)
+        codes.append(f"X{chr(65 + a % 26)}{chr(65 + b)}")
+    return codes
+
+def national_routes(cities, hubs, rng):
+    """Directed (from_city, to_city) pairs of a hub-and-spoke network."""
+    hub_codes, spokes = cities[:hubs], cities[hubs:]
+    pairs = {(a, b) for a in hub_codes for b in hub_codes if a != b}
+    for spoke in spokes:
+        for hub in rng.sample(hub_codes, rng.randint(2, 3)):
+            pairs.update([(spoke, hub), (hub, spoke)])
+    for _ in range(len(spokes)):
+        a, b = rng.sample(spokes, 2)
+        pairs.update([(a, b), (b, a)])
+    return sorted(pairs)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--cities", type=int, default=60)
+    parser.add_argument("--hubs", type=int, default=6)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    rng = random.Random(11)
+    cities = city_codes(args.cities)
+    routes = national_routes(cities, args.hubs, rng)
+    day = date.today() + timedelta(days=30)
+    # The next day too, for connections after late arrivals
+    flights = flight_data.generate_schedule(routes, day, days=2)
+
+    start = time.perf_counter()
+    network = itineraries.RouteNetwork(flights)
+    build_ms = (time.perf_counter() - start) * 1000
+    arcs = sum(hi - lo for lo, hi in network.connections)
+    print(f"{args.cities} cities, {len(routes)} routes, {len(flights) // 2:,} flights/day")
+    print(f"network of {len(network):,} flights, {arcs:,} connection arcs built in {build_ms:.0f} ms\n")
+
+    pairs = [tuple(rng.sample(cities, 2)) for _ in range(args.queries)]
+    print(f"{'sort':>9} | {'p50 ms':>7} {'p99 ms':>7} {'max ms':>7} | {'found':>6} | connections")
+    for sort_by in itineraries.SORT_KEYS:
+        latencies, found, connections = [], 0, Counter()
+        for origin, destination in pairs:
+            t0 = time.perf_counter()
+            results = network.search(origin, destination, day, k=args.k, sort_by=sort_by)
+            latencies.append((time.perf_counter() - t0) * 1000)
+            found += len(results)
+            connections.update(it.connections for it in results)
+        mix = " ".join(f"{n}:{connections[n]}" for n in sorted(connections))
+        print(f"{sort_by:>9} | {percentile(latencies, 50):>7.2f} {percentile(latencies, 99):>7.2f} "
+              f"{max(latencies):>7.2f} | {found / len(pairs):>6.1f} | {mix}")
+
+if __name__ == "__main__":
+    main()
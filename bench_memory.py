@@ -0,0 +1,87 @@
+"""
+Benchmark: memory held by flight schedules and booking sessions.
+
+Compares, with tracemalloc, the retained size of --days days of schedules on
+--routes routes as plain dicts (the previous representation), as Flight
+records and as search-cache blobs; then the per-session selection state of
+--sessions sessions, as full flight copies plus price (previous) and as
+flight IDs plus quoted prices.
+
+    python bench_memory.py [--routes 20] [--days 365] [--sessions 10000]
+"""
+import argparse
+import gc
+import tracemalloc
+from datetime import date, timedelta
+import flight_data
+import search_cache
+
+CITIES = ["DEL", "BOM", "BLR", "HYD", "MAA", "CCU", "GOI", "PNQ", "AMD", "COK"]
+
+def retained(build):
+    """(result, bytes still allocated by build() once it returns)."""
+    gc.collect()
+    tracemalloc.start()
+    result = build()
+    gc.collect()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+def schedules(routes, days):
+    start = date.today()
+    for from_city, to_city in routes:
+        for i in range(days):
+            yield flight_data.generate_flights(from_city, to_city, start + timedelta(days=i))
+
+def as_dict(flight):
+    return {name: getattr(flight, name) for name in flight_data.FLIGHT_FIELDS}
+
+def report(label, size, count, unit):
+    print(f"{label:<28} {size / 1024 / 1024:>9.2f} MB  {size / count:>8.0f} B/{unit}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--routes", type=int, default=20)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--sessions", type=int, default=10000)
+    args = parser.parse_args()
+
+    routes = [(a, b) for a in CITIES for b in CITIES if a != b][:args.routes]
+    dicts, dict_bytes = retained(lambda: [[as_dict(f) for f in day] for day in schedules(routes, args.days)])
+    count = sum(map(len, dicts))
+    del dicts
+    records, record_bytes = retained(lambda: list(schedules(routes, args.days)))
+    blobs, blob_bytes = retained(lambda: [search_cache.encode(day) for day in records])
+    del blobs
+
+    print(f"{count:,} flights ({len(routes)} routes x {args.days} days)")
+    report("dicts", dict_bytes, count, "flight")
+    report("Flight records", record_bytes, count, "flight")
+    report("search cache blobs", blob_bytes, count, "flight")
+
+    # Every search decodes its own copy of the day's flights; sessions used to
+    # keep the selected two of them, now just their IDs
+    blob = search_cache.encode(records[0])
+
+    def old_session():
+        flights = search_cache.decode(blob)
+        outbound, ret = flights[0], flights[-1]
+        return {'selected_outbound': dict(as_dict(outbound), price=outbound.base_price),
+                'selected_return': dict(as_dict(ret), price=ret.base_price)}
+
+    def new_session():
+        flights = search_cache.decode(blob)
+        outbound, ret = flights[0], flights[-1]
+        return {'outbound_flight_id': outbound.id, 'return_flight_id': ret.id,
+                'quoted_prices': {'outbound': outbound.base_price, 'return': ret.base_price}}
+
+    _, old_bytes = retained(lambda: [old_session() for _ in range(args.sessions)])
+    _, new_bytes = retained(lambda: [new_session() for _ in range(args.sessions)])
+
+    print(f"\n{args.sessions:,} sessions with a round trip selected")
+    report("flight copies + price", old_bytes, args.sessions, "session")
+    report("flight IDs + quotes", new_bytes, args.sessions, "session")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,149 @@
+"""
+Benchmark: booking insert and lookup latency as partitioned history grows.
+
+Works in a scratch schema (`bench_partitions`, dropped afterwards). Each round
+bulk-loads another --months months of synthetic booking history, then times
+checkout writes (db.write_booking_params), PNR lookups (db.read_booking)
+and contact lookups (db.FIND_BOOKINGS_SQL) against the growing tables,
+and finally once more after archiving down to --keep-months months.
+
+    python bench_partitions.py [--rounds 5] [--rows 200000] [--months 6]
+    python bench_partitions.py --url postgresql://... --sslmode disable
+"""
+import argparse
+import random
+import tempfile
+import time
+from datetime import date
+import psycopg2
+import archive_bookings
+import db
+import migrations
+
+SCHEMA = "bench_partitions"
+EMAILS = 50000   # distinct contact emails in the synthetic history
+PASSENGERS = 2   # per synthetic booking
+
+LOAD_SQL = """
+    WITH g AS (
+        SELECT i, %(start)s::timestamp + (i - %(lo)s) * %(step)s * interval '1 second' AS ts
+        FROM generate_series(%(lo)s, %(hi)s) AS i
+    ), k AS (
+        INSERT INTO booking_keys (pnr, idempotency_key, booking_date)
+        SELECT 'H' || lpad(i::text, 9, '0'), 'h' || i, ts FROM g
+    ), b AS (
+        INSERT INTO bookings (pnr, booking_date, outbound_flight_id, return_flight_id, total_amount,
+                              contact_email, contact_phone, status, idempotency_key, travel_class)
+        SELECT 'H' || lpad(i::text, 9, '0'), ts, 'F' || (i %% 997), 'F' || (i %% 991), 9000,
+               'c' || (i %% {emails}) || '@example.com', (9000000000 + i %% {emails})::text,
+               'CONFIRMED', 'h' || i, 'Economy'
+        FROM g
+    )
+    INSERT INTO passengers (pnr, booking_date, first_name, last_name, gender, seat_outbound, seat_return)
+    SELECT 'H' || lpad(i::text, 9, '0'), ts, 'First' || n, 'Last' || i, 'Other', n || 'A', n || 'B'
+    FROM g CROSS JOIN generate_series(1, {passengers}) AS n;
+""".format(emails=EMAILS, passengers=PASSENGERS)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def timed(fn, samples):
+    latencies = []
+    for i in range(samples):
+        start = time.perf_counter()
+        fn(i)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return percentile(latencies, 50), percentile(latencies, 99)
+
+def load_history(conn, first_month, months, lo, rows):
+    """Spreads `rows` bookings evenly over `months` months starting at first_month."""
+    end = archive_bookings.add_months(first_month, months)
+    step = (end - first_month).total_seconds() / rows
+    cur = conn.cursor()
+    cur.execute("SELECT create_booking_partitions(%s, %s);", (first_month, end))
+    cur.execute(LOAD_SQL, {'start': first_month, 'lo': lo, 'hi': lo + rows - 1, 'step': step})
+    conn.commit()
+    cur.execute("ANALYZE booking_keys, bookings, passengers;")
+    conn.commit()
+    cur.close()
+
+def checkout_params(i, run):
+    return {
+        'pnr': f"N{run:02d}{i:07d}", 'idempotency_key': f"n{run}-{i}",
+        'outbound_flight_id': "F1", 'return_flight_id': "F2", 'total_amount': 9000,
+        'contact_email': "new@example.com", 'contact_phone': "9999999999", 'status': "CONFIRMED",
+        'travel_class': "Economy",
+        'first_names': ["Ann", "Bo"], 'last_names': ["Lee", "Lee"], 'genders': ["Other", "Other"],
+        'seats_outbound': ["1A", "1B"], 'seats_return': ["2A", "2B"],
+    }
+
+def measure(conn, run, loaded, samples, rng):
+    """(insert, PNR lookup, email lookup) as (p50, p99) ms pairs."""
+    cur = conn.cursor()
+    insert = timed(lambda i: db.write_booking_params(conn, checkout_params(i, run)), samples)
+    pnr = timed(lambda _: db.read_booking(conn, f"H{rng.randrange(loaded):09d}"), samples)
+
+    def by_email(_):
+        cur.execute(db.FIND_BOOKINGS_SQL.format(where="lower(b.contact_email) = lower(%s)"),
+                    (f"c{rng.randrange(EMAILS)}@example.com", 20))
+        cur.fetchall()
+    email = timed(by_email, samples)
+    conn.commit()
+    cur.close()
+    return insert, pnr, email
+
+def report(label, partitions, insert, pnr, email):
+    print(f"{label:>14} {partitions:>10} | {insert[0]:>7.2f} / {insert[1]:>7.2f} | "
+          f"{pnr[0]:>6.2f} / {pnr[1]:>6.2f} | {email[0]:>6.2f} / {email[1]:>7.2f}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Postgres URL (default: DATABASE_URL / secrets.toml)")
+    parser.add_argument("--sslmode", help="Postgres sslmode (default: DB_SSLMODE, else require)")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=200000, help="History bookings loaded per round")
+    parser.add_argument("--months", type=int, default=6, help="History months loaded per round")
+    parser.add_argument("--samples", type=int, default=300, help="Timed operations per measurement")
+    parser.add_argument("--keep-months", type=int, default=archive_bookings.KEEP_MONTHS,
+                        help="Finally archive down to this many months and measure again")
+    parser.add_argument("--keep", action="store_true", help="Keep the scratch schema afterwards")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(args.url or migrations.load_db_url(), sslmode=args.sslmode or migrations.load_sslmode(),
+                            options=f"-c search_path={SCHEMA}")
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE; CREATE SCHEMA {SCHEMA};")
+    conn.commit()
+    migrations.migrate(conn)
+    migrations.ensure_partitions(conn)
+    rng = random.Random(7)
+
+    print(f"{'bookings':>14} {'partitions':>10} | {'insert p50/p99 ms':>17} | "
+          f"{'by PNR p50/p99':>15} | {'by email p50/p99':>16}")
+    try:
+        loaded = 0
+        this_month = date.today().replace(day=1)
+        for r in range(args.rounds):
+            # Each round adds older history, so the live month's partition stays small
+            first_month = archive_bookings.add_months(this_month, -args.months * (r + 1))
+            load_history(conn, first_month, args.months, loaded, args.rows)
+            loaded += args.rows
+            report(f"{loaded:,}", len(archive_bookings.partition_months(conn)),
+                   *measure(conn, r, loaded, args.samples, rng))
+
+        # Contact and seat lookups can't prune by date, so their cost follows the
+        # partition count; archival is what keeps that bounded
+        with tempfile.TemporaryDirectory() as out_dir:
+            archived = archive_bookings.maintain(conn, out_dir, args.keep_months)
+        report(f"-{len(archived)} months", len(archive_bookings.partition_months(conn)),
+               *measure(conn, args.rounds, loaded, args.samples, rng))
+    finally:
+        if not args.keep:
+            conn.rollback()
+            cur.execute(f"DROP SCHEMA {SCHEMA} CASCADE;")
+            conn.commit()
+        conn.close()
+
+if __name__ == "__main__":
+    main()
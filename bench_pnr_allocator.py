@@ -0,0 +1,90 @@
+"""
+Benchmark: PNR allocations per second, across threads and processes.
+
+Without --db the shared block source is a counter in shared memory, which
+stands in for the Postgres sequence. With --db, blocks come from
+`pnr_block_seq` via DATABASE_URL. Every run checks all PNRs are unique.
+
+    python bench_pnr_allocator.py [--processes 4] [--per-process 200000] [--db]
+"""
+import argparse
+import multiprocessing
+import threading
+import time
+import pnr_allocator
+
+def shared_block_source(counter, lock, size):
+    def reserve():
+        with lock:
+            start = counter.value
+            counter.value += size
+        return start, size
+    return reserve
+
+def db_block_source():
+    import migrations
+    conn = migrations.connect()
+    return lambda: pnr_allocator.postgres_block_source(conn)
+
+_source = None
+
+def init_worker(counter, lock, block_size, use_db):
+    # Shared-memory objects must reach pool workers through the initializer
+    global _source
+    _source = db_block_source() if use_db else shared_block_source(counter, lock, block_size)
+
+def worker(n):
+    allocator = pnr_allocator.PnrAllocator(_source)
+    start = time.perf_counter()
+    pnrs = [allocator.allocate() for _ in range(n)]
+    return pnrs, time.perf_counter() - start
+
+def run_threads(threads, per_thread, block_size):
+    counter = multiprocessing.Value('q', 0)
+    allocator = pnr_allocator.PnrAllocator(shared_block_source(counter, counter.get_lock(), block_size))
+    results = [[] for _ in range(threads)]
+
+    def alloc(i):
+        results[i] = [allocator.allocate() for _ in range(per_thread)]
+
+    ts = [threading.Thread(target=alloc, args=(i,)) for i in range(threads)]
+    start = time.perf_counter()
+    for t in ts:
+        t.start()
+    for t in ts:
+        t.join()
+    elapsed = time.perf_counter() - start
+    allocated = [p for r in results for p in r]
+    return len(allocated), len(set(allocated)), elapsed
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--processes", type=int, default=4)
+    parser.add_argument("--per-process", type=int, default=200000)
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--block-size", type=int, default=1000, help="Block size for the shared-memory source")
+    parser.add_argument("--db", action="store_true", help="Reserve blocks from Postgres")
+    args = parser.parse_args()
+
+    total, unique, elapsed = run_threads(args.threads, args.per_process // args.threads, args.block_size)
+    print(f"{args.threads} threads, 1 process: {total / elapsed:,.0f} allocations/s, {total - unique} duplicates")
+
+    counter = multiprocessing.Value('q', 0)
+    lock = multiprocessing.Lock()
+    with multiprocessing.Pool(args.processes, initializer=init_worker,
+                              initargs=(counter, lock, args.block_size, args.db)) as pool:
+        start = time.perf_counter()
+        results = pool.map(worker, [args.per_process] * args.processes)
+        elapsed = time.perf_counter() - start
+
+    allocated = [p for pnrs, _ in results for p in pnrs]
+    per_proc = [len(pnrs) / t for pnrs, t in results]
+    duplicates = len(allocated) - len(set(allocated))
+    source = "postgres sequence" if args.db else "shared-memory counter"
+    print(f"{args.processes} processes ({source}): {len(allocated) / elapsed:,.0f} allocations/s overall, "
+          f"{sum(per_proc) / len(per_proc):,.0f}/s per process, {duplicates} duplicates")
+    print(f"sample: {', '.join(allocated[:5])}")
+    assert duplicates == 0, "duplicate PNRs allocated!"
+
+if __name__ == "__main__":
+    main()
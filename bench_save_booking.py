@@ -0,0 +1,118 @@
+"""
+Benchmark: per-row booking inserts vs the single-statement db.write_booking.
+
+Reports round trips and p50/p99 commit latency for 1, 9 and 100 passengers.
+Needs a Postgres DATABASE_URL (env var or .streamlit/secrets.toml); benchmark
+rows use lowercase `bn...` PNRs and are deleted afterwards.
+
+    python bench_save_booking.py [--iterations 200]
+"""
+import argparse
+import time
+from datetime import date
+import psycopg2
+import psycopg2.extensions
+import db
+import flight_data
+import migrations
+
+PASSENGER_COUNTS = [1, 9, 100]
+
+class CountingCursor(psycopg2.extensions.cursor):
+    def execute(self, query, vars=None):
+        self.connection.round_trips += 1
+        return super().execute(query, vars)
+
+class CountingConnection(psycopg2.extensions.connection):
+    """Counts statements plus the BEGIN/COMMIT psycopg2 sends for each transaction."""
+    round_trips = 0
+
+    def cursor(self, *args, **kwargs):
+        kwargs.setdefault('cursor_factory', CountingCursor)
+        if not self.autocommit and self.get_transaction_status() == psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+            self.round_trips += 1  # BEGIN
+        return super().cursor(*args, **kwargs)
+
+    def commit(self):
+        self.round_trips += 1
+        return super().commit()
+
+def make_booking(num_pax):
+    seats = [f"{r}{c}" for r in range(1, 40) for c in "ABCDEF"][:num_pax]
+    booking_data = {
+        'selected_outbound': flight_data.generate_flights("HYD", "GOI", date(2026, 1, 10))[0],
+        'selected_return': flight_data.generate_flights("GOI", "HYD", date(2026, 1, 13))[0],
+        'contact': {'email': 'bench@example.com', 'phone': '9999999999'},
+        'passenger_details': [
+            {'first_name': f"First{i}", 'last_name': f"Last{i}", 'gender': 'Other'} for i in range(num_pax)
+        ],
+        'seats': {'outbound': seats, 'return': seats},
+    }
+    return booking_data, {'total': 4500 * num_pax}
+
+def legacy_write(conn, booking_data, pnr, fare_breakdown):
+    """The previous save_booking: one INSERT for the booking, one per passenger."""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT INTO bookings (pnr, outbound_flight_id, return_flight_id, total_amount, contact_email, contact_phone, status, idempotency_key)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+    """, (pnr, booking_data['selected_outbound'].id, booking_data['selected_return'].id,
+          fare_breakdown['total'], booking_data['contact']['email'], booking_data['contact']['phone'],
+          'CONFIRMED', pnr))
+    for idx, p in enumerate(booking_data['passenger_details']):
+        cur.execute("""
+            INSERT INTO passengers (pnr, first_name, last_name, gender, seat_outbound, seat_return)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (pnr, p['first_name'], p['last_name'], p['gender'],
+              booking_data['seats']['outbound'][idx], booking_data['seats']['return'][idx]))
+    conn.commit()
+    cur.close()
+
+def batched_write(conn, booking_data, pnr, fare_breakdown):
+    db.write_booking(conn, booking_data, pnr, fare_breakdown)
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def run(conn, writer, num_pax, iterations, pnr_seq):
+    booking_data, fare = make_booking(num_pax)
+    latencies = []
+    conn.round_trips = 0
+    for _ in range(iterations):
+        pnr = f"bn{next(pnr_seq):08d}"
+        start = time.perf_counter()
+        writer(conn, booking_data, pnr, fare)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return conn.round_trips / iterations, percentile(latencies, 50), percentile(latencies, 99)
+
+def cleanup(conn):
+    cur = conn.cursor()
+    cur.execute("DELETE FROM passengers WHERE pnr LIKE 'bn%';")
+    cur.execute("DELETE FROM bookings WHERE pnr LIKE 'bn%';")
+    cur.execute("DELETE FROM booking_keys WHERE pnr LIKE 'bn%';")
+    conn.commit()
+    cur.close()
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(migrations.load_db_url(), sslmode=migrations.load_sslmode(),
+                            connection_factory=CountingConnection)
+    migrations.migrate(conn)
+    pnr_seq = iter(range(10 ** 8))
+
+    print(f"{'passengers':>10} {'writer':>8} {'round trips':>12} {'p50 ms':>8} {'p99 ms':>8}")
+    try:
+        for num_pax in PASSENGER_COUNTS:
+            for name, writer in [("per-row", legacy_write), ("batched", batched_write)]:
+                trips, p50, p99 = run(conn, writer, num_pax, args.iterations, pnr_seq)
+                print(f"{num_pax:>10} {name:>8} {trips:>12.0f} {p50:>8.2f} {p99:>8.2f}")
+    finally:
+        cleanup(conn)
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+"""
+Benchmark: seating 200 parties onto one flight, first free seats vs seat_assign.
+
+Books a stream of random parties (sizes 1-8, some with children, some with a
+window/aisle preference) one after another onto a partly presold wide-body,
+two ways: the previous simplification, the first free seats in cabin order,
+and seat_assign.assign_seats. Reports time per party and how well each party
+ended up seated.
+
+    python bench_seat_assign.py [--groups 200] [--rows 60] [--seed 7]
+"""
+import argparse
+import random
+import statistics
+import time
+import seat_assign
+import seat_inventory
+
+SIZES = [1, 2, 3, 4, 5, 6, 8]
+SIZE_WEIGHTS = [30, 30, 15, 12, 6, 5, 2]
+FLIGHT_ID = "AI-101-DELBOM-20261101"
+
+def first_free(layout, unavailable, kinds, preference=None):
+    """Seat labels as before: the first free seats, front to back."""
+    free = layout.all_mask & ~unavailable
+    if free.bit_count() < len(kinds):
+        return None
+    return layout.seats(free)[:len(kinds)]
+
+def random_parties(groups, rng):
+    parties = []
+    for _ in range(groups):
+        size = rng.choices(SIZES, SIZE_WEIGHTS)[0]
+        children = rng.randint(0, size // 2) if size > 1 and rng.random() < 0.4 else 0
+        kinds = [seat_assign.ADULT] * (size - children) + [seat_assign.CHILD] * children
+        parties.append((kinds, rng.choice(seat_assign.PREFERENCES)))
+    return parties
+
+def seating(layout, seats, kinds):
+    """How a party was seated (one block of seats, blocks in adjacent rows or
+    scattered), and how many of its children sit beside no adult of theirs."""
+    width = len(layout.columns)
+    index = [layout.index(seat) for seat in seats]
+    rows = sorted({i // width for i in index})
+    adults = {i for i, kind in zip(index, kinds) if kind != seat_assign.CHILD}
+
+    def beside_adult(i):
+        c = i % width
+        return (c > 0 and c not in layout.aisles and i - 1 in adults or
+                c < width - 1 and c + 1 not in layout.aisles and i + 1 in adults)
+
+    lone_children = sum(1 for i, kind in zip(index, kinds) if kind == seat_assign.CHILD and not beside_adult(i))
+    blocks = all(max(row) - min(row) == len(row) - 1
+                 for row in ([i for i in index if i // width == r] for r in rows))
+    if blocks and len(rows) == 1:
+        return "one block", lone_children
+    if blocks and rows[-1] - rows[0] == len(rows) - 1:
+        return "adjacent rows", lone_children
+    return "scattered", lone_children
+
+def run(assign, layout, presold, parties):
+    """Seats the parties in order; returns (per-party ms samples, outcome counts, lone children)."""
+    unavailable = presold
+    samples = []
+    outcomes = {"one block": 0, "adjacent rows": 0, "scattered": 0, "unseated": 0}
+    lone_children = 0
+    for kinds, preference in parties:
+        start = time.perf_counter()
+        seats = assign(layout, unavailable, kinds, preference)
+        samples.append((time.perf_counter() - start) * 1000)
+        if seats is None:
+            outcomes["unseated"] += 1
+            continue
+        unavailable |= layout.mask(seats)
+        outcome, lone = seating(layout, seats, kinds)
+        outcomes[outcome] += 1
+        lone_children += lone
+    return samples, outcomes, lone_children
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--groups", type=int, default=200)
+    parser.add_argument("--rows", type=int, default=60)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    layout = seat_inventory.SeatLayout(args.rows, "ABCDEFGHJK", aisles=(3, 7))
+    presold = layout.mask(seat_inventory.presold_seats(FLIGHT_ID, layout))
+    parties = random_parties(args.groups, random.Random(args.seed))
+    passengers = sum(len(kinds) for kinds, _ in parties)
+    print(f"{layout.num_seats} seats, {presold.bit_count()} presold; "
+          f"{args.groups} parties, {passengers} passengers")
+
+    print(f"{'method':>12} | {'total ms':>8} {'p50 ms':>7} {'p99 ms':>7} | "
+          f"{'one block':>9} {'adj rows':>8} {'scattered':>9} {'unseated':>8} | lone children")
+    for name, assign in (("first free", first_free), ("seat_assign", seat_assign.assign_seats)):
+        samples, outcomes, lone_children = run(assign, layout, presold, parties)
+        p99 = statistics.quantiles(samples, n=100)[98]
+        print(f"{name:>12} | {sum(samples):>8.1f} {statistics.median(samples):>7.3f} {p99:>7.3f} | "
+              f"{outcomes['one block']:>9} {outcomes['adjacent rows']:>8} {outcomes['scattered']:>9} "
+              f"{outcomes['unseated']:>8} | {lone_children:>13}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Benchmark: many sessions racing for the same rows of one flight.
+
+Each simulated session repeatedly tries to hold a block of adjacent seats in
+the front rows, then confirms or releases it. At the end the benchmark checks
+that no seat was confirmed twice and reports throughput and latency.
+
+    python bench_seat_inventory.py [--sessions 64] [--ops 2000]
+"""
+import argparse
+import random
+import threading
+import time
+import seat_inventory
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+def session_worker(inv, flight_id, session_id, ops, hot_rows, confirmed, latencies, counts, start_gate):
+    rng = random.Random(session_id)
+    columns = inv.layout.columns
+    local_latencies = []
+    local = {"hold_ok": 0, "hold_fail": 0, "confirmed": 0, "released": 0}
+    mine = []
+    start_gate.wait()
+    for _ in range(ops):
+        row = rng.randint(1, hot_rows)
+        size = rng.randint(1, 3)
+        col = rng.randint(0, len(columns) - size)
+        seats = [f"{row}{columns[c]}" for c in range(col, col + size)]
+
+        t0 = time.perf_counter()
+        ok = inv.hold(flight_id, session_id, seats)
+        if ok:
+            local["hold_ok"] += 1
+            # Most sessions abandon their pick; a few go on to pay
+            if rng.random() < 0.05 and inv.confirm(flight_id, session_id, seats):
+                local["confirmed"] += 1
+                mine.extend(seats)
+            else:
+                inv.release(flight_id, session_id, seats)
+                local["released"] += 1
+        else:
+            local["hold_fail"] += 1
+        local_latencies.append((time.perf_counter() - t0) * 1e6)
+
+    with counts["lock"]:
+        latencies.extend(local_latencies)
+        confirmed.extend(mine)
+        for k, v in local.items():
+            counts[k] += v
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=64)
+    parser.add_argument("--ops", type=int, default=2000, help="Attempts per session")
+    parser.add_argument("--hot-rows", type=int, default=3, help="Rows every session fights over")
+    args = parser.parse_args()
+
+    inv = seat_inventory.SeatInventory(seat_inventory.SeatLayout(rows=30), hold_ttl=0.05)
+    inv.start_sweeper(interval=0.01)
+    flight_id = "BENCH-1"
+    confirmed, latencies = [], []
+    counts = {"lock": threading.Lock(), "hold_ok": 0, "hold_fail": 0, "confirmed": 0, "released": 0}
+    gate = threading.Barrier(args.sessions + 1)
+
+    threads = [
+        threading.Thread(target=session_worker,
+                         args=(inv, flight_id, f"s{i}", args.ops, args.hot_rows, confirmed, latencies, counts, gate))
+        for i in range(args.sessions)
+    ]
+    for t in threads:
+        t.start()
+    gate.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    inv.stop_sweeper()
+
+    occupied, _, _ = inv.snapshot(flight_id)
+    duplicates = len(confirmed) - len(set(confirmed))
+    total = args.sessions * args.ops
+    print(f"sessions: {args.sessions}, attempts: {total}, hot rows: {args.hot_rows}")
+    print(f"throughput: {total / elapsed:,.0f} attempts/s")
+    print(f"latency: p50 {percentile(latencies, 50):.1f} us, p99 {percentile(latencies, 99):.1f} us")
+    print(f"holds ok/failed: {counts['hold_ok']}/{counts['hold_fail']}, "
+          f"confirmed: {counts['confirmed']}, released: {counts['released']}")
+    print(f"seats confirmed: {len(confirmed)}, occupied bits: {bin(occupied).count('1')}, "
+          f"double-booked: {duplicates}")
+    assert duplicates == 0 and bin(occupied).count("1") == len(confirmed), "seat double-booked!"
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: seat selection rerun time, per-seat buttons vs the seat map component.
+
+Reruns a page showing one cabin (through streamlit's AppTest harness, so
+script execution and element serialization are both counted) two ways: the
+previous layout, st.columns per row and one st.button per seat, and
+seat_map.render_seat_map, one component for the whole cabin.
+
+    python bench_seat_map.py [--reruns 20]
+"""
+import argparse
+import statistics
+import time
+from streamlit.testing.v1 import AppTest
+import seat_inventory
+
+CABINS = [
+    ("10 rows 3-3", seat_inventory.SeatLayout(10, "ABCDEF")),
+    ("30 rows 3-3", seat_inventory.SeatLayout(30, "ABCDEF")),
+    ("45 rows 3-4-3", seat_inventory.SeatLayout(45, "ABCDEFGHJK", aisles=(3, 7))),
+]
+FLIGHT_ID = "UK-619-HYDGOI-20261101"
+
+def per_seat_page(inv, flight_id, selected):
+    """The seat map as it was: a row of st.columns and a button per seat."""
+    import streamlit as st
+
+    layout = inv.layout
+    occupied, held_by_others, _ = inv.snapshot(flight_id, "bench")
+    unavailable = occupied | held_by_others
+    header = st.columns(len(layout.columns) + 1)
+    for idx, c in enumerate(layout.columns):
+        with header[idx + 1]:
+            st.markdown(f"<div style='text-align: center; font-weight: bold; color: #666;'>{c}</div>", unsafe_allow_html=True)
+    for r in range(1, layout.rows + 1):
+        cols_ui = st.columns(len(layout.columns) + 1)
+        with cols_ui[0]:
+            st.markdown(f"<div style='font-weight: bold; color: #666;'>{r}</div>", unsafe_allow_html=True)
+        for idx, c in enumerate(layout.columns):
+            seat_id = f"{r}{c}"
+            is_selected = seat_id in selected
+            is_occupied = bool(unavailable >> layout.index(seat_id) & 1)
+            cols_ui[idx + 1].button(f"{seat_id} ✓" if is_selected else seat_id, key=f"outbound_{seat_id}",
+                                    disabled=is_occupied, type="primary" if is_selected else "secondary",
+                                    help=f"Seat {seat_id}")
+
+def component_page(inv, flight_id, selected):
+    import seat_map
+
+    seat_map.render_seat_map(inv, flight_id, "bench", selected, 2, key="seat_map_outbound")
+
+def rerun_ms(script, inv, reruns):
+    """Median rerun time in ms."""
+    at = AppTest.from_function(script, args=(inv, FLIGHT_ID, ["1C"]), default_timeout=120)
+    at.run()
+    samples = []
+    for _ in range(reruns):
+        start = time.perf_counter()
+        at.run()
+        samples.append((time.perf_counter() - start) * 1000)
+    if at.exception:
+        raise RuntimeError(at.exception[0].message)
+    return statistics.median(samples)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--reruns", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"{'cabin':>14} {'seats':>6} | {'per-seat ms':>11} | {'component ms':>12} | speedup")
+    for name, layout in CABINS:
+        inv = seat_inventory.SeatInventory(layout, loader=lambda fid: seat_inventory.presold_seats(fid, layout))
+        before = rerun_ms(per_seat_page, inv, args.reruns)
+        after = rerun_ms(component_page, inv, args.reruns)
+        print(f"{name:>14} {layout.num_seats:>6} | {before:>11.1f} | {after:>12.1f} | {before / after:>6.1f}x")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,254 @@
+"""
+Write-behind booking journal.
+
+Every confirmed booking is appended to a local append-only file before the
+database is touched, so a booking is never lost when Postgres is down or
+slow. Appends are group-committed: a flusher thread fsyncs whatever has
+accumulated every few milliseconds and wakes all writers covered by that
+fsync, so concurrent checkouts share one disk flush.
+
+A replayer drains the journal into Postgres in batches once the database is
+reachable. Records carry the booking's idempotency key and are written with
+ON CONFLICT DO NOTHING, so replaying a record twice (after a crash, or for a
+booking that was also written directly) never creates a duplicate. Progress
+is kept in a checkpoint file next to the journal.
+"""
+import json
+import os
+import threading
+import time
+
+FSYNC_INTERVAL = 0.005   # seconds a flush waits to gather more appends
+REPLAY_INTERVAL = 5.0    # seconds between replay attempts
+REPLAY_BATCH = 100       # bookings per replay transaction
+COMPACT_BYTES = 1 << 20  # truncate a fully replayed journal once it is this large
+
+class JournalError(Exception):
+    """Raised when a booking could not be made durable in the journal."""
+
+class BookingJournal:
+    """Append-only JSON-lines journal of booking parameters (see db.booking_params)."""
+
+    def __init__(self, path, fsync_interval=FSYNC_INTERVAL):
+        self.path = path
+        self.checkpoint_path = path + ".checkpoint"
+        self.rejected_path = path + ".rejected"
+        self.fsync_interval = fsync_interval
+
+        self._lock = threading.Lock()
+        self._synced = threading.Condition(self._lock)
+        self._file = open(path, "ab")
+        self._repair_tail()
+        self._written = 0        # appends handed to the OS
+        self._durable = 0        # appends covered by an fsync
+        self._flush_error = None
+        self._stop = False
+        self._direct_keys = set()  # written straight to the DB; replay can skip them
+        self._replay_lock = threading.Lock()
+        self._flusher = threading.Thread(target=self._flush_loop, daemon=True, name="booking-journal-fsync")
+        self._flusher.start()
+        self._replayer = None
+        self._replay_stop = threading.Event()
+        self.db_available = True   # False while the database is known to be unreachable
+
+    def _repair_tail(self):
+        # A crash mid-append leaves a torn last line; it was never acknowledged, so drop it
+        size = os.path.getsize(self.path)
+        if size == 0:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(max(0, size - 65536))
+            tail = f.read()
+        if not tail.endswith(b"\n"):
+            keep = size - len(tail) + tail.rfind(b"\n") + 1
+            self._file.truncate(keep)
+            self._file.flush()
+            os.fsync(self._file.fileno())
+
+    def append(self, params):
+        """
+        Durably records a booking. Returns once the record is fsynced;
+        raises JournalError if it could not be written.
+        """
+        line = json.dumps(params, separators=(",", ":"), default=str).encode() + b"\n"
+        with self._synced:
+            if self._flush_error is not None:
+                raise JournalError(f"Booking journal unavailable: {self._flush_error}")
+            try:
+                self._file.write(line)
+            except OSError as e:
+                raise JournalError(f"Could not write booking journal: {e}") from e
+            self._written += 1
+            ticket = self._written
+            self._synced.notify_all()
+            while self._durable < ticket and self._flush_error is None:
+                self._synced.wait()
+            if self._durable < ticket:
+                raise JournalError(f"Could not sync booking journal: {self._flush_error}")
+
+    def _flush_loop(self):
+        while True:
+            with self._synced:
+                while self._written == self._durable and not self._stop:
+                    self._synced.wait()
+                if self._stop and self._written == self._durable:
+                    return
+            # Let concurrent checkouts pile in so one fsync covers them all
+            time.sleep(self.fsync_interval)
+            with self._synced:
+                target = self._written
+                try:
+                    self._file.flush()
+                except OSError as e:
+                    self._flush_error = e
+                    self._synced.notify_all()
+                    continue
+            # fsync outside the lock so new appends keep landing in the next batch
+            try:
+                os.fsync(self._file.fileno())
+                error = None
+            except OSError as e:
+                error = e
+            with self._synced:
+                if error is None:
+                    self._durable = max(self._durable, target)
+                else:
+                    self._flush_error = error
+                self._synced.notify_all()
+
+    def mark_written(self, idempotency_key):
+        """Notes that a journaled booking also reached the database directly."""
+        with self._lock:
+            self._direct_keys.add(idempotency_key)
+
+    # --- replay ---
+
+    def _checkpoint(self):
+        try:
+            with open(self.checkpoint_path) as f:
+                offset = int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+        # A checkpoint past the end means the journal was compacted before the checkpoint reset
+        return offset if offset <= os.path.getsize(self.path) else 0
+
+    def _save_checkpoint(self, offset):
+        tmp = self.checkpoint_path + ".tmp"
+        with open(tmp, "w") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.checkpoint_path)
+
+    def _read_from(self, offset, limit):
+        """Up to `limit` complete records after `offset`, as [(end_offset, params)]."""
+        records = []
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # an append still in flight
+                offset += len(line)
+                records.append((offset, json.loads(line)))
+                if len(records) >= limit:
+                    break
+        return records
+
+    def pending(self):
+        """Number of journaled bookings not yet replayed."""
+        offset = self._checkpoint()
+        with open(self.path, "rb") as f:
+            f.seek(offset)
+            return sum(1 for _ in f)
+
+    def replay(self, write_batch, batch_size=REPLAY_BATCH, unavailable=(Exception,)):
+        """
+        Drains the journal into the database. `write_batch(params_list)` must
+        write the bookings idempotently and return the params it could not write
+        (those are moved to the .rejected file). It raises one of `unavailable`
+        if the database is unreachable, which stops the replay until the next
+        attempt. Any other exception is blamed on the records: the batch is
+        retried one record at a time and the records that still fail are
+        rejected too. Returns the number of records replayed.
+        """
+        with self._replay_lock:
+            replayed = 0
+            offset = self._checkpoint()
+            while True:
+                records = self._read_from(offset, batch_size)
+                if not records:
+                    break
+                with self._lock:
+                    skip = self._direct_keys
+                todo = [p for _, p in records if p.get('idempotency_key') not in skip]
+                rejected = self._write(write_batch, todo, unavailable) if todo else []
+                if rejected:
+                    with open(self.rejected_path, "a") as f:
+                        for params in rejected:
+                            f.write(json.dumps(params, default=str) + "\n")
+                offset = records[-1][0]
+                self._save_checkpoint(offset)
+                replayed += len(records)
+            self._compact(offset)
+            return replayed
+
+    @staticmethod
+    def _write(write_batch, todo, unavailable):
+        try:
+            return write_batch(todo)
+        except unavailable:
+            raise
+        except Exception:
+            if len(todo) == 1:
+                return todo
+        rejected = []
+        for params in todo:
+            try:
+                rejected += write_batch([params])
+            except unavailable:
+                raise
+            except Exception:
+                rejected.append(params)
+        return rejected
+
+    def _compact(self, offset):
+        with self._synced:
+            if offset < COMPACT_BYTES or offset != self._file.tell() or self._written != self._durable:
+                return
+            self._file.truncate(0)
+            self._file.seek(0)
+            os.fsync(self._file.fileno())
+            self._save_checkpoint(0)
+            self._direct_keys.clear()
+
+    def _replay_loop(self, write_batch, interval, unavailable):
+        while not self._replay_stop.wait(interval):
+            try:
+                self.replay(write_batch, unavailable=unavailable)
+                self.db_available = True
+            except unavailable:
+                self.db_available = False  # still unreachable; try again next interval
+            except OSError:
+                pass  # the journal files themselves; says nothing about the database
+
+    def start_replayer(self, write_batch, interval=REPLAY_INTERVAL, unavailable=(Exception,)):
+        """
+        Starts a daemon thread replaying the journal every `interval` seconds.
+        `unavailable` are the exceptions meaning the database is unreachable (see replay).
+        """
+        if self._replayer is None or not self._replayer.is_alive():
+            self._replay_stop.clear()
+            self._replayer = threading.Thread(target=self._replay_loop, args=(write_batch, interval, unavailable),
+                                              daemon=True, name="booking-journal-replay")
+            self._replayer.start()
+        return self._replayer
+
+    def close(self):
+        self._replay_stop.set()
+        if self._replayer is not None:
+            self._replayer.join()
+        with self._synced:
+            self._stop = True
+            self._synced.notify_all()
+        self._flusher.join()
+        self._file.close()
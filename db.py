@@ -1,130 +1,769 @@
 import os
+import time
+import threading
+from datetime import datetime
+from contextlib import contextmanager
 import psycopg2
+import psycopg2.pool
 from psycopg2.extras import RealDictCursor
 import streamlit as st
+import migrations
+import pnr_allocator
+import booking_journal
+import flight_data
+import inventory
+import storage
+import cache
 
-# Helper to get connection
-def get_connection():
-    # Try to get from Streamlit secrets first (for Cloud), then env var (for local)
-    db_url = os.getenv("DATABASE_URL")
-    if not db_url and "postgres" in st.secrets:
-        # Construct from secrets if available in dictionary format
-        # Or if user put the URL string directly in secrets
-        pass
-        
-    # For simplicity, we expect DATABASE_URL env var or st.secrets["DATABASE_URL"]
-    if not db_url:
+# Pool defaults (override with env vars or st.secrets of the same name)
+DB_POOL_MIN = 1
+DB_POOL_MAX = 10
+DB_POOL_TIMEOUT = 5.0         # seconds to wait for a free connection
+DB_POOL_HEALTHCHECK_IDLE = 30.0  # ping connections idle longer than this on checkout
+DB_SSLMODE = migrations.DB_SSLMODE
+DB_CONNECT_TIMEOUT = 3        # seconds; an unreachable database fails fast instead of stalling a page
+
+class PoolTimeout(Exception):
+    """Raised when no pooled connection becomes free within the timeout."""
+
+class ConnectionPool:
+    """Thread-safe psycopg2 connection pool with health checks and metrics."""
+
+    def __init__(self, dsn, minconn=DB_POOL_MIN, maxconn=DB_POOL_MAX, timeout=DB_POOL_TIMEOUT,
+                 healthcheck_idle=DB_POOL_HEALTHCHECK_IDLE, **connect_kwargs):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("Pool size must satisfy 0 <= minconn <= maxconn and maxconn >= 1")
+        self.dsn = dsn
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.healthcheck_idle = healthcheck_idle
+        self.connect_kwargs = connect_kwargs
+
+        self._cond = threading.Condition()
+        self._idle = []        # [(conn, returned_at)] - LIFO so hot connections stay warm
+        self._in_use = set()
+        self._opening = 0      # connections being opened outside the lock
+        self._closed = False
+
+        # Metrics
+        self._waiting = 0
+        self._checkouts = 0
+        self._timeouts = 0
+        self._discarded = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+        for _ in range(minconn):
+            self._idle.append((self._connect(), time.monotonic()))
+
+    def _connect(self):
+        return psycopg2.connect(self.dsn, **self.connect_kwargs)
+
+    def _size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _is_healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if idle_for < self.healthcheck_idle:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.close()
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        self._discarded += 1
         try:
-            db_url = st.secrets["DATABASE_URL"]
-        except:
+            conn.close()
+        except Exception:
             pass
-            
-    if not db_url:
+
+    def getconn(self, timeout=None):
+        """Borrow a connection, waiting up to `timeout` seconds for one to free up."""
+        timeout = self.timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            with self._cond:
+                if self._closed:
+                    raise psycopg2.pool.PoolError("connection pool is closed")
+                self._waiting += 1
+                try:
+                    while not self._idle and self._size() >= self.maxconn:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            self._timeouts += 1
+                            raise PoolTimeout(f"No database connection available within {timeout}s")
+                        self._cond.wait(remaining)
+                finally:
+                    self._waiting -= 1
+
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use.add(conn)
+                else:
+                    conn, returned_at = None, None
+                    self._opening += 1
+
+            # Connect / health check outside the lock so other borrowers aren't blocked
+            if conn is None:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use.add(conn)
+            elif not self._is_healthy(conn, time.monotonic() - returned_at):
+                with self._cond:
+                    self._in_use.discard(conn)
+                    self._discard(conn)
+                    self._cond.notify()
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._checkouts += 1
+                self._wait_total += waited
+                self._wait_max = max(self._wait_max, waited)
+            return conn
+
+    def putconn(self, conn, close=False):
+        """Return a borrowed connection; broken or `close=True` connections are dropped."""
+        with self._cond:
+            if conn not in self._in_use:
+                raise psycopg2.pool.PoolError("connection was not borrowed from this pool")
+            self._in_use.discard(conn)
+
+            if not close and not conn.closed and not self._closed:
+                try:
+                    # Never hand out a connection mid-transaction
+                    if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                        conn.rollback()
+                except Exception:
+                    close = True
+            if close or conn.closed or self._closed:
+                self._discard(conn)
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def stats(self):
+        """Snapshot of pool metrics."""
+        with self._cond:
+            return {
+                "size": self._size(),
+                "idle": len(self._idle),
+                "in_use": len(self._in_use),
+                "waiting": self._waiting,
+                "max_size": self.maxconn,
+                "checkouts": self._checkouts,
+                "timeouts": self._timeouts,
+                "discarded": self._discarded,
+                "wait_time_total": self._wait_total,
+                "wait_time_max": self._wait_max,
+                "wait_time_avg": self._wait_total / self._checkouts if self._checkouts else 0.0,
+            }
+
+    def closeall(self):
+        """Close idle connections and stop handing out new ones."""
+        with self._cond:
+            self._closed = True
+            for conn, _ in self._idle:
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+            self._idle.clear()
+            self._cond.notify_all()
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_schema_ready = False
+_schema_lock = threading.Lock()
+
+_journal = None
+_journal_lock = threading.Lock()
+
+_storage = None
+_storage_lock = threading.Lock()
+
+BOOKING_JOURNAL_PATH = "booking_journal.log"
+BOOKING_CACHE_SIZE = 1024
+BOOKING_CACHE_TTL = 60.0    # seconds
+
+# Hot PNRs for "Manage booking"; writes in this process invalidate their entry,
+# the TTL bounds staleness from writes made by other processes
+_booking_cache = cache.TTLCache(maxsize=BOOKING_CACHE_SIZE, ttl=BOOKING_CACHE_TTL)
+
+def _setting(name, default=None):
+    """Read a setting from env vars first, then Streamlit secrets."""
+    value = os.getenv(name)
+    if value is None:
+        try:
+            value = st.secrets[name]
+        except Exception:
+            value = default
+    return value
+
+def get_db_url():
+    # We expect DATABASE_URL as an env var (for local) or in st.secrets (for Cloud)
+    return _setting("DATABASE_URL")
+
+def get_pool(quiet=False):
+    """Return the process-wide connection pool, creating it on first use."""
+    global _pool
+    if _pool is not None:
+        return _pool
+
+    with _pool_lock:
+        if _pool is None:
+            db_url = get_db_url()
+            if not db_url:
+                return None
+            try:
+                _pool = ConnectionPool(
+                    db_url,
+                    minconn=int(_setting("DB_POOL_MIN", DB_POOL_MIN)),
+                    maxconn=int(_setting("DB_POOL_MAX", DB_POOL_MAX)),
+                    timeout=float(_setting("DB_POOL_TIMEOUT", DB_POOL_TIMEOUT)),
+                    healthcheck_idle=float(_setting("DB_POOL_HEALTHCHECK_IDLE", DB_POOL_HEALTHCHECK_IDLE)),
+                    sslmode=_setting("DB_SSLMODE", DB_SSLMODE),
+                    connect_timeout=int(_setting("DB_CONNECT_TIMEOUT", DB_CONNECT_TIMEOUT)),
+                )
+            except Exception as e:
+                if not quiet:
+                    st.error(f"DB Connection Error: {e}")
+                return None
+    return _pool
+
+def init_db():
+    """
+    Bring the schema up to date (versioned migrations on Postgres).
+    Runs once per process; later calls return immediately.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return True
+
+    with _schema_lock:
+        if _schema_ready:
+            return True
+        backend = get_storage()
+        if backend is None:
+            return False
+        try:
+            backend.init()
+            _schema_ready = True
+        except Exception as e:
+            st.error(f"DB Init Error: {e}")
+    return _schema_ready
+
+# Booking + all passengers in one statement. Passenger columns arrive as parallel
+# arrays and are unnested server-side. The booking_keys row (migration 9) claims
+# the PNR and idempotency key first; ON CONFLICT makes retries with the same key
+# a no-op, and the booking and passengers take its booking_date (set by
+# booking_params, like the SQLite backend) so they land in the same monthly partition. The last column reports the PNR of an earlier write
+# (the statement snapshot predates its own insert, so it is NULL for new bookings).
+# The rollup CTEs (migration 8) fold a new booking into the dashboard aggregates
+# in the same statement, so they never drift from the bookings table; they only
+# fire when new_booking actually inserted a row. seat_claim (migration 11) claims
+# every assigned seat; a seat another booking holds fails the whole statement.
+SAVE_BOOKING_SQL = """
+    WITH new_key AS (
+        INSERT INTO booking_keys (pnr, idempotency_key, booking_date)
+        VALUES (%(pnr)s, %(idempotency_key)s, COALESCE(%(booking_date)s::timestamp, LOCALTIMESTAMP))
+        ON CONFLICT (idempotency_key) DO NOTHING
+        RETURNING pnr, booking_date
+    ), new_booking AS (
+        INSERT INTO bookings (pnr, booking_date, outbound_flight_id, return_flight_id, total_amount,
+                              contact_email, contact_phone, status, idempotency_key, travel_class)
+        SELECT new_key.pnr, new_key.booking_date, %(outbound_flight_id)s, %(return_flight_id)s, %(total_amount)s,
+               %(contact_email)s, %(contact_phone)s, %(status)s, %(idempotency_key)s, %(travel_class)s
+        FROM new_key
+        RETURNING pnr, booking_date
+    ), new_passengers AS (
+        INSERT INTO passengers (pnr, booking_date, first_name, last_name, gender, seat_outbound, seat_return)
+        SELECT new_booking.pnr, new_booking.booking_date, p.first_name, p.last_name, p.gender, p.seat_outbound, p.seat_return
+        FROM new_booking
+        CROSS JOIN unnest(%(first_names)s::varchar[], %(last_names)s::varchar[], %(genders)s::varchar[],
+                          %(seats_outbound)s::varchar[], %(seats_return)s::varchar[])
+             AS p(first_name, last_name, gender, seat_outbound, seat_return)
+        RETURNING 1
+    ), seat_claim AS (
+        INSERT INTO seat_claims (flight_id, seat, pnr)
+        SELECT leg.flight_id, leg.seat, new_booking.pnr
+        FROM new_booking
+        CROSS JOIN (SELECT %(outbound_flight_id)s::varchar, unnest(%(seats_outbound)s::varchar[])
+                    UNION ALL
+                    SELECT %(return_flight_id)s::varchar, unnest(%(seats_return)s::varchar[])) AS leg(flight_id, seat)
+        WHERE leg.flight_id IS NOT NULL AND leg.seat <> 'N/A'
+        RETURNING 1
+    ), daily_rollup AS (
+        INSERT INTO revenue_daily AS r (day, travel_class, bookings, passengers, revenue)
+        SELECT new_booking.booking_date::date, COALESCE(%(travel_class)s, 'Unknown'), 1,
+               cardinality(%(first_names)s::varchar[]), %(total_amount)s
+        FROM new_booking
+        ON CONFLICT (day, travel_class) DO UPDATE
+            SET bookings = r.bookings + 1, passengers = r.passengers + EXCLUDED.passengers,
+                revenue = r.revenue + EXCLUDED.revenue
+        RETURNING 1
+    ), flight_rollup AS (
+        -- Only the booking total is known, so each leg is credited half of it
+        INSERT INTO flight_sales AS f (flight_id, travel_class, month, bookings, seats_sold, revenue)
+        SELECT leg.flight_id, COALESCE(%(travel_class)s, 'Unknown'), date_trunc('month', new_booking.booking_date)::date,
+               1, cardinality(%(first_names)s::varchar[]), %(total_amount)s::numeric / 2
+        FROM new_booking
+        CROSS JOIN (VALUES (%(outbound_flight_id)s), (%(return_flight_id)s)) AS leg(flight_id)
+        WHERE leg.flight_id IS NOT NULL
+        ON CONFLICT (flight_id, travel_class, month) DO UPDATE
+            SET bookings = f.bookings + 1, seats_sold = f.seats_sold + EXCLUDED.seats_sold,
+                revenue = f.revenue + EXCLUDED.revenue
+        RETURNING 1
+    )
+    SELECT (SELECT pnr FROM new_booking),
+           (SELECT count(*) FROM new_passengers),
+           (SELECT pnr FROM booking_keys WHERE idempotency_key = %(idempotency_key)s);
+"""
+
+def booking_params(booking_data, pnr, fare_breakdown, idempotency_key=None):
+    """Flattens a booking into the parameters used by SAVE_BOOKING_SQL."""
+    params = {
+        'pnr': pnr,
+        # Taken here, not from the database clock, so both backends store the same local time
+        # (and the e-ticket prints the date that was stored)
+        'booking_date': booking_data.get('booking_date') or datetime.now(),
+        'outbound_flight_id': booking_data['selected_outbound'].id,
+        'return_flight_id': booking_data['selected_return'].id,
+        'total_amount': fare_breakdown['total'],
+        'contact_email': booking_data['contact']['email'],
+        'contact_phone': booking_data['contact']['phone'],
+        'status': 'CONFIRMED',
+        'idempotency_key': idempotency_key or pnr,
+        'travel_class': booking_data.get('travel_class'),
+        'first_names': [],
+        'last_names': [],
+        'genders': [],
+        'seats_outbound': [],
+        'seats_return': [],
+    }
+
+    seats_out = booking_data['seats']['outbound']
+    seats_ret = booking_data['seats']['return']
+    for idx, p in enumerate(booking_data['passenger_details']):
+        # Seats are listed in passenger order: seat_assign.auto_assign returns
+        # them that way, hand-picked seats go in the order they were picked
+        params['first_names'].append(p['first_name'])
+        params['last_names'].append(p['last_name'])
+        params['genders'].append(p['gender'])
+        params['seats_outbound'].append(seats_out[idx] if idx < len(seats_out) else "N/A")
+        params['seats_return'].append(seats_ret[idx] if idx < len(seats_ret) else "N/A")
+    return params
+
+def write_booking(conn, booking_data, pnr, fare_breakdown, idempotency_key=None):
+    """
+    Writes a booking and its passengers in a single round trip.
+    Returns (stored_pnr, created); created is False when the idempotency key
+    was already used, in which case stored_pnr is the original booking's PNR.
+    """
+    return write_booking_params(conn, booking_params(booking_data, pnr, fare_breakdown, idempotency_key))
+
+def write_booking_params(conn, params):
+    """write_booking for parameters already flattened by booking_params."""
+    params.setdefault('travel_class', None)   # journal records written before migration 8
+    params.setdefault('booking_date', None)   # ... and before booking_params set it
+    # A lone statement is atomic, so autocommit saves the BEGIN/COMMIT round trips
+    autocommit = conn.autocommit
+    conn.autocommit = True
+    try:
+        cur = conn.cursor()
+        cur.execute(SAVE_BOOKING_SQL, params)
+        inserted_pnr, _, existing_pnr = cur.fetchone()
+        cur.close()
+    finally:
+        conn.autocommit = autocommit
+
+    if inserted_pnr:
+        return inserted_pnr, True
+    if existing_pnr is None:
+        # The conflicting write committed after our statement snapshot was taken
+        cur = conn.cursor()
+        cur.execute("SELECT pnr FROM booking_keys WHERE idempotency_key = %s;", (params['idempotency_key'],))
+        existing_pnr = cur.fetchone()[0]
+        cur.close()
+        conn.commit()
+    return existing_pnr, False
+
+# Errors that say nothing about the booking itself, only that the server can't be reached
+CONNECTION_ERRORS = (psycopg2.OperationalError, psycopg2.InterfaceError)
+
+def write_booking_batch(conn, params_list):
+    """
+    Writes journaled bookings in one transaction. Bookings that fail for any
+    other reason than the connection (bad data, a PNR or seat clash) are
+    retried one by one and returned; connection errors propagate so the
+    journal keeps the whole batch for the next attempt.
+    """
+    for params in params_list:
+        params.setdefault('travel_class', None)
+        params.setdefault('booking_date', None)
+    cur = conn.cursor()
+    try:
+        for params in params_list:
+            cur.execute(SAVE_BOOKING_SQL, params)
+        conn.commit()
+        return []
+    except CONNECTION_ERRORS:
+        raise
+    except Exception:
+        conn.rollback()
+
+    rejected = []
+    for params in params_list:
+        try:
+            cur.execute(SAVE_BOOKING_SQL, params)
+            conn.commit()
+        except CONNECTION_ERRORS:
+            raise
+        except Exception:
+            conn.rollback()
+            rejected.append(params)
+    cur.close()
+    return rejected
+
+# Takes the booking_date looked up in booking_keys as a literal, so the planner
+# prunes to one month's partitions up front; a join or subquery would only prune
+# at run time, after planning every partition
+GET_BOOKING_SQL = f"""
+    SELECT {", ".join("b." + c for c in storage.BOOKING_FIELDS)}, {", ".join("p." + c for c in storage.PASSENGER_FIELDS)}
+    FROM bookings b
+    LEFT JOIN passengers p ON p.pnr = b.pnr AND p.booking_date = b.booking_date
+    WHERE b.pnr = %s AND b.booking_date = %s
+    ORDER BY p.id;
+"""
+
+def read_booking(conn, pnr):
+    """A booking with its passengers (see storage.booking_from_rows), or None."""
+    cur = conn.cursor()
+    cur.execute("SELECT booking_date FROM booking_keys WHERE pnr = %s;", (pnr,))
+    row = cur.fetchone()
+    rows = []
+    if row is not None:
+        cur.execute(GET_BOOKING_SQL, (pnr, row[0]))
+        rows = cur.fetchall()
+    cur.close()
+    conn.commit()
+    return storage.booking_from_rows(rows)
+
+# Served by idx_bookings_contact_email / idx_bookings_contact_phone (migration 7)
+FIND_BOOKINGS_SQL = """
+    SELECT b.pnr, b.booking_date, b.status, b.total_amount, b.outbound_flight_id, b.return_flight_id,
+           (SELECT count(*) FROM passengers p WHERE p.pnr = b.pnr AND p.booking_date = b.booking_date)
+    FROM bookings b
+    WHERE {where}
+    ORDER BY b.booking_date DESC, b.pnr DESC
+    LIMIT %s;
+"""
+
+class PostgresStorage(storage.Storage):
+    """Postgres backend on top of a ConnectionPool."""
+    name = "postgres"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @contextmanager
+    def _conn(self):
+        try:
+            conn = self.pool.getconn()
+        except (PoolTimeout,) + CONNECTION_ERRORS as e:
+            raise storage.StorageUnavailable(str(e)) from e
+        try:
+            yield conn
+        except CONNECTION_ERRORS as e:
+            # The connection dropped mid-statement
+            raise storage.StorageUnavailable(str(e)) from e
+        finally:
+            self.pool.putconn(conn)
+
+    def init(self):
+        with self._conn() as conn:
+            migrations.migrate(conn)
+            migrations.ensure_partitions(conn)
+
+    def save_booking(self, params):
+        with self._conn() as conn:
+            try:
+                return write_booking_params(conn, params)
+            except psycopg2.IntegrityError as e:
+                if e.diag.constraint_name == "seat_claims_pkey":
+                    raise storage.SeatTaken(e.diag.message_detail or str(e)) from e
+                raise
+
+    def replay_bookings(self, params_list):
+        with self._conn() as conn:
+            return write_booking_batch(conn, params_list)
+
+    def booked_seats(self, flight_id):
+        with self._conn() as conn:
+            cur = conn.cursor()
+            cur.execute("""
+                SELECT p.seat_outbound FROM passengers p JOIN bookings b ON b.pnr = p.pnr AND b.booking_date = p.booking_date
+                WHERE b.outbound_flight_id = %s
+                UNION ALL
+                SELECT p.seat_return FROM passengers p JOIN bookings b ON b.pnr = p.pnr AND b.booking_date = p.booking_date
+                WHERE b.return_flight_id = %s;
+            """, (flight_id, flight_id))
+            seats = [r[0] for r in cur.fetchall()]
+            cur.close()
+            conn.commit()
+            return seats
+
+    def reserve_pnr_block(self):
+        with self._conn() as conn:
+            return pnr_allocator.postgres_block_source(conn)
+
+    def get_flights(self, from_city, to_city, date):
+        with self._conn() as conn:
+            return inventory.get_flights(conn, from_city, to_city, date)
+
+    def get_booking(self, pnr):
+        with self._conn() as conn:
+            return read_booking(conn, pnr)
+
+    def find_bookings(self, email=None, phone=None, limit=20, after=None):
+        if email:
+            where, params = "lower(b.contact_email) = lower(%s)", [email]
+        elif phone:
+            where, params = "b.contact_phone = %s", [phone]
+        else:
+            raise ValueError("find_bookings needs an email or a phone number")
+        if after is not None:
+            # Keyset pagination: the row comparison is an index range scan, unlike OFFSET
+            where += " AND (b.booking_date, b.pnr) < (%s, %s)"
+            params += list(after)
+        with self._conn() as conn:
+            cur = conn.cursor()
+            cur.execute(FIND_BOOKINGS_SQL.format(where=where), params + [limit + 1])
+            rows = cur.fetchall()
+            cur.close()
+            conn.commit()
+        return storage.summary_page(rows, limit)
+
+    def close(self):
+        self.pool.closeall()
+
+def get_storage(quiet=False):
+    """
+    Return the process-wide storage backend: SQLite for a sqlite:/// DATABASE_URL,
+    otherwise Postgres on the connection pool. None if the database is unavailable.
+    """
+    global _storage
+    if _storage is not None:
+        return _storage
+
+    path = storage.sqlite_path(get_db_url())
+    if path is None:
+        pool = get_pool(quiet)
+        if pool is None:
+            return None
+    with _storage_lock:
+        if _storage is None:
+            try:
+                _storage = storage.SQLiteStorage(path) if path else PostgresStorage(pool)
+            except Exception as e:
+                if not quiet:
+                    st.error(f"DB Connection Error: {e}")
+                return None
+    return _storage
+
+def replay_bookings(params_list):
+    """Journal replay target: writes a batch through the active backend."""
+    backend = get_storage(quiet=True)
+    if backend is None:
+        raise storage.StorageUnavailable("database not configured or unreachable")
+    try:
+        return backend.replay_bookings(params_list)
+    finally:
+        for params in params_list:
+            _booking_cache.invalidate(params['pnr'])
+
+def get_journal():
+    """Return the process-wide booking journal, starting its replayer on first use."""
+    global _journal
+    if _journal is not None:
+        return _journal
+
+    with _journal_lock:
+        if _journal is None:
+            try:
+                _journal = booking_journal.BookingJournal(_setting("BOOKING_JOURNAL_PATH", BOOKING_JOURNAL_PATH))
+                _journal.start_replayer(replay_bookings, unavailable=(storage.StorageUnavailable,))
+            except OSError as e:
+                st.error(f"Booking journal unavailable: {e}")
+                return None
+    return _journal
+
+def save_booking(booking_data, pnr, fare_breakdown, idempotency_key=None):
+    """
+    Save booking details to the database.
+    Returns the stored PNR (the original one if `idempotency_key` was already used), or None.
+    Raises storage.SeatTaken if one of its seats was already sold.
+
+    The booking is journaled locally first. While the database is unreachable
+    it stays queued there and the background replayer saves it later.
+    """
+    params = booking_params(booking_data, pnr, fare_breakdown, idempotency_key)
+    journal = get_journal()
+    journaled = False
+    if journal is not None:
+        try:
+            journal.append(params)
+            journaled = True
+        except booking_journal.JournalError as e:
+            st.error(str(e))
+
+    # Don't stall checkout on a database the replayer already knows is down
+    if journaled and not journal.db_available:
+        st.warning("Database unavailable. Your booking is queued and will be saved automatically.")
+        return None
+
+    backend = get_storage()
+    if backend is None:
+        if journaled:
+            st.warning("Database unavailable. Your booking is queued and will be saved automatically.")
+        else:
+            st.warning("Database connection not available. Booking saved locally only.")
+        return None
+
+    try:
+        stored_pnr, _ = backend.save_booking(params)
+        _booking_cache.invalidate(stored_pnr)
+        if journaled:
+            journal.mark_written(params['idempotency_key'])
+        return stored_pnr
+    except storage.SeatTaken:
+        # Not a booking to retry: the caller frees the seats and the customer picks again
+        if journaled:
+            journal.mark_written(params['idempotency_key'])
+        raise
+    except storage.StorageUnavailable as e:
+        if journaled:
+            # Later checkouts go straight to the journal until the replayer gets through
+            journal.db_available = False
+            st.warning(f"Database unavailable ({e}). Your booking is queued and will be saved automatically.")
+        else:
+            st.error(f"Error saving booking to DB: {e}")
+        return None
+    except Exception as e:
+        if journaled:
+            st.warning(f"Could not save booking to DB ({e}); it is queued and will be retried.")
+        else:
+            st.error(f"Error saving booking to DB: {e}")
         return None
-        
+
+def booked_seats(flight_id):
+    """Seat labels already confirmed on a flight, from both outbound and return legs."""
+    backend = get_storage()
+    if backend is None:
+        return []
     try:
-        conn = psycopg2.connect(db_url, sslmode='require')
-        return conn
+        return backend.booked_seats(flight_id)
     except Exception as e:
-        st.error(f"DB Connection Error: {e}")
+        st.error(f"Error loading booked seats: {e}")
+        return []
+
+def reserve_pnr_block():
+    """
+    Reserves a block of PNR counters for this process; None if the database is unavailable.
+    Quiet: checkout falls back to offline PNRs and the booking journal reports the outage.
+    """
+    backend = get_storage(quiet=True)
+    if backend is None:
+        return None
+    try:
+        return backend.reserve_pnr_block()
+    except Exception:
         return None
 
-def init_db():
-    """Initialize the database tables if they don't exist."""
-    conn = get_connection()
-    if not conn:
-        return
-        
+def get_flights(from_city, to_city, date, quiet=False):
+    """Flights for one route/day from the inventory (or the deterministic generator without a database)."""
+    backend = get_storage(quiet)
+    if backend is None:
+        return flight_data.generate_flights(from_city, to_city, date)
     try:
-        cur = conn.cursor()
-        
-        # Bookings Table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                pnr VARCHAR(10) PRIMARY KEY,
-                booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                outbound_flight_id VARCHAR(50),
-                return_flight_id VARCHAR(50),
-                total_amount DECIMAL(10, 2),
-                contact_email VARCHAR(100),
-                contact_phone VARCHAR(20),
-                status VARCHAR(20)
-            );
-        """)
-        
-        # Passengers Table
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS passengers (
-                id SERIAL PRIMARY KEY,
-                pnr VARCHAR(10) REFERENCES bookings(pnr),
-                first_name VARCHAR(50),
-                last_name VARCHAR(50),
-                gender VARCHAR(20),
-                seat_outbound VARCHAR(10),
-                seat_return VARCHAR(10)
-            );
-        """)
-        
-        conn.commit()
-        cur.close()
-        conn.close()
+        return backend.get_flights(from_city, to_city, date)
+    except Exception:
+        # The generator is deterministic, so this matches what the inventory would hold
+        return flight_data.generate_flights(from_city, to_city, date)
+
+def get_booking(pnr):
+    """A booking with its passengers for "Manage booking", or None if not found."""
+    pnr = pnr.strip().upper()
+    booking = _booking_cache.get(pnr)
+    if booking is not None:
+        return booking
+    backend = get_storage()
+    if backend is None:
+        return None
+    try:
+        booking = backend.get_booking(pnr)
     except Exception as e:
-        st.error(f"DB Init Error: {e}")
+        st.error(f"Error looking up booking: {e}")
+        return None
+    if booking is not None:
+        _booking_cache.put(pnr, booking)
+    return booking
 
-def save_booking(booking_data, pnr, fare_breakdown):
-    """Save booking details to the database."""
-    conn = get_connection()
-    if not conn:
-        st.warning("Database connection not available. Booking saved locally only.")
+def _contact_matches(booking, proof):
+    """True if `proof` is a passenger's last name or the booking's contact email/phone."""
+    proof = proof.strip().casefold()
+    if not proof:
         return False
-        
-    try:
-        cur = conn.cursor()
-        
-        # Insert Booking
-        cur.execute("""
-            INSERT INTO bookings (pnr, outbound_flight_id, return_flight_id, total_amount, contact_email, contact_phone, status)
-            VALUES (%s, %s, %s, %s, %s, %s, %s)
-        """, (
-            pnr,
-            booking_data['selected_outbound']['id'],
-            booking_data['selected_return']['id'],
-            fare_breakdown['total'],
-            booking_data['contact']['email'],
-            booking_data['contact']['phone'],
-            'CONFIRMED'
-        ))
-        
-        # Insert Passengers
-        for idx, p in enumerate(booking_data['passenger_details']):
-            # Get assigned seats if available
-            seat_out = "N/A"
-            seat_ret = "N/A"
-            
-            # Simple logic: Assign seats in order (This is a simplification)
-            # In a real app, we'd map specific seats to specific passengers explicitly in the UI.
-            # Here we just take the list of selected seats and assign them 1-to-1.
-            if idx < len(booking_data['seats']['outbound']):
-                seat_out = booking_data['seats']['outbound'][idx]
-            if idx < len(booking_data['seats']['return']):
-                seat_ret = booking_data['seats']['return'][idx]
-                
-            cur.execute("""
-                INSERT INTO passengers (pnr, first_name, last_name, gender, seat_outbound, seat_return)
-                VALUES (%s, %s, %s, %s, %s, %s)
-            """, (
-                pnr,
-                p['first_name'],
-                p['last_name'],
-                p['gender'],
-                seat_out,
-                seat_ret
-            ))
-            
-        conn.commit()
-        cur.close()
-        conn.close()
+    if any((p['last_name'] or "").strip().casefold() == proof for p in booking['passengers']):
         return True
+    if (booking['contact_email'] or "").strip().casefold() == proof:
+        return True
+    digits = "".join(c for c in proof if c.isdigit())
+    phone = "".join(c for c in (booking['contact_phone'] or "") if c.isdigit())
+    return bool(digits) and digits == phone
+
+def lookup_booking(pnr, proof):
+    """
+    A booking for "Manage booking", only if `proof` is one of its passengers'
+    last names or its contact email/phone. None otherwise, so a wrong proof
+    and an unknown PNR look the same.
+    """
+    booking = get_booking(pnr)
+    if booking is None or not _contact_matches(booking, proof):
+        return None
+    return booking
+
+def find_bookings(email=None, phone=None, limit=20, after=None):
+    """
+    One page of a customer's bookings by contact email or phone, newest first.
+    Returns (summaries, next_cursor); pass next_cursor as `after` for the next page.
+    """
+    backend = get_storage()
+    if backend is None:
+        return [], None
+    try:
+        return backend.find_bookings(email=email, phone=phone, limit=limit, after=after)
     except Exception as e:
-        st.error(f"Error saving booking to DB: {e}")
-        return False
+        st.error(f"Error looking up bookings: {e}")
+        return [], None
+
+def invalidate_booking(pnr):
+    """Drops a cached booking; call after changing it outside save_booking."""
+    _booking_cache.invalidate(pnr.strip().upper())
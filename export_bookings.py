@@ -0,0 +1,176 @@
+"""
+Streaming bookings export for analytics.
+
+Rows of bookings joined with passengers are streamed through a server-side
+cursor in batches and written to CSV and/or Parquet as they arrive, so memory
+stays flat however large the tables are. Each run exports bookings made since
+the previous run's watermark and then advances it:
+
+    python export_bookings.py --out exports/                  # since last watermark
+    python export_bookings.py --out exports/ --full           # everything
+    python export_bookings.py --out exports/ --format csv
+
+The watermark (a booking_date) is only saved after the output files are
+complete, so a failed run is simply repeated by the next one.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from datetime import datetime
+import pyarrow as pa
+import pyarrow.parquet as pq
+import migrations
+
+BATCH_ROWS = 10000
+# Bookings are stamped with their transaction's start time, so one can commit
+# slightly after a later-stamped one; leave in-flight transactions for the next run
+SETTLE_SECONDS = 300
+WATERMARK_FILE = "export_watermark.json"
+
+COLUMNS = [
+    ("pnr", pa.string()),
+    ("booking_date", pa.timestamp("us")),
+    ("status", pa.string()),
+    ("total_amount", pa.decimal128(10, 2)),
+    ("outbound_flight_id", pa.string()),
+    ("return_flight_id", pa.string()),
+    ("contact_email", pa.string()),
+    ("contact_phone", pa.string()),
+    ("passenger_id", pa.int32()),
+    ("first_name", pa.string()),
+    ("last_name", pa.string()),
+    ("gender", pa.string()),
+    ("seat_outbound", pa.string()),
+    ("seat_return", pa.string()),
+]
+SCHEMA = pa.schema(COLUMNS)
+
+EXPORT_SQL = """
+    SELECT b.pnr, b.booking_date, b.status, b.total_amount, b.outbound_flight_id, b.return_flight_id,
+           b.contact_email, b.contact_phone, p.id, p.first_name, p.last_name, p.gender,
+           p.seat_outbound, p.seat_return
+    FROM bookings b
+    JOIN passengers p ON p.pnr = b.pnr AND p.booking_date = b.booking_date
+    WHERE b.booking_date > %s AND b.booking_date <= %s
+    ORDER BY b.booking_date, b.pnr, p.id;
+"""
+
+def load_watermark(path):
+    try:
+        with open(path) as f:
+            return datetime.fromisoformat(json.load(f)["booking_date"])
+    except FileNotFoundError:
+        return None
+
+def save_watermark(path, booking_date):
+    tmp = path + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump({"booking_date": booking_date.isoformat()}, f)
+    os.replace(tmp, path)
+
+def stream_rows(conn, since, until, batch_rows=BATCH_ROWS):
+    """Yields lists of up to `batch_rows` rows from a named (server-side) cursor."""
+    cur = conn.cursor(name="export_bookings")
+    cur.itersize = batch_rows
+    cur.execute(EXPORT_SQL, (since, until))
+    while True:
+        rows = cur.fetchmany(batch_rows)
+        if not rows:
+            break
+        yield rows
+    cur.close()
+
+class CsvSink:
+    def __init__(self, path):
+        self.path = path
+        self._f = open(path + ".tmp", "w", newline="")
+        self._writer = csv.writer(self._f)
+        self._writer.writerow([name for name, _ in COLUMNS])
+
+    def write(self, rows):
+        self._writer.writerows(rows)
+
+    def close(self):
+        self._f.close()
+        os.replace(self.path + ".tmp", self.path)
+
+class ParquetSink:
+    """One row group per batch; columns are dictionary-encoded and compressed."""
+
+    def __init__(self, path):
+        self.path = path
+        self._writer = pq.ParquetWriter(path + ".tmp", SCHEMA, compression="zstd")
+
+    def write(self, rows):
+        columns = list(zip(*rows))
+        self._writer.write_table(pa.Table.from_arrays(
+            [pa.array(col, type=typ) for col, (_, typ) in zip(columns, COLUMNS)], schema=SCHEMA))
+
+    def close(self):
+        self._writer.close()
+        os.replace(self.path + ".tmp", self.path)
+
+SINKS = {"csv": (CsvSink, "csv"), "parquet": (ParquetSink, "parquet")}
+
+def export(conn, out_dir, since=None, until=None, formats=("csv", "parquet"), progress=None):
+    """
+    Writes bookings with booking_date in (since, until] to `out_dir`, one file
+    per format. `until` defaults to a few minutes before now. Returns
+    (row count, until, paths); `until` is the next run's watermark.
+    """
+    since = since or datetime(1970, 1, 1)
+    if until is None:
+        cur = conn.cursor()
+        cur.execute("SELECT LOCALTIMESTAMP - make_interval(secs => %s);", (SETTLE_SECONDS,))
+        until = cur.fetchone()[0]
+        cur.close()
+    os.makedirs(out_dir, exist_ok=True)
+    stem = os.path.join(out_dir, f"bookings_{since:%Y%m%dT%H%M%S}_{until:%Y%m%dT%H%M%S}")
+    sinks = [SINKS[fmt][0](f"{stem}.{SINKS[fmt][1]}") for fmt in formats]
+
+    count = 0
+    for rows in stream_rows(conn, since, until):
+        for sink in sinks:
+            sink.write(rows)
+        count += len(rows)
+        if progress:
+            progress(count)
+    conn.commit()
+    for sink in sinks:
+        sink.close()
+    return count, until, [s.path for s in sinks]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Export bookings x passengers for analytics.")
+    parser.add_argument("--out", required=True, help="Output directory")
+    parser.add_argument("--format", default="csv,parquet", help="Comma-separated: csv, parquet")
+    parser.add_argument("--state", default=WATERMARK_FILE, help="Watermark file")
+    parser.add_argument("--full", action="store_true", help="Ignore the watermark and export everything")
+    args = parser.parse_args(argv)
+
+    formats = [f.strip() for f in args.format.split(",") if f.strip()]
+    unknown = set(formats) - set(SINKS)
+    if unknown:
+        parser.error(f"unknown format(s): {', '.join(sorted(unknown))}")
+
+    since = None if args.full else load_watermark(args.state)
+    conn = migrations.connect()
+    start = time.perf_counter()
+    try:
+        count, until, paths = export(conn, args.out, since, formats=formats,
+                                     progress=lambda n: print(f"\r{n:,} rows", end="", flush=True))
+    finally:
+        conn.close()
+    save_watermark(args.state, until)
+    elapsed = time.perf_counter() - start
+    print(f"\rExported {count:,} rows booked {since or 'ever'} .. {until} in {elapsed:.1f}s "
+          f"({count / max(elapsed, 1e-9):,.0f} rows/s)")
+    for path in paths:
+        print(f"  {path} ({os.path.getsize(path) / 1024:,.0f} KiB)")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
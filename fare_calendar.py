@@ -0,0 +1,125 @@
+"""
+Fare calendar: lowest and median fare per day for a route and class.
+
+All days in the window are priced in one vectorized pricing pass and the
+per-day stats are cached process-wide. When the booking date rolls over, only
+days whose advance-purchase bucket changed (plus newly exposed days at the end
+of the window) are recomputed. Schedules are read through `flight_source`
+(the app passes its shared search cache), so they are not stored twice.
+"""
+import threading
+from datetime import datetime, timedelta
+import numpy as np
+import flight_data
+import pricing
+
+DEFAULT_WINDOW_DAYS = 90
+
+class FareCalendar:
+    """Caches per-day fare stats for (from_city, to_city, travel_class)."""
+
+    def __init__(self, flight_source=flight_data.generate_flights, window_days=DEFAULT_WINDOW_DAYS):
+        self.flight_source = flight_source
+        self.window_days = window_days
+        self._lock = threading.Lock()  # guards the two dicts below, never held while pricing
+        self._route_locks = {}         # (from, to, class) -> Lock held while that route refreshes
+        self._routes = {}              # (from, to, class) -> {"today", "fingerprint", "days": {date: stats}}
+
+    def _schedule(self, from_city, to_city, date):
+        """(departure datetime64[m] array, base price array) for one day."""
+        flights = self.flight_source(from_city, to_city, date)
+        return (
+            pricing.as_datetime64([f.departure_time for f in flights]),
+            np.array([f.base_price for f in flights], dtype=np.float64),
+        )
+
+    def _compute(self, from_city, to_city, travel_class, dates, today):
+        """Prices every flight on `dates` in one pass and reduces to per-day stats."""
+        table = pricing.get_fare_table()
+        schedules = [self._schedule(from_city, to_city, d) for d in dates]
+        counts = np.array([len(deps) for deps, _ in schedules], dtype=np.int64)
+        stats = {}
+        if counts.sum():
+            deps = np.concatenate([deps for deps, _ in schedules])
+            bases = np.concatenate([bases for _, bases in schedules])
+            day_idx = np.repeat(np.arange(len(dates)), counts)
+            prices = pricing.calculate_prices(deps, bases, today, travel_class)
+
+            # Sort by (day, price); each day is then a contiguous, ordered run
+            order = np.lexsort((prices, day_idx))
+            sorted_prices = prices[order]
+            starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+            has_flights = counts > 0
+            safe_starts = np.where(has_flights, starts, 0)
+            mins = sorted_prices[safe_starts]
+            lo = sorted_prices[safe_starts + np.maximum(counts - 1, 0) // 2]
+            hi = sorted_prices[safe_starts + counts // 2 * has_flights]
+            medians = (lo + hi) / 2
+        for i, d in enumerate(dates):
+            entry = {
+                "date": d,
+                "bucket": table.advance_bucket((d - today).days),
+                "num_flights": int(counts[i]),
+                "min_fare": None,
+                "median_fare": None,
+            }
+            if counts[i]:
+                entry["min_fare"] = int(mins[i])
+                entry["median_fare"] = float(medians[i])
+            stats[d] = entry
+        return stats
+
+    def _refresh(self, from_city, to_city, travel_class, today, last_day):
+        """Brings one route's stats up to date; the caller holds that route's lock."""
+        key = (from_city, to_city, travel_class)
+        table = pricing.get_fare_table()
+        with self._lock:
+            route = self._routes.get(key)
+            if route is None or route["fingerprint"] != table.fingerprint:
+                route = self._routes[key] = {"today": today, "fingerprint": table.fingerprint, "days": {}}
+
+        days = route["days"]
+        if route["today"] != today:
+            # Rollover: drop past days; only days whose advance bucket moved need repricing
+            for d in [d for d in days if d < today]:
+                del days[d]
+            stale = [d for d, s in days.items() if s["bucket"] != table.advance_bucket((d - today).days)]
+            for d in stale:
+                del days[d]
+            route["today"] = today
+
+        end = max(last_day, today + timedelta(days=self.window_days - 1))
+        missing = [today + timedelta(days=i) for i in range((end - today).days + 1)]
+        missing = [d for d in missing if d not in days]
+        if missing:
+            days.update(self._compute(from_city, to_city, travel_class, missing, today))
+        return days
+
+    def lowest_fares(self, from_city, to_city, travel_class, start_date, end_date, today=None):
+        """
+        Returns [{date, min_fare, median_fare, num_flights}] for each day in
+        [start_date, end_date]; days before today are skipped.
+        """
+        today = today or datetime.now().date()
+        start_date = max(start_date, today)
+        if end_date < start_date:
+            return []
+        with self._lock:
+            route_lock = self._route_locks.setdefault((from_city, to_city, travel_class), threading.Lock())
+        # A cold start or rollover prices up to window_days of schedules; only
+        # callers for the same route wait on it
+        with route_lock:
+            days = self._refresh(from_city, to_city, travel_class, today, end_date)
+            result = []
+            d = start_date
+            while d <= end_date:
+                s = days[d]
+                result.append({k: s[k] for k in ("date", "min_fare", "median_fare", "num_flights")})
+                d += timedelta(days=1)
+            return result
+
+    def cheapest_day(self, from_city, to_city, travel_class, start_date, end_date, today=None):
+        """Returns the entry with the lowest min_fare in the range, or None."""
+        fares = [f for f in self.lowest_fares(from_city, to_city, travel_class, start_date, end_date, today)
+                 if f["min_fare"] is not None]
+        return min(fares, key=lambda f: f["min_fare"]) if fares else None
@@ -1,4 +1,7 @@
+import hashlib
 import random
+import sys
+from dataclasses import dataclass, fields
 from datetime import datetime, timedelta
 
 AIRLINES = [
@@ -9,42 +12,120 @@ AIRLINES = [
     {"name": "AirAsia", "code": "I5", "color": "#ED1C24"}
 ]
 
-def generate_flights(from_city, to_city, date):
-    """Generates mock flights for a given route and date."""
+@dataclass(frozen=True, slots=True)
+class Flight:
+    """
+    One scheduled flight. Slotted (no per-instance __dict__) and immutable,
+    so one instance can be shared by the search cache and every session.
+    """
+    id: str
+    airline: str
+    flight_number: str
+    departure_time: datetime
+    arrival_time: datetime
+    duration: int
+    stops: str
+    from_city: str
+    to_city: str
+    base_price: int
+
+FLIGHT_FIELDS = tuple(f.name for f in fields(Flight))
+
+def flight_from_row(row):
+    """Flight from a row in FLIGHT_FIELDS order; repeated strings are interned."""
+    (fid, airline, flight_number, departure_time, arrival_time, duration, stops,
+     from_city, to_city, base_price) = row
+    return Flight(fid, sys.intern(airline), flight_number, departure_time, arrival_time, duration,
+                  sys.intern(stops), sys.intern(from_city), sys.intern(to_city), base_price)
+
+# Bump to reshuffle every generated schedule
+SCHEDULE_SEED = 2024
+
+def schedule_seed(from_city, to_city, date, seed=SCHEDULE_SEED):
+    """Stable per-(route, date) seed, identical across processes (unlike hash())."""
+    if isinstance(date, datetime):
+        # A datetime's isoformat() includes the time and would seed a different schedule
+        date = date.date()
+    key = f"{seed}:{from_city}:{to_city}:{date.isoformat()}".encode()
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], "big")
+
+def flight_id(flight_number, from_city, to_city, date):
+    """Unique flight ID: the same flight number can operate other routes and days."""
+    return f"{flight_number}-{from_city}{to_city}-{date.strftime('%Y%m%d')}"
+
+def parse_flight_id(fid):
+    """Inverse of flight_id: returns (flight_number, from_city, to_city, date)."""
+    flight_number, route, day = fid.rsplit("-", 2)
+    half = len(route) // 2
+    return flight_number, route[:half], route[half:], datetime.strptime(day, "%Y%m%d")
+
+def find_flight(fid, seed=SCHEDULE_SEED):
+    """
+    Regenerates the schedule a flight ID belongs to and returns that flight,
+    or None (also for IDs that don't parse, like legacy "6E-123" ones).
+    """
+    if not fid:
+        return None
+    try:
+        _, from_city, to_city, day = parse_flight_id(fid)
+    except ValueError:
+        return None
+    return next((f for f in generate_flights(from_city, to_city, day.date(), seed) if f.id == fid), None)
+
+def generate_flights(from_city, to_city, date, seed=SCHEDULE_SEED):
+    """
+    Generates mock Flights for a given route and date.
+    The schedule is deterministic for (route, date, seed), so repeated calls
+    and other processes see the same flights.
+    """
+    rng = random.Random(schedule_seed(from_city, to_city, date, seed))
     flights = []
-    num_flights = random.randint(5, 10)
+    num_flights = rng.randint(5, 10)
     
     base_times = [6, 8, 10, 13, 16, 18, 20, 22] # Hour of day
+    used_numbers = set()
     
     for _ in range(num_flights):
-        airline = random.choice(AIRLINES)
-        flight_num = f"{airline['code']}-{random.randint(100, 999)}"
+        airline = rng.choice(AIRLINES)
+        flight_num = f"{airline['code']}-{rng.randint(100, 999)}"
+        while flight_num in used_numbers:
+            flight_num = f"{airline['code']}-{rng.randint(100, 999)}"
+        used_numbers.add(flight_num)
         
         # Random departure time based on base hours + random minutes
-        hour = random.choice(base_times)
-        minute = random.choice([0, 15, 30, 45])
+        hour = rng.choice(base_times)
+        minute = rng.choice([0, 15, 30, 45])
         dep_time = datetime.combine(date, datetime.min.time()) + timedelta(hours=hour, minutes=minute)
         
         # Duration: 1h 15m to 1h 45m for HYD-GOA usually
-        duration_mins = random.randint(75, 105)
+        duration_mins = rng.randint(75, 105)
         arr_time = dep_time + timedelta(minutes=duration_mins)
         
-        stops = random.choices(["Non-stop", "1 Stop"], weights=[0.8, 0.2])[0]
+        stops = rng.choices(["Non-stop", "1 Stop"], weights=[0.8, 0.2])[0]
         if stops == "1 Stop":
-            duration_mins += random.randint(60, 120) # Layover
+            duration_mins += rng.randint(60, 120) # Layover
             arr_time = dep_time + timedelta(minutes=duration_mins)
 
-        flights.append({
-            "id": flight_num,
-            "airline": airline["name"],
-            "flight_number": flight_num,
-            "departure_time": dep_time,
-            "arrival_time": arr_time,
-            "duration": duration_mins,
-            "stops": stops,
-            "from_city": from_city,
-            "to_city": to_city,
-            "base_price": 3500 # Base reference price, will be adjusted dynamically
-        })
+        flights.append(Flight(
+            id=flight_id(flight_num, from_city, to_city, date),
+            airline=airline["name"],
+            flight_number=flight_num,
+            departure_time=dep_time,
+            arrival_time=arr_time,
+            duration=duration_mins,
+            stops=stops,
+            from_city=from_city,
+            to_city=to_city,
+            base_price=3500 # Base reference price, will be adjusted dynamically
+        ))
         
-    return sorted(flights, key=lambda x: x['departure_time'])
+    return sorted(flights, key=lambda x: (x.departure_time, x.id))
+
+def generate_schedule(routes, start_date, days=1, seed=SCHEDULE_SEED):
+    """Flights for every (from_city, to_city) route on `days` consecutive days from start_date."""
+    flights = []
+    for i in range(days):
+        date = start_date + timedelta(days=i)
+        for from_city, to_city in routes:
+            flights.extend(generate_flights(from_city, to_city, date, seed))
+    return flights
@@ -0,0 +1,172 @@
+"""
+Flight results list for the selection step, rendered as one component.
+
+A page of results goes to the browser as a single JSON payload and is drawn
+there, instead of one markdown block and one button per flight. Sorting and
+filtering apply at once in the browser and are sent back as the list's
+`view` state, so the server sorts and filters the full result set the same
+way and only ever sends the requested page. Choosing a flight fires one
+`selected` trigger, handled by a single callback.
+"""
+import streamlit as st
+import utils
+
+PAGE_SIZE = 20
+SORTS = {
+    "price": lambda flight, price: (price, flight.departure_time),
+    "departure": lambda flight, price: (flight.departure_time, price),
+    "duration": lambda flight, price: (flight.duration, price),
+}
+DEFAULT_VIEW = {"sort": "price", "airline": "", "nonstop": False, "page": 0}
+
+HTML = '<div class="fr-root"></div>'
+
+CSS = """
+.fr-toolbar { display: flex; gap: 1rem; align-items: center; margin-bottom: 0.75rem; font-size: 0.9rem; color: #4b5563; }
+.fr-toolbar select { padding: 0.25rem 0.5rem; border-radius: 8px; border: 1px solid #e5e7eb; }
+.fr-header { display: grid; grid-template-columns: 2fr 1.5fr 1.5fr 1.5fr 1.5fr; gap: 1rem; padding: 0.5rem 1.5rem;
+             color: #6b7280; font-weight: 600; font-size: 0.9rem; }
+.fr-root .flight-card { cursor: pointer; }
+.fr-pick { margin-top: 0.25rem; font-size: 0.85rem; font-weight: 600; color: #00529B; }
+.fr-pager { display: flex; justify-content: space-between; align-items: center; color: #6b7280; }
+.fr-pager button { padding: 0.35rem 1rem; border-radius: 8px; border: 1px solid #e5e7eb; background: white; cursor: pointer; }
+.fr-pager button:disabled { opacity: 0.4; cursor: default; }
+"""
+
+JS = """
+export default function(component) {
+    const { data, parentElement, setStateValue, setTriggerValue } = component;
+    const root = parentElement.querySelector(".fr-root");
+    const view = data.view;
+    const esc = (s) => String(s).replace(/[&<>"']/g,
+        (c) => ({"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c]));
+    const sorts = {
+        price: (a, b) => a.price - b.price || a.departs.localeCompare(b.departs),
+        departure: (a, b) => a.departs.localeCompare(b.departs) || a.price - b.price,
+        duration: (a, b) => a.minutes - b.minutes || a.price - b.price,
+    };
+
+    const card = (r) => `
+        <div class="flight-card${r.id === data.selected ? " flight-card-selected" : ""}" data-id="${esc(r.id)}">
+            <div><div class="fc-airline">${esc(r.airline)}</div><div class="fc-sub">${esc(r.number)}</div></div>
+            <div style="text-align: center;"><div class="fc-time">${esc(r.dep)}</div><div class="fc-sub">${esc(r.from)}</div></div>
+            <div style="text-align: center;"><div class="fc-duration">${esc(r.duration)}</div><div class="fc-sub">${esc(r.stops)}</div></div>
+            <div style="text-align: center;"><div class="fc-time">${esc(r.arr)}</div><div class="fc-sub">${esc(r.to)}</div></div>
+            <div class="fc-price">${esc(r.price_label)}
+                <div class="fr-pick">${r.id === data.selected ? "Selected ✓" : "Select"}</div></div>
+        </div>`;
+
+    // Applies the view to the rows already on screen, without waiting for the server
+    const draw = (v) => {
+        const rows = data.rows
+            .filter((r) => (!v.airline || r.airline === v.airline) && (!v.nonstop || r.nonstop))
+            .sort(sorts[v.sort]);
+        root.querySelector(".fr-list").innerHTML =
+            rows.map(card).join("") || '<div class="fc-sub">No flights match these filters.</div>';
+    };
+    let current = view;
+    const changeView = (changes) => {
+        current = { ...current, ...changes, page: 0 };
+        draw(current);
+        setStateValue("view", current);
+    };
+
+    root.innerHTML = `
+        <div class="fr-toolbar">
+            <label>Sort <select class="fr-sort">
+                <option value="price">Cheapest</option><option value="departure">Departure</option>
+                <option value="duration">Shortest</option></select></label>
+            <label>Airline <select class="fr-airline"><option value="">All</option>
+                ${data.airlines.map((a) => `<option>${esc(a)}</option>`).join("")}</select></label>
+            <label><input type="checkbox" class="fr-nonstop"> Non-stop only</label>
+            <span>${data.total} flight${data.total === 1 ? "" : "s"}</span>
+        </div>
+        <div class="fr-header"><div>AIRLINE</div><div style="text-align: center;">DEPARTURE</div>
+            <div style="text-align: center;">DURATION</div><div style="text-align: center;">ARRIVAL</div>
+            <div style="text-align: right;">PRICE</div></div>
+        <div class="fr-list"></div>
+        <div class="fr-pager">
+            <button class="fr-prev"${view.page > 0 ? "" : " disabled"}>← Previous</button>
+            <span>Page ${view.page + 1} of ${data.pages}</span>
+            <button class="fr-next"${view.page + 1 < data.pages ? "" : " disabled"}>Next →</button>
+        </div>`;
+    root.querySelector(".fr-sort").value = view.sort;
+    root.querySelector(".fr-airline").value = view.airline;
+    root.querySelector(".fr-nonstop").checked = view.nonstop;
+    draw(view);
+
+    root.querySelector(".fr-sort").onchange = (e) => changeView({ sort: e.target.value });
+    root.querySelector(".fr-airline").onchange = (e) => changeView({ airline: e.target.value });
+    root.querySelector(".fr-nonstop").onchange = (e) => changeView({ nonstop: e.target.checked });
+    root.querySelector(".fr-prev").onclick = () => setStateValue("view", { ...current, page: view.page - 1 });
+    root.querySelector(".fr-next").onclick = () => setStateValue("view", { ...current, page: view.page + 1 });
+    root.querySelector(".fr-list").onclick = (e) => {
+        const picked = e.target.closest("[data-id]");
+        if (picked) setTriggerValue("selected", picked.dataset.id);
+    };
+}
+"""
+
+_flight_results = st.components.v2.component("flight_results", html=HTML, css=CSS, js=JS, isolate_styles=False)
+
+def clean_view(view):
+    """The list's view state with defaults filled in and browser-sent values checked."""
+    view = {**DEFAULT_VIEW, **(view or {})}
+    if view["sort"] not in SORTS:
+        view["sort"] = DEFAULT_VIEW["sort"]
+    view["page"] = view["page"] if isinstance(view["page"], int) else 0
+    view["airline"] = str(view["airline"] or "")
+    view["nonstop"] = bool(view["nonstop"])
+    return view
+
+def page_of_results(flights, prices, view, page_size=PAGE_SIZE):
+    """
+    Filters and sorts the whole result set by `view` and returns
+    ([(flight, price)] on the view's page, page, pages, matching flights).
+    """
+    results = [(f, p) for f, p in zip(flights, prices)
+               if (not view["airline"] or f.airline == view["airline"])
+               and (not view["nonstop"] or f.stops == "Non-stop")]
+    sort_key = SORTS[view["sort"]]
+    results.sort(key=lambda r: sort_key(*r))
+    pages = max(1, -(-len(results) // page_size))
+    page = min(max(view["page"], 0), pages - 1)
+    return results[page * page_size:(page + 1) * page_size], page, pages, len(results)
+
+def result_row(flight, price):
+    return {
+        "id": flight.id, "airline": flight.airline, "number": flight.flight_number,
+        "dep": flight.departure_time.strftime('%H:%M'), "arr": flight.arrival_time.strftime('%H:%M'),
+        "departs": flight.departure_time.isoformat(), "from": flight.from_city, "to": flight.to_city,
+        "duration": utils.format_duration(flight.duration), "minutes": flight.duration,
+        "stops": flight.stops, "nonstop": flight.stops == "Non-stop",
+        "price": price, "price_label": utils.format_currency(price),
+    }
+
+def render_flight_results(flights, prices, selected_id, key, on_select, page_size=PAGE_SIZE):
+    """
+    Renders one page of `flights` (with their quoted `prices`) as a single
+    component. `on_select(flight, price)` is called, before the next rerun,
+    when the user picks a flight.
+    """
+    state = st.session_state.get(key)
+    view = clean_view(state.get("view") if state else None)
+    page_results, view["page"], pages, total = page_of_results(flights, prices, view, page_size)
+    by_id = {f.id: (f, p) for f, p in zip(flights, prices)}
+
+    def selected():
+        picked = by_id.get(st.session_state[key].get("selected"))
+        if picked:
+            on_select(*picked)
+
+    _flight_results(
+        key=key,
+        data={
+            "rows": [result_row(f, p) for f, p in page_results],
+            "view": view, "pages": pages, "total": total, "selected": selected_id,
+            "airlines": sorted({f.airline for f in flights}),
+        },
+        default={"view": DEFAULT_VIEW},
+        on_view_change=lambda: None,
+        on_selected_change=selected,
+    )
@@ -0,0 +1,174 @@
+"""
+Persistent flight inventory.
+
+Schedules come from the deterministic generator in flight_data and are stored
+in the `flights` table, indexed by (from_city, to_city, departure_date), so a
+search is a range scan instead of regeneration. Days that were never loaded
+are generated and written through on first lookup.
+
+Bulk-load a year of schedules before launch:
+
+    python inventory.py load --routes HYD-GOI,GOI-HYD --days 365
+
+`python inventory.py check` confirms that every generated flight is found
+again from its ID alone (flight_data.find_flight).
+"""
+import argparse
+import csv
+import io
+import sys
+import time
+from datetime import datetime, timedelta
+import psycopg2
+import flight_data
+import migrations
+
+FLIGHT_COLUMNS = ["id", "airline", "flight_number", "from_city", "to_city", "departure_date",
+                  "departure_time", "arrival_time", "duration", "stops", "base_price"]
+
+# Columns in flight_data.FLIGHT_FIELDS order
+SELECT_FLIGHTS_SQL = """
+    SELECT id, airline, flight_number, departure_time, arrival_time, duration, stops,
+           from_city, to_city, base_price
+    FROM flights
+    WHERE from_city = %s AND to_city = %s AND departure_date BETWEEN %s AND %s
+    ORDER BY departure_date, departure_time, id;
+"""
+
+def fetch_flights(conn, from_city, to_city, start_date, end_date=None):
+    """Range scan over the route/date index. Returns Flights ordered by departure."""
+    cur = conn.cursor()
+    cur.execute(SELECT_FLIGHTS_SQL, (from_city, to_city, start_date, end_date or start_date))
+    rows = [flight_data.flight_from_row(r) for r in cur.fetchall()]
+    cur.close()
+    conn.commit()
+    return rows
+
+def _copy_rows(flights):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    for f in flights:
+        writer.writerow([
+            f.id, f.airline, f.flight_number, f.from_city, f.to_city,
+            f.departure_time.date().isoformat(), f.departure_time.isoformat(sep=' '),
+            f.arrival_time.isoformat(sep=' '), f.duration, f.stops, f.base_price,
+        ])
+    buf.seek(0)
+    return buf
+
+def insert_flights(conn, flights):
+    """
+    Bulk-inserts flights with COPY through a staging table; existing IDs are skipped.
+    Returns the number of new rows.
+    """
+    if not flights:
+        return 0
+    cols = ", ".join(FLIGHT_COLUMNS)
+    cur = conn.cursor()
+    cur.execute("CREATE TEMP TABLE IF NOT EXISTS flights_staging (LIKE flights INCLUDING DEFAULTS) ON COMMIT DELETE ROWS;")
+    cur.copy_expert(f"COPY flights_staging ({cols}) FROM STDIN WITH (FORMAT csv)", _copy_rows(flights))
+    cur.execute(f"INSERT INTO flights ({cols}) SELECT {cols} FROM flights_staging ON CONFLICT (id) DO NOTHING;")
+    inserted = cur.rowcount
+    conn.commit()
+    cur.close()
+    return inserted
+
+def get_flights(conn, from_city, to_city, date):
+    """Flights for one route/day, generating and persisting the day on a miss."""
+    if conn is None:
+        return flight_data.generate_flights(from_city, to_city, date)
+    try:
+        flights = fetch_flights(conn, from_city, to_city, date)
+        if not flights:
+            flights = flight_data.generate_flights(from_city, to_city, date)
+            insert_flights(conn, flights)
+        return flights
+    except psycopg2.Error:
+        # The generator is deterministic, so this matches what the inventory would hold
+        conn.rollback()
+        return flight_data.generate_flights(from_city, to_city, date)
+
+def bulk_load(conn, routes, start_date, days, batch_days=31, progress=None):
+    """
+    Generates and loads `days` of schedules for each (from_city, to_city) route,
+    one COPY per `batch_days` per route. Returns (rows generated, rows inserted).
+    """
+    generated = inserted = 0
+    for from_city, to_city in routes:
+        for offset in range(0, days, batch_days):
+            batch = []
+            for i in range(offset, min(offset + batch_days, days)):
+                batch.extend(flight_data.generate_flights(from_city, to_city, start_date + timedelta(days=i)))
+            generated += len(batch)
+            inserted += insert_flights(conn, batch)
+            if progress:
+                progress(from_city, to_city, min(offset + batch_days, days), days)
+    return generated, inserted
+
+def check_round_trip(routes, start_date, days):
+    """
+    Flights whose ID doesn't lead back to them through flight_data.find_flight
+    (the re-issue fallback for flights missing from the inventory).
+    """
+    return [f for f in flight_data.generate_schedule(routes, start_date, days)
+            if flight_data.find_flight(f.id) != f]
+
+def parse_routes(value):
+    """'HYD-GOI,GOI-HYD' -> [('HYD', 'GOI'), ('GOI', 'HYD')]"""
+    return [tuple(r.strip().upper().split("-")) for r in value.split(",") if r.strip()]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage the persistent flight inventory.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    load_cmd = sub.add_parser("load", help="Bulk-load generated schedules")
+    load_cmd.add_argument("--routes", default="HYD-GOI,GOI-HYD", help="Comma-separated FROM-TO pairs")
+    load_cmd.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                          default=datetime.now().date(), help="First day (YYYY-MM-DD, default: today)")
+    load_cmd.add_argument("--days", type=int, default=365)
+
+    show_cmd = sub.add_parser("show", help="Print the flights for one route and day")
+    show_cmd.add_argument("route", help="FROM-TO")
+    show_cmd.add_argument("date", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date())
+
+    check_cmd = sub.add_parser("check", help="Check that every generated flight is found again by its ID")
+    check_cmd.add_argument("--routes", default="HYD-GOI,GOI-HYD", help="Comma-separated FROM-TO pairs")
+    check_cmd.add_argument("--start", type=lambda s: datetime.strptime(s, "%Y-%m-%d").date(),
+                           default=datetime.now().date(), help="First day (YYYY-MM-DD, default: today)")
+    check_cmd.add_argument("--days", type=int, default=365)
+
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        # Needs no database: the IDs are checked against the generator alone
+        routes = parse_routes(args.routes)
+        mismatched = check_round_trip(routes, args.start, args.days)
+        for f in mismatched[:20]:
+            print(f"find_flight({f.id!r}) does not return the generated flight")
+        print(f"{len(mismatched)} mismatched flights over {len(routes)} routes x {args.days} days")
+        return 1 if mismatched else 0
+
+    conn = migrations.connect()
+    try:
+        migrations.migrate(conn)
+        if args.command == "load":
+            routes = parse_routes(args.routes)
+            start = time.perf_counter()
+
+            def progress(from_city, to_city, done, total):
+                print(f"\r{from_city}-{to_city}: {done}/{total} days", end="", flush=True)
+
+            generated, inserted = bulk_load(conn, routes, args.start, args.days, progress=progress)
+            elapsed = time.perf_counter() - start
+            print(f"\nLoaded {inserted} new flights ({generated} generated) for {len(routes)} routes "
+                  f"in {elapsed:.1f}s ({generated / elapsed:,.0f} flights/s)")
+        else:
+            from_city, to_city = parse_routes(args.route)[0]
+            for f in fetch_flights(conn, from_city, to_city, args.date):
+                print(f"{f.id:<26} {f.airline:<10} {f.departure_time:%H:%M} -> {f.arrival_time:%H:%M} {f.stops}")
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+"""
+Connecting-itinerary search over a network of scheduled flights.
+
+RouteNetwork is a time-expanded graph: every flight is a node, and a flight
+connects to each departure from its arrival airport that leaves between
+MIN_LAYOVER and MAX_LAYOVER after it lands. Flights are stored sorted by
+(origin, departure time), so each flight's connections are one contiguous
+index range, found with bisect when the network is built.
+
+search() is a best-first (k-shortest-path) walk from the origin's departures
+that day, ranked by total fare or by elapsed time, and stops once it has
+`k` itineraries. Legs that cannot reach the destination within the remaining
+connections are never expanded.
+"""
+import heapq
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+import pricing
+
+MIN_LAYOVER = timedelta(minutes=45)
+MAX_LAYOVER = timedelta(hours=6)
+MAX_CONNECTIONS = 2
+SORT_KEYS = ("price", "duration")
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+
+def _minutes(t):
+    return (t - EPOCH) // MINUTE
+
+@dataclass(frozen=True, slots=True)
+class Itinerary:
+    """One or more connecting Flights, with the fare for the whole trip (per passenger)."""
+    legs: tuple
+    price: int
+
+    @property
+    def departure_time(self):
+        return self.legs[0].departure_time
+
+    @property
+    def arrival_time(self):
+        return self.legs[-1].arrival_time
+
+    @property
+    def duration(self):
+        """Elapsed minutes from first departure to last arrival, layovers included."""
+        return (self.arrival_time - self.departure_time) // MINUTE
+
+    @property
+    def connections(self):
+        return len(self.legs) - 1
+
+    @property
+    def layovers(self):
+        """Minutes on the ground at each connection."""
+        return [(b.departure_time - a.arrival_time) // MINUTE for a, b in zip(self.legs, self.legs[1:])]
+
+class RouteNetwork:
+    """
+    Searchable network of `flights`. Fares are quoted once, when the network
+    is built, for `booking_date` and `travel_class` (see pricing.price_flights).
+    """
+
+    def __init__(self, flights, booking_date=None, travel_class="Economy",
+                 min_layover=MIN_LAYOVER, max_layover=MAX_LAYOVER):
+        self.flights = sorted(flights, key=lambda f: (f.from_city, f.departure_time, f.id))
+        self.prices = pricing.price_flights(self.flights, booking_date or datetime.now().date(), travel_class)
+        self.departs = [_minutes(f.departure_time) for f in self.flights]
+        self.arrives = [_minutes(f.arrival_time) for f in self.flights]
+
+        # airport -> (first, last + 1) index of its departures
+        self.departures = {}
+        for i, f in enumerate(self.flights):
+            first, _ = self.departures.get(f.from_city, (i, i))
+            self.departures[f.from_city] = (first, i + 1)
+
+        # Reverse route map, for pruning legs that can't reach the destination
+        self.inbound = defaultdict(set)
+        for f in self.flights:
+            self.inbound[f.to_city].add(f.from_city)
+
+        # Connection arcs: flight i -> flights[lo:hi]
+        min_gap, max_gap = min_layover // MINUTE, max_layover // MINUTE
+        self.connections = []
+        for f, arrival in zip(self.flights, self.arrives):
+            first, last = self.departures.get(f.to_city, (0, 0))
+            self.connections.append((bisect_left(self.departs, arrival + min_gap, first, last),
+                                     bisect_right(self.departs, arrival + max_gap, first, last)))
+
+    def __len__(self):
+        return len(self.flights)
+
+    def hops_to(self, destination, max_hops):
+        """{airport: fewest flights to destination}, for airports within max_hops."""
+        hops = {destination: 0}
+        frontier = [destination]
+        for n in range(1, max_hops + 1):
+            frontier = {a for b in frontier for a in self.inbound[b] if a not in hops}
+            for a in frontier:
+                hops[a] = n
+        return hops
+
+    def search(self, origin, destination, date, k=10, sort_by="price", max_connections=MAX_CONNECTIONS):
+        """
+        Up to `k` Itineraries from origin to destination departing on `date`,
+        cheapest (ties: shortest) or shortest (ties: cheapest) first. No
+        itinerary visits an airport twice.
+        """
+        if sort_by not in SORT_KEYS:
+            raise ValueError(f"sort_by must be one of {SORT_KEYS}")
+        if origin == destination:
+            return []
+        max_legs = max_connections + 1
+        hops = self.hops_to(destination, max_legs)
+        if hops.get(origin, max_legs + 1) > max_legs:
+            return []
+
+        flights, prices, departs, arrives = self.flights, self.prices, self.departs, self.arrives
+        by_price = sort_by == "price"
+
+        def entry(path, fare):
+            elapsed = arrives[path[-1]] - departs[path[0]]
+            return (fare, elapsed, path) if by_price else (elapsed, fare, path)
+
+        first, last = self.departures.get(origin, (0, 0))
+        day_start = _minutes(datetime.combine(date, time()))
+        heap = [entry((i,), prices[i])
+                for i in range(bisect_left(departs, day_start, first, last),
+                               bisect_left(departs, day_start + 1440, first, last))
+                if hops.get(flights[i].to_city, max_legs) < max_legs]
+        heapq.heapify(heap)
+
+        # A (flight, leg number) node expanded k times can't be on any further top-k path
+        expanded = defaultdict(int)
+        results = []
+        while heap and len(results) < k:
+            cost, tiebreak, path = heapq.heappop(heap)
+            fare = cost if by_price else tiebreak
+            leg = path[-1]
+            flight = flights[leg]
+            if flight.to_city == destination:
+                results.append(Itinerary(tuple(flights[i] for i in path), fare))
+                continue
+            node = (leg, len(path))
+            if expanded[node] >= k:
+                continue
+            expanded[node] += 1
+
+            legs_left = max_legs - len(path)
+            visited = {flights[i].from_city for i in path}
+            visited.add(flight.to_city)
+            lo, hi = self.connections[leg]
+            for j in range(lo, hi):
+                to_city = flights[j].to_city
+                if to_city in visited or hops.get(to_city, legs_left) >= legs_left:
+                    continue
+                heapq.heappush(heap, entry(path + (j,), fare + prices[j]))
+        return results
@@ -0,0 +1,443 @@
+"""
+Versioned schema migrations.
+
+Migrations run in order and each version is recorded in `schema_migrations`,
+so the runner is safe to call on every deploy. Run it from the CLI before
+deploying:
+
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # show current version
+"""
+import argparse
+import os
+import sys
+
+# libpq sslmode unless DB_SSLMODE says otherwise (e.g. "disable" for a local Postgres)
+DB_SSLMODE = "require"
+
+# Postgres advisory lock key so concurrent processes don't migrate at the same time
+MIGRATION_LOCK_KEY = 5_741_200
+
+# (version, description, sql) - append new migrations, never edit applied ones
+MIGRATIONS = [
+    (1, "create bookings and passengers", """
+        CREATE TABLE IF NOT EXISTS bookings (
+            pnr VARCHAR(10) PRIMARY KEY,
+            booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            outbound_flight_id VARCHAR(50),
+            return_flight_id VARCHAR(50),
+            total_amount DECIMAL(10, 2),
+            contact_email VARCHAR(100),
+            contact_phone VARCHAR(20),
+            status VARCHAR(20)
+        );
+
+        CREATE TABLE IF NOT EXISTS passengers (
+            id SERIAL PRIMARY KEY,
+            pnr VARCHAR(10) REFERENCES bookings(pnr),
+            first_name VARCHAR(50),
+            last_name VARCHAR(50),
+            gender VARCHAR(20),
+            seat_outbound VARCHAR(10),
+            seat_return VARCHAR(10)
+        );
+    """),
+    (2, "index passengers by pnr and bookings by date", """
+        CREATE INDEX IF NOT EXISTS idx_passengers_pnr ON passengers (pnr);
+        CREATE INDEX IF NOT EXISTS idx_bookings_booking_date ON bookings (booking_date);
+    """),
+    (3, "idempotency key for booking retries", """
+        ALTER TABLE bookings ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+        CREATE UNIQUE INDEX IF NOT EXISTS uq_bookings_idempotency_key ON bookings (idempotency_key);
+    """),
+    (4, "persistent flight inventory", """
+        CREATE TABLE IF NOT EXISTS flights (
+            id VARCHAR(50) PRIMARY KEY,
+            airline VARCHAR(50),
+            flight_number VARCHAR(20),
+            from_city VARCHAR(10) NOT NULL,
+            to_city VARCHAR(10) NOT NULL,
+            departure_date DATE NOT NULL,
+            departure_time TIMESTAMP NOT NULL,
+            arrival_time TIMESTAMP NOT NULL,
+            duration INTEGER,
+            stops VARCHAR(20),
+            base_price INTEGER
+        );
+        CREATE INDEX IF NOT EXISTS idx_flights_route_date
+            ON flights (from_city, to_city, departure_date, departure_time);
+    """),
+    (5, "index bookings by flight for seat lookups", """
+        CREATE INDEX IF NOT EXISTS idx_bookings_outbound_flight ON bookings (outbound_flight_id);
+        CREATE INDEX IF NOT EXISTS idx_bookings_return_flight ON bookings (return_flight_id);
+    """),
+    (6, "sequence handing out PNR counter blocks", """
+        CREATE SEQUENCE IF NOT EXISTS pnr_block_seq START WITH 0 MINVALUE 0 INCREMENT BY 1000;
+    """),
+    (7, "index bookings by contact for manage-booking lookups", """
+        CREATE INDEX IF NOT EXISTS idx_bookings_contact_email
+            ON bookings (lower(contact_email), booking_date DESC, pnr DESC);
+        CREATE INDEX IF NOT EXISTS idx_bookings_contact_phone
+            ON bookings (contact_phone, booking_date DESC, pnr DESC);
+    """),
+    (8, "travel class on bookings and dashboard rollups", """
+        ALTER TABLE bookings ADD COLUMN IF NOT EXISTS travel_class VARCHAR(20);
+
+        CREATE TABLE IF NOT EXISTS revenue_daily (
+            day DATE NOT NULL,
+            travel_class VARCHAR(20) NOT NULL,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            passengers INTEGER NOT NULL DEFAULT 0,
+            revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, travel_class)
+        );
+
+        CREATE TABLE IF NOT EXISTS flight_sales (
+            flight_id VARCHAR(50) NOT NULL,
+            travel_class VARCHAR(20) NOT NULL,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (flight_id, travel_class)
+        );
+
+        -- Backfill from existing history (same aggregation as `python rollups.py rebuild`)
+        INSERT INTO revenue_daily (day, travel_class, bookings, passengers, revenue)
+        SELECT b.booking_date::date, COALESCE(b.travel_class, 'Unknown'), count(*),
+               COALESCE(sum(pc.n), 0), COALESCE(sum(b.total_amount), 0)
+        FROM bookings b
+        LEFT JOIN (SELECT pnr, count(*) AS n FROM passengers GROUP BY pnr) pc ON pc.pnr = b.pnr
+        GROUP BY 1, 2
+        ON CONFLICT DO NOTHING;
+
+        INSERT INTO flight_sales (flight_id, travel_class, bookings, seats_sold, revenue)
+        SELECT leg.flight_id, COALESCE(b.travel_class, 'Unknown'), count(*),
+               COALESCE(sum(pc.n), 0), COALESCE(sum(b.total_amount / 2), 0)
+        FROM bookings b
+        LEFT JOIN (SELECT pnr, count(*) AS n FROM passengers GROUP BY pnr) pc ON pc.pnr = b.pnr
+        CROSS JOIN LATERAL (VALUES (b.outbound_flight_id), (b.return_flight_id)) AS leg(flight_id)
+        WHERE leg.flight_id IS NOT NULL
+        GROUP BY 1, 2
+        ON CONFLICT DO NOTHING;
+    """),
+    (9, "partition bookings and passengers by booking month", """
+        -- A partitioned table can only enforce uniqueness on keys that include
+        -- booking_date, so PNR and idempotency-key uniqueness move to a narrow
+        -- unpartitioned directory that also tells lookups which partition to read.
+        CREATE TABLE IF NOT EXISTS booking_keys (
+            pnr VARCHAR(10) PRIMARY KEY,
+            idempotency_key VARCHAR(64) UNIQUE,
+            booking_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+        );
+
+        ALTER TABLE bookings RENAME TO bookings_unpartitioned;
+        ALTER TABLE passengers RENAME TO passengers_unpartitioned;
+        ALTER SEQUENCE passengers_id_seq OWNED BY NONE;
+
+        CREATE TABLE bookings (
+            pnr VARCHAR(10) NOT NULL,
+            booking_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            outbound_flight_id VARCHAR(50),
+            return_flight_id VARCHAR(50),
+            total_amount DECIMAL(10, 2),
+            contact_email VARCHAR(100),
+            contact_phone VARCHAR(20),
+            status VARCHAR(20),
+            idempotency_key VARCHAR(64),
+            travel_class VARCHAR(20)
+        ) PARTITION BY RANGE (booking_date);
+
+        -- Passengers carry their booking's date so both tables split on the same months
+        CREATE TABLE passengers (
+            id INTEGER NOT NULL DEFAULT nextval('passengers_id_seq'),
+            pnr VARCHAR(10) NOT NULL,
+            booking_date TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            first_name VARCHAR(50),
+            last_name VARCHAR(50),
+            gender VARCHAR(20),
+            seat_outbound VARCHAR(10),
+            seat_return VARCHAR(10)
+        ) PARTITION BY RANGE (booking_date);
+        ALTER SEQUENCE passengers_id_seq OWNED BY passengers.id;
+
+        -- Creates the monthly partitions (bookings_YYYY_MM, passengers_YYYY_MM)
+        -- covering first_month..last_month that don't exist yet; returns how many
+        CREATE OR REPLACE FUNCTION create_booking_partitions(first_month DATE, last_month DATE)
+        RETURNS INTEGER AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', first_month);
+            created INTEGER := 0;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                IF to_regclass('bookings_' || to_char(month_start, 'YYYY_MM')) IS NULL THEN
+                    EXECUTE format('CREATE TABLE %I PARTITION OF bookings FOR VALUES FROM (%L) TO (%L)',
+                                   'bookings_' || to_char(month_start, 'YYYY_MM'), month_start, month_start + interval '1 month');
+                    EXECUTE format('CREATE TABLE %I PARTITION OF passengers FOR VALUES FROM (%L) TO (%L)',
+                                   'passengers_' || to_char(month_start, 'YYYY_MM'), month_start, month_start + interval '1 month');
+                    created := created + 1;
+                END IF;
+                month_start := month_start + interval '1 month';
+            END LOOP;
+            RETURN created;
+        END
+        $$ LANGUAGE plpgsql;
+
+        SELECT create_booking_partitions(
+            COALESCE((SELECT min(booking_date) FROM bookings_unpartitioned), CURRENT_DATE)::date,
+            (CURRENT_DATE + interval '3 months')::date);
+
+        INSERT INTO booking_keys (pnr, idempotency_key, booking_date)
+        SELECT pnr, idempotency_key, COALESCE(booking_date, CURRENT_TIMESTAMP) FROM bookings_unpartitioned;
+
+        INSERT INTO bookings (pnr, booking_date, outbound_flight_id, return_flight_id, total_amount,
+                              contact_email, contact_phone, status, idempotency_key, travel_class)
+        SELECT b.pnr, k.booking_date, b.outbound_flight_id, b.return_flight_id, b.total_amount,
+               b.contact_email, b.contact_phone, b.status, b.idempotency_key, b.travel_class
+        FROM bookings_unpartitioned b JOIN booking_keys k ON k.pnr = b.pnr;
+
+        INSERT INTO passengers (id, pnr, booking_date, first_name, last_name, gender, seat_outbound, seat_return)
+        SELECT p.id, p.pnr, k.booking_date, p.first_name, p.last_name, p.gender, p.seat_outbound, p.seat_return
+        FROM passengers_unpartitioned p JOIN booking_keys k ON k.pnr = p.pnr;
+
+        DROP TABLE passengers_unpartitioned;
+        DROP TABLE bookings_unpartitioned;
+
+        -- Indexes on the parents cascade to every partition, present and future
+        ALTER TABLE bookings ADD PRIMARY KEY (pnr, booking_date);
+        ALTER TABLE passengers ADD PRIMARY KEY (id, booking_date);
+        CREATE INDEX idx_passengers_pnr ON passengers (pnr);
+        CREATE INDEX idx_bookings_booking_date ON bookings (booking_date);
+        CREATE INDEX idx_bookings_outbound_flight ON bookings (outbound_flight_id);
+        CREATE INDEX idx_bookings_return_flight ON bookings (return_flight_id);
+        CREATE INDEX idx_bookings_contact_email
+            ON bookings (lower(contact_email), booking_date DESC, pnr DESC);
+        CREATE INDEX idx_bookings_contact_phone
+            ON bookings (contact_phone, booking_date DESC, pnr DESC);
+    """),
+    (10, "default booking partitions", """
+        -- Bookings dated past the last monthly partition land here instead of
+        -- failing after payment; create_booking_partitions moves them out
+        CREATE TABLE IF NOT EXISTS bookings_default PARTITION OF bookings DEFAULT;
+        CREATE TABLE IF NOT EXISTS passengers_default PARTITION OF passengers DEFAULT;
+
+        -- With a DEFAULT partition in place, a month is built detached, filled
+        -- with its rows from the DEFAULT partition and then attached
+        CREATE OR REPLACE FUNCTION create_booking_partitions(first_month DATE, last_month DATE)
+        RETURNS INTEGER AS $$
+        DECLARE
+            month_start DATE := date_trunc('month', first_month);
+            month_end DATE;
+            parent TEXT;
+            partition TEXT;
+            created INTEGER := 0;
+        BEGIN
+            WHILE month_start <= last_month LOOP
+                month_end := month_start + interval '1 month';
+                IF to_regclass('bookings_' || to_char(month_start, 'YYYY_MM')) IS NULL THEN
+                    FOREACH parent IN ARRAY ARRAY['bookings', 'passengers'] LOOP
+                        partition := parent || '_' || to_char(month_start, 'YYYY_MM');
+                        EXECUTE format('CREATE TABLE %I (LIKE %I INCLUDING DEFAULTS)', partition, parent);
+                        EXECUTE format('WITH moved AS (DELETE FROM %I WHERE booking_date >= %L AND booking_date < %L RETURNING *) '
+                                       'INSERT INTO %I SELECT * FROM moved',
+                                       parent || '_default', month_start, month_end, partition);
+                        EXECUTE format('ALTER TABLE %I ATTACH PARTITION %I FOR VALUES FROM (%L) TO (%L)',
+                                       parent, partition, month_start, month_end);
+                    END LOOP;
+                    created := created + 1;
+                END IF;
+                month_start := month_end;
+            END LOOP;
+            RETURN created;
+        END
+        $$ LANGUAGE plpgsql;
+    """),
+    (11, "seat claims", """
+        -- One row per sold seat, written with the booking (SAVE_BOOKING_SQL), so
+        -- two processes can never both save a booking for the same seat
+        CREATE TABLE IF NOT EXISTS seat_claims (
+            flight_id VARCHAR(50) NOT NULL,
+            seat VARCHAR(10) NOT NULL,
+            pnr VARCHAR(10) NOT NULL,
+            PRIMARY KEY (flight_id, seat)
+        );
+
+        -- Backfill; where a seat was already sold twice the earlier booking keeps the claim
+        INSERT INTO seat_claims (flight_id, seat, pnr)
+        SELECT leg.flight_id, leg.seat, p.pnr
+        FROM passengers p
+        JOIN bookings b ON b.pnr = p.pnr AND b.booking_date = p.booking_date
+        CROSS JOIN LATERAL (VALUES (b.outbound_flight_id, p.seat_outbound),
+                                   (b.return_flight_id, p.seat_return)) AS leg(flight_id, seat)
+        WHERE leg.flight_id IS NOT NULL AND leg.seat IS NOT NULL AND leg.seat <> 'N/A'
+        ORDER BY b.booking_date, p.id
+        ON CONFLICT DO NOTHING;
+    """),
+    (12, "flight sales per booking month", """
+        -- Per booking month, so `rollups.py rebuild` can recompute the months still
+        -- online and leave the share of archived months alone
+        ALTER TABLE flight_sales RENAME TO flight_sales_totals;
+        ALTER TABLE flight_sales_totals RENAME CONSTRAINT flight_sales_pkey TO flight_sales_totals_pkey;
+        CREATE TABLE flight_sales (
+            flight_id VARCHAR(50) NOT NULL,
+            travel_class VARCHAR(20) NOT NULL,
+            month DATE NOT NULL,
+            bookings INTEGER NOT NULL DEFAULT 0,
+            seats_sold INTEGER NOT NULL DEFAULT 0,
+            revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+            PRIMARY KEY (flight_id, travel_class, month)
+        );
+
+        INSERT INTO flight_sales (flight_id, travel_class, month, bookings, seats_sold, revenue)
+        SELECT leg.flight_id, COALESCE(b.travel_class, 'Unknown'), date_trunc('month', b.booking_date)::date,
+               count(*), COALESCE(sum(pc.n), 0), COALESCE(sum(b.total_amount / 2), 0)
+        FROM bookings b
+        LEFT JOIN (SELECT pnr, count(*) AS n FROM passengers GROUP BY pnr) pc ON pc.pnr = b.pnr
+        CROSS JOIN LATERAL (VALUES (b.outbound_flight_id), (b.return_flight_id)) AS leg(flight_id)
+        WHERE leg.flight_id IS NOT NULL
+        GROUP BY 1, 2, 3;
+
+        -- Whatever the online bookings don't account for came from months archived
+        -- before this migration, which can't be told apart any more. It is kept
+        -- under 0001-01-01, a month no booking has, so rebuilds never touch it.
+        INSERT INTO flight_sales (flight_id, travel_class, month, bookings, seats_sold, revenue)
+        SELECT t.flight_id, t.travel_class, DATE '0001-01-01', t.bookings - COALESCE(o.bookings, 0),
+               t.seats_sold - COALESCE(o.seats_sold, 0), t.revenue - COALESCE(o.revenue, 0)
+        FROM flight_sales_totals t
+        LEFT JOIN (SELECT flight_id, travel_class, sum(bookings) AS bookings, sum(seats_sold) AS seats_sold,
+                          sum(revenue) AS revenue
+                   FROM flight_sales GROUP BY 1, 2) o
+            ON o.flight_id = t.flight_id AND o.travel_class = t.travel_class
+        WHERE (t.bookings, t.seats_sold, t.revenue)
+              IS DISTINCT FROM (COALESCE(o.bookings, 0), COALESCE(o.seats_sold, 0), COALESCE(o.revenue, 0));
+
+        DROP TABLE flight_sales_totals;
+    """),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+# Bookings and passengers are partitioned by month (migration 9); keep this many
+# months' partitions created ahead. Anything past them lands in the DEFAULT
+# partitions (migration 10) until ensure_partitions moves it out.
+PARTITION_MONTHS_AHEAD = 3
+
+def _ensure_version_table(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description VARCHAR(200),
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        );
+    """)
+
+def current_version(conn):
+    """Returns the highest applied migration version (0 for a fresh database)."""
+    cur = conn.cursor()
+    _ensure_version_table(cur)
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_migrations;")
+    version = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    return version
+
+def migrate(conn, target=None):
+    """
+    Applies pending migrations up to `target` (default: latest).
+    Each migration commits in its own transaction. Returns the versions applied.
+    """
+    target = LATEST_VERSION if target is None else target
+    applied = []
+
+    cur = conn.cursor()
+    cur.execute("SELECT pg_advisory_lock(%s);", (MIGRATION_LOCK_KEY,))
+    try:
+        # Read the version only after taking the lock; another process may have just migrated
+        version = current_version(conn)
+        for mig_version, description, sql in MIGRATIONS:
+            if mig_version <= version or mig_version > target:
+                continue
+            try:
+                cur.execute(sql)
+                cur.execute(
+                    "INSERT INTO schema_migrations (version, description) VALUES (%s, %s);",
+                    (mig_version, description)
+                )
+                conn.commit()
+            except Exception:
+                conn.rollback()
+                raise
+            applied.append(mig_version)
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s);", (MIGRATION_LOCK_KEY,))
+        conn.commit()
+        cur.close()
+    return applied
+
+def ensure_partitions(conn, months_ahead=PARTITION_MONTHS_AHEAD):
+    """
+    Creates any missing monthly booking partitions up to `months_ahead` months
+    out, moving in bookings that were written to the DEFAULT partition meanwhile.
+    """
+    cur = conn.cursor()
+    cur.execute("SELECT create_booking_partitions(CURRENT_DATE, (CURRENT_DATE + make_interval(months => %s))::date);",
+                (months_ahead,))
+    created = cur.fetchone()[0]
+    conn.commit()
+    cur.close()
+    return created
+
+def load_db_url():
+    db_url = os.getenv("DATABASE_URL")
+    if db_url:
+        return db_url
+    import toml
+    secrets = toml.load(".streamlit/secrets.toml")
+    return secrets["DATABASE_URL"]
+
+def load_sslmode():
+    """DB_SSLMODE from env vars or secrets.toml, as the app's pool reads it (default: require)."""
+    sslmode = os.getenv("DB_SSLMODE")
+    if sslmode:
+        return sslmode
+    try:
+        import toml
+        return toml.load(".streamlit/secrets.toml").get("DB_SSLMODE", DB_SSLMODE)
+    except Exception:
+        return DB_SSLMODE
+
+def connect(db_url=None):
+    """psycopg2 connection for the CLIs, honouring DB_SSLMODE like the app."""
+    import psycopg2
+    return psycopg2.connect(db_url or load_db_url(), sslmode=load_sslmode())
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Apply SkyConnect schema migrations.")
+    parser.add_argument("--target", type=int, default=None, help="Migrate up to this version (default: latest)")
+    parser.add_argument("--status", action="store_true", help="Print the current schema version and exit")
+    args = parser.parse_args(argv)
+
+    try:
+        db_url = load_db_url()
+    except Exception as e:
+        print(f"Error loading DATABASE_URL: {e}")
+        return 1
+
+    conn = connect(db_url)
+    try:
+        if args.status:
+            print(f"Schema version: {current_version(conn)} (latest: {LATEST_VERSION})")
+            return 0
+        applied = migrate(conn, args.target)
+        if current_version(conn) >= 9:
+            ensure_partitions(conn)
+        if applied:
+            print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+        else:
+            print("Schema is up to date.")
+        print(f"Schema version: {current_version(conn)}")
+        return 0
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,143 @@
+"""
+Collision-free PNR allocation.
+
+Each process reserves blocks of counter values from a shared source (a
+Postgres sequence in production) and hands them out locally without touching
+the database. Counters are scrambled with a keyed Feistel permutation over
+the 6-character base36 space, so consecutive bookings get unrelated-looking
+codes while distinct counters always map to distinct PNRs.
+
+The counter space is split in two. Blocks come from [0, OFFLINE_START). The
+rest is the offline namespace, used only while no block can be reserved
+(database down): each process claims a random slot of OFFLINE_SLOT_SIZE
+counters there and counts through it. Offline PNRs therefore never equal
+one handed out from a block.
+
+Never change PNR_KEY, PNR_LENGTH or OFFLINE_START once codes are in use: the
+uniqueness guarantee only holds for a single permutation and split.
+"""
+import hashlib
+import random
+import threading
+
+PNR_ALPHABET = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+PNR_LENGTH = 6
+PNR_SPACE = len(PNR_ALPHABET) ** PNR_LENGTH   # 2,176,782,336 codes
+PNR_KEY = "skyconnect-pnr-v1"
+OFFLINE_START = PNR_SPACE // 2                # block counters stay below this
+OFFLINE_SLOT_SIZE = 1024
+
+def _round_keys(key, rounds=4):
+    digest = hashlib.sha256(key.encode()).digest()
+    return [int.from_bytes(digest[i * 4:(i + 1) * 4], "big") for i in range(rounds)]
+
+_ROUND_KEYS = _round_keys(PNR_KEY)
+
+def _feistel32(x, round_keys):
+    """Keyed permutation of 32-bit integers (balanced Feistel network, 16-bit halves)."""
+    left, right = x >> 16, x & 0xFFFF
+    for k in round_keys:
+        f = ((right * 0x5BD1 + k) ^ (right >> 5) ^ (k >> 11)) * 0x2C1B & 0xFFFF
+        left, right = right, left ^ f
+    return (left << 16) | right
+
+def scramble(n, round_keys=_ROUND_KEYS):
+    """Bijection on [0, PNR_SPACE): Feistel over 32 bits, cycle-walking back into range."""
+    if not 0 <= n < PNR_SPACE:
+        raise ValueError(f"PNR counter {n} out of range")
+    x = _feistel32(n, round_keys)
+    while x >= PNR_SPACE:
+        x = _feistel32(x, round_keys)
+    return x
+
+def encode(n):
+    """Fixed-width base36 encoding."""
+    chars = []
+    for _ in range(PNR_LENGTH):
+        n, rem = divmod(n, len(PNR_ALPHABET))
+        chars.append(PNR_ALPHABET[rem])
+    return "".join(reversed(chars))
+
+def counter_to_pnr(counter):
+    return encode(scramble(counter))
+
+def is_pnr(code):
+    """True if `code` has the shape of a PNR (PNR_LENGTH characters of PNR_ALPHABET, any case)."""
+    code = code.strip().upper()
+    return len(code) == PNR_LENGTH and all(c in PNR_ALPHABET for c in code)
+
+class PnrAllocator:
+    """
+    Thread-safe allocator. `reserve_block()` must return (start, size) for a
+    counter range no other caller will ever receive, or None if unavailable.
+    A spare block is reserved as each block is started, so an outage that
+    begins mid-block still leaves a full block in hand.
+    """
+
+    def __init__(self, reserve_block, rng=None):
+        self.reserve_block = reserve_block
+        self._rng = rng or random.SystemRandom()
+        self._lock = threading.Lock()
+        self._next = 0
+        self._end = 0
+        self._spare = None
+        self._offline_next = 0
+        self._offline_end = 0
+
+    def _reserve(self):
+        block = self.reserve_block()
+        if block is not None and block[0] + block[1] > OFFLINE_START:
+            raise ValueError(f"PNR block {block} reaches the offline namespace")
+        return block
+
+    def allocate(self, reserve=True):
+        """
+        Returns a unique PNR, or None once the blocks in hand are used up and
+        no new one could be reserved. Pass reserve=False when the database is
+        known to be down, to use only the blocks in hand.
+        """
+        with self._lock:
+            if self._next >= self._end:
+                block, self._spare = self._spare, None
+                if block is None and reserve:
+                    block = self._reserve()
+                if block is None:
+                    return None
+                start, size = block
+                self._next, self._end = start, start + size
+                if reserve:
+                    self._spare = self._reserve()
+            counter = self._next
+            self._next += 1
+        return counter_to_pnr(counter)
+
+    def allocate_offline(self):
+        """A PNR from the offline namespace (see the module docstring); needs no database."""
+        with self._lock:
+            if self._offline_next >= self._offline_end:
+                slot = self._rng.randrange((PNR_SPACE - OFFLINE_START) // OFFLINE_SLOT_SIZE)
+                self._offline_next = OFFLINE_START + slot * OFFLINE_SLOT_SIZE
+                self._offline_end = self._offline_next + OFFLINE_SLOT_SIZE
+            counter = self._offline_next
+            self._offline_next += 1
+        return counter_to_pnr(counter)
+
+    def remaining(self):
+        with self._lock:
+            spare = self._spare[1] if self._spare else 0
+            return self._end - self._next + spare
+
+def postgres_block_source(conn):
+    """
+    Reserves the next block from the `pnr_block_seq` sequence (migration 6).
+    The sequence increments by the block size, so nextval() is the block start.
+    """
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT nextval('pnr_block_seq'),
+               (SELECT increment_by FROM pg_sequences WHERE sequencename = 'pnr_block_seq');
+    """)
+    start, size = cur.fetchone()
+    cur.close()
+    conn.commit()
+    return start, size
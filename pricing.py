@@ -1,51 +1,270 @@
-from datetime import datetime
+import argparse
+import bisect
+import hashlib
+import json
+import sys
+import threading
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+import numpy as np
+
+# --- Fare rules ---
+# Each factor depends on one small discrete key. The rules are compiled into a
+# table (see FareTable) so a quote is one lookup and the cell's factors applied to the base price.
+# Change them through set_fare_rules() so the table is rebuilt.
+DEFAULT_FARE_RULES = {
+    # (minimum days to travel, multiplier), first match wins; None is the catch-all
+    "advance_purchase": [
+        [30, 0.80],   # -20%
+        [15, 0.90],   # -10%
+        [7, 1.00],    # 0%
+        [None, 1.25], # +25%
+    ],
+    # Peak Season (Oct-Jan), keyed by month 1-12
+    "season": {"1": 1.30, "10": 1.30, "11": 1.30, "12": 1.30},
+    # Weekend Surcharge (Fri, Sat, Sun), keyed by weekday 0=Mon..6=Sun
+    "weekday": {"4": 1.20, "5": 1.20, "6": 1.20},
+    # Time of Day: [label, start hour, end hour (exclusive), multiplier]; bands may wrap midnight
+    "hour_band": [
+        ["early_morning", 6, 8, 1.15],
+        ["morning", 8, 12, 1.10],
+        ["midday", 12, 16, 1.00],
+        ["evening", 16, 20, 1.15],
+        ["night", 20, 6, 0.90],
+    ],
+    # Class Multiplier; unknown classes price as the first entry
+    "travel_class": {"Economy": 1.0, "Premium Economy": 1.5, "Business": 2.5},
+}
+
+MONTH_NAMES = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
+WEEKDAY_NAMES = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+class FareTable:
+    """
+    Fare rules compiled into a dense table indexed by (advance bucket,
+    month, weekday, hour band, class), holding each cell's factors.
+    """
+
+    def __init__(self, rules):
+        self.rules = rules
+        self.fingerprint = hashlib.sha256(json.dumps(rules, sort_keys=True).encode()).hexdigest()[:12]
+
+        advance = rules["advance_purchase"]
+        thresholds = [min_days for min_days, _ in advance]
+        if thresholds[-1] is not None or None in thresholds[:-1] or thresholds[:-1] != sorted(thresholds[:-1], reverse=True):
+            raise ValueError("advance_purchase rules must list descending thresholds ending with a None catch-all")
+        # Ascending thresholds for bisect/searchsorted; bucket 0 is the largest threshold
+        self.advance_thresholds = sorted(min_days for min_days, _ in advance if min_days is not None)
+        self.advance_labels = [f"{d}+" if d is not None else f"<{min(self.advance_thresholds, default=0)}" for d, _ in advance]
+        advance_mult = [mult for _, mult in advance]
+
+        month_mult = [rules["season"].get(str(m), 1.0) for m in range(1, 13)]
+        weekday_mult = [rules["weekday"].get(str(d), 1.0) for d in range(7)]
+
+        bands = rules["hour_band"]
+        self.band_labels = [label for label, _, _, _ in bands]
+        band_mult = [mult for _, _, _, mult in bands]
+        hour_band = [None] * 24
+        for idx, (label, start, end, _) in enumerate(bands):
+            hours = range(start, end) if start < end else list(range(start, 24)) + list(range(0, end))
+            for h in hours:
+                hour_band[h] = idx
+        if None in hour_band:
+            raise ValueError(f"Hour bands do not cover hours {[h for h, b in enumerate(hour_band) if b is None]}")
+        self.hour_band = hour_band
+        self._hour_band_arr = np.array(hour_band, dtype=np.int64)
+
+        self.class_labels = list(rules["travel_class"])
+        self.class_index = {name: idx for idx, name in enumerate(self.class_labels)}
+        class_mult = [rules["travel_class"][name] for name in self.class_labels]
+
+        # Each cell keeps its five factors (advance, season, weekday, hour band, class).
+        # Quotes multiply them into the base price one at a time in that order, like
+        # the original rule chain; multiplying the factors together first rounds
+        # differently and moves some fares by 1.
+        axes = [advance_mult, month_mult, weekday_mult, band_mult, class_mult]
+        self.shape = tuple(len(a) for a in axes)
+        grids = np.meshgrid(*[np.array(a, dtype=np.float64) for a in axes], indexing="ij")
+        self._factors = np.stack([g.ravel() for g in grids], axis=1)
+        self._factors_list = [tuple(row) for row in self._factors.tolist()]  # Python floats for scalar quotes
+        # The combined multiplier per cell, for dumps and reviews only
+        table = grids[0] * grids[1] * grids[2] * grids[3] * grids[4]
+        self.multipliers = table
+        self.strides = [int(np.prod(self.shape[k + 1:])) for k in range(5)]
+
+    def advance_bucket(self, days_to_travel):
+        return len(self.advance_thresholds) - bisect.bisect_right(self.advance_thresholds, days_to_travel)
+
+    def index(self, days_to_travel, month, weekday, hour, travel_class):
+        """Flat table index for one quote key."""
+        s = self.strides
+        return (self.advance_bucket(days_to_travel) * s[0] + (month - 1) * s[1] + weekday * s[2]
+                + self.hour_band[hour] * s[3] + self.class_index.get(travel_class, 0) * s[4])
+
+    def multiplier(self, days_to_travel, month, weekday, hour, travel_class):
+        return float(self.multipliers.flat[self.index(days_to_travel, month, weekday, hour, travel_class)])
+
+    def quote(self, base_price, days_to_travel, month, weekday, hour, travel_class):
+        """Unrounded fare: the base price times the cell's factors, in rule order."""
+        price = base_price
+        for factor in self._factors_list[self.index(days_to_travel, month, weekday, hour, travel_class)]:
+            price *= factor
+        return price
+
+    def quotes(self, base_prices, days_to_travel, month, weekday, hour, class_idx):
+        """Vectorized quote; all arguments are arrays (class_idx already mapped)."""
+        s = self.strides
+        bucket = len(self.advance_thresholds) - np.searchsorted(self.advance_thresholds, days_to_travel, side='right')
+        idx = (bucket * s[0] + (month - 1) * s[1] + weekday * s[2]
+               + self._hour_band_arr[hour] * s[3] + class_idx * s[4])
+        factors = self._factors[idx]
+        price = np.array(base_prices, dtype=np.float64)
+        for k in range(factors.shape[-1]):
+            price = price * factors[..., k]
+        return price
+
+    def class_indices(self, travel_class):
+        classes = np.asarray(travel_class)
+        if classes.ndim == 0:
+            return self.class_index.get(str(classes), 0)
+        return np.array([self.class_index.get(c, 0) for c in classes.tolist()], dtype=np.int64)
+
+    def rows(self):
+        """Yields (advance, month, weekday, hour band, class, multiplier) for every cell."""
+        for a, advance in enumerate(self.advance_labels):
+            for m, month in enumerate(MONTH_NAMES):
+                for w, weekday in enumerate(WEEKDAY_NAMES):
+                    for h, band in enumerate(self.band_labels):
+                        for c, cls in enumerate(self.class_labels):
+                            yield advance, month, weekday, band, cls, float(self.multipliers[a, m, w, h, c])
+
+    def dump(self, out):
+        """Writes the compiled table as TSV for review and diffing."""
+        out.write(f"# fare table {self.fingerprint}\n")
+        out.write("advance\tmonth\tweekday\thour_band\tclass\tmultiplier\n")
+        for *key, mult in self.rows():
+            out.write("\t".join(key) + f"\t{mult:.6f}\n")
+
+_rules = DEFAULT_FARE_RULES
+_fare_table = None
+_fare_table_lock = threading.Lock()
+
+def get_fare_table():
+    """Returns the compiled fare table, compiling it on first use."""
+    global _fare_table
+    table = _fare_table
+    if table is None:
+        with _fare_table_lock:
+            if _fare_table is None:
+                _fare_table = FareTable(_rules)
+            table = _fare_table
+    return table
+
+def set_fare_rules(rules):
+    """Replaces the fare rules and rebuilds the table. Returns the new table."""
+    global _rules, _fare_table
+    table = FareTable(rules)  # compile first so invalid rules leave the old table in place
+    with _fare_table_lock:
+        _rules = rules
+        _fare_table = table
+    return table
+
+def load_table_dump(path):
+    """Reads a dump written by FareTable.dump into {key tuple: multiplier}."""
+    table = {}
+    with open(path) as f:
+        for line in f:
+            if line.startswith("#") or line.startswith("advance\t"):
+                continue
+            *key, mult = line.rstrip("\n").split("\t")
+            table[tuple(key)] = float(mult)
+    return table
+
+def diff_tables(old, new):
+    """Returns [(key, old multiplier, new multiplier)] for cells that differ or exist on one side only."""
+    changes = []
+    for key in sorted(set(old) | set(new)):
+        before, after = old.get(key), new.get(key)
+        if before is None or after is None or abs(before - after) > 1e-9:
+            changes.append((key, before, after))
+    return changes
 
 def calculate_price(base_price, flight, booking_date, travel_class, passengers):
     """
     Calculates the final price based on dynamic factors.
+    Price = base price x the (advance purchase, season, weekday, hour band,
+    class) factors of its fare table cell, applied in that order.
+    """
+    dep = flight.departure_time
+    days_to_travel = (dep.date() - booking_date).days
+    return round(get_fare_table().quote(base_price, days_to_travel, dep.month, dep.weekday(), dep.hour, travel_class))
+
+def rule_chain_price(base_price, departure_time, booking_date, travel_class, rules=None):
+    """
+    The fare straight from the rules, one factor at a time and without the
+    compiled table; the reference `python pricing.py check` compares against.
     """
+    rules = rules or _rules
     price = base_price
+    days_to_travel = (departure_time.date() - booking_date).days
+    price *= next(mult for min_days, mult in rules["advance_purchase"] if min_days is None or days_to_travel >= min_days)
+    price *= rules["season"].get(str(departure_time.month), 1.0)
+    price *= rules["weekday"].get(str(departure_time.weekday()), 1.0)
+    hour = departure_time.hour
+    price *= next(mult for _, start, end, mult in rules["hour_band"]
+                  if (start <= hour < end if start < end else hour >= start or hour < end))
+    classes = rules["travel_class"]
+    price *= classes.get(travel_class, next(iter(classes.values())))
+    return round(price)
+
+EPOCH_ORDINAL = 719163  # date(1970, 1, 1).toordinal()
+
+def as_datetime64(times):
+    """Converts departure times to datetime64[m] (minutes since the epoch)."""
+    if isinstance(times, np.ndarray) and np.issubdtype(times.dtype, np.datetime64):
+        return times.astype('datetime64[m]')
+    # numpy's object -> datetime64 conversion is slow; build epoch minutes directly
+    minutes = np.fromiter(
+        ((t.toordinal() - EPOCH_ORDINAL) * 1440 + t.hour * 60 + t.minute for t in times),
+        dtype=np.int64
+    )
+    return minutes.astype('datetime64[m]')
+
+def calculate_prices(departure_times, base_prices, booking_date, travel_class):
+    """
+    Vectorized calculate_price for a whole result set in columnar form.
+    `departure_times` and `base_prices` are equal-length sequences/arrays;
+    `travel_class` is a single class name or one per flight.
+    Uses the same compiled fare table as calculate_price, so the returned
+    int64 array is identical to calling it per flight.
+    """
+    dep = as_datetime64(departure_times)
+    table = get_fare_table()
     
-    # 1. Advance Booking Discount/Surcharge
-    days_to_travel = (flight['departure_time'].date() - booking_date).days
+    minutes = dep.astype(np.int64)
+    days = dep.astype('datetime64[D]').astype(np.int64)
     
-    if days_to_travel >= 30:
-        price *= 0.80 # -20%
-    elif 15 <= days_to_travel < 30:
-        price *= 0.90 # -10%
-    elif 7 <= days_to_travel < 15:
-        pass # 0%
-    else:
-        price *= 1.25 # +25%
-        
-    # 2. Peak Season (Oct-Jan)
-    month = flight['departure_time'].month
-    if month in [10, 11, 12, 1]:
-        price *= 1.30
-        
-    # 3. Weekend Surcharge (Fri, Sat, Sun)
-    weekday = flight['departure_time'].weekday() # 0=Mon, 6=Sun
-    if weekday in [4, 5, 6]:
-        price *= 1.20
-        
-    # 4. Time of Day
-    hour = flight['departure_time'].hour
-    if 6 <= hour < 8:
-        price *= 1.15 # Early Morning
-    elif 8 <= hour < 12:
-        price *= 1.10 # Morning
-    elif 16 <= hour < 20:
-        price *= 1.15 # Evening
-    elif 20 <= hour or hour < 6:
-        price *= 0.90 # Night
-        
-    # 5. Class Multiplier
-    if travel_class == "Premium Economy":
-        price *= 1.5
-    elif travel_class == "Business":
-        price *= 2.5
-        
-    return round(price)
+    days_to_travel = days - np.datetime64(booking_date, 'D').astype(np.int64)
+    month = dep.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    weekday = (days + 3) % 7  # 1970-01-01 was a Thursday (weekday 3)
+    hour = (minutes // 60) % 24
+    
+    price = table.quotes(base_prices, days_to_travel, month, weekday, hour, table.class_indices(travel_class))
+    
+    # np.rint rounds half to even, like round()
+    return np.rint(price).astype(np.int64)
+
+def price_flights(flights, booking_date, travel_class):
+    """Prices a list of Flights in one vectorized pass. Returns a list of ints."""
+    if not flights:
+        return []
+    prices = calculate_prices(
+        [f.departure_time for f in flights],
+        [f.base_price for f in flights],
+        booking_date,
+        travel_class
+    )
+    return prices.tolist()
 
 def calculate_total_fare(outbound_price, return_price, passengers, addons_cost=0):
     """
@@ -74,3 +293,83 @@ def calculate_total_fare(outbound_price, return_price, passengers, addons_cost=0
         "addons": addons_cost,
         "total": round(total)
     }
+
+def check_grid(days, bases, booking_date=None):
+    """
+    Compares calculate_price and calculate_prices with rule_chain_price for
+    every departure hour over `days` days, every class and base price.
+    Prints the mismatches and returns 1 if there are any.
+    """
+    booking_date = booking_date or datetime.now().date()
+    start = datetime.combine(booking_date, datetime.min.time())
+    departures = [start + timedelta(days=d, hours=h) for d in range(days) for h in range(24)]
+    mismatches = cells = 0
+    for travel_class in get_fare_table().class_labels:
+        for base in bases:
+            expected = [rule_chain_price(base, dep, booking_date, travel_class) for dep in departures]
+            batch = calculate_prices(departures, [base] * len(departures), booking_date, travel_class).tolist()
+            for dep, want, got in zip(departures, expected, batch):
+                scalar = calculate_price(base, SimpleNamespace(departure_time=dep), booking_date, travel_class, None)
+                if scalar != want or got != want:
+                    mismatches += 1
+                    if mismatches <= 20:
+                        print(f"{dep:%Y-%m-%d %H:00} {travel_class} base {base}: rules {want}, "
+                              f"calculate_price {scalar}, calculate_prices {got}")
+            cells += len(departures)
+    print(f"{mismatches} of {cells} quotes differ from the rules")
+    return 1 if mismatches else 0
+
+def _load_rules(path):
+    if path is None:
+        return _rules
+    with open(path) as f:
+        return json.load(f)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dump and diff the compiled fare table.")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    dump_cmd = sub.add_parser("dump", help="Write the compiled table as TSV")
+    dump_cmd.add_argument("--rules", help="JSON rules file (default: built-in rules)")
+    dump_cmd.add_argument("-o", "--output", help="Output file (default: stdout)")
+
+    diff_cmd = sub.add_parser("diff", help="Compare a saved dump with another dump or with the rules")
+    diff_cmd.add_argument("old", help="Previously saved dump")
+    diff_cmd.add_argument("new", nargs="?", help="Dump to compare against (default: compile --rules)")
+    diff_cmd.add_argument("--rules", help="JSON rules file (default: built-in rules)")
+
+    check_cmd = sub.add_parser("check", help="Check table quotes against the rules over a full grid")
+    check_cmd.add_argument("--days", type=int, default=400, help="Departure days from today")
+    check_cmd.add_argument("--base", type=int, nargs="+", default=[3500, 2999, 4250, 7777])
+
+    args = parser.parse_args(argv)
+
+    if args.command == "check":
+        return check_grid(args.days, args.base)
+
+    if args.command == "dump":
+        table = FareTable(_load_rules(args.rules))
+        if args.output:
+            with open(args.output, "w") as f:
+                table.dump(f)
+        else:
+            table.dump(sys.stdout)
+        return 0
+
+    old = load_table_dump(args.old)
+    if args.new:
+        new = load_table_dump(args.new)
+    else:
+        new = {tuple(key): mult for *key, mult in FareTable(_load_rules(args.rules)).rows()}
+
+    changes = diff_tables(old, new)
+    for key, before, after in changes:
+        before_s = "-" if before is None else f"{before:.6f}"
+        after_s = "-" if after is None else f"{after:.6f}"
+        pct = f" ({(after / before - 1) * 100:+.1f}%)" if before and after is not None else ""
+        print(f"{' '.join(key)}: {before_s} -> {after_s}{pct}")
+    print(f"{len(changes)} of {len(set(old) | set(new))} cells changed")
+    return 1 if changes else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,235 @@
+"""
+Bulk e-ticket re-issue.
+
+Streams bookings and their passengers out of Postgres with a server-side
+cursor, renders the tickets on a process pool and writes one PDF per PNR to
+an output directory. Files are written atomically and existing ones are
+skipped, so an interrupted run picks up where it stopped when re-run with
+the same output directory.
+
+    python reissue_tickets.py --flight 6E-334-HYDGOI-20261020 --out reissue/
+    python reissue_tickets.py --since 2026-10-01 --out reissue/ --archive reissue.zip
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import zipfile
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+import flight_data
+import migrations
+import pricing
+import utils
+
+FETCH_SIZE = 2000   # rows per round trip from the server-side cursor
+
+BOOKINGS_SQL = """
+    SELECT b.pnr, b.booking_date, b.total_amount, b.outbound_flight_id, b.return_flight_id,
+           p.first_name, p.last_name, p.gender
+    FROM bookings b
+    JOIN passengers p ON p.pnr = b.pnr AND p.booking_date = b.booking_date
+    WHERE {where}
+    ORDER BY b.pnr, p.id;
+"""
+
+# Same join and filter as BOOKINGS_SQL, which yields one booking per PNR
+COUNT_SQL = """
+    SELECT count(DISTINCT b.pnr)
+    FROM bookings b
+    JOIN passengers p ON p.pnr = b.pnr AND p.booking_date = b.booking_date
+    WHERE {where};
+"""
+
+FLIGHT_SQL = """
+    SELECT id, airline, flight_number, departure_time, arrival_time, duration, stops,
+           from_city, to_city, base_price
+    FROM flights WHERE id = %s;
+"""
+
+def booking_filter(flights=None, pnrs=None, since=None, until=None):
+    """WHERE clause and parameters selecting the bookings to re-issue."""
+    clauses, params = [], []
+    if flights:
+        clauses.append("(b.outbound_flight_id = ANY(%s) OR b.return_flight_id = ANY(%s))")
+        params += [list(flights), list(flights)]
+    if pnrs:
+        clauses.append("b.pnr = ANY(%s)")
+        params.append(list(pnrs))
+    if since:
+        clauses.append("b.booking_date >= %s")
+        params.append(since)
+    if until:
+        clauses.append("b.booking_date < %s")
+        params.append(until)
+    return " AND ".join(clauses) or "TRUE", params
+
+def fare_from_total(total, num_pax):
+    """
+    Only the total is stored with a booking, so the breakdown printed on a
+    re-issued ticket is rebuilt from it using the standard per-passenger fees.
+    Add-ons are folded into the base fare.
+    """
+    fees = pricing.calculate_total_fare(0, 0, {'adults': num_pax, 'children': 0})
+    fixed = fees['convenience_fee'] + fees['psf'] + fees['fuel_surcharge']
+    base_fare = max(float(total) - fixed, 0) / 1.05
+    return {
+        "base_fare": base_fare,
+        "convenience_fee": fees['convenience_fee'],
+        "psf": fees['psf'],
+        "fuel_surcharge": fees['fuel_surcharge'],
+        "gst": base_fare * 0.05,
+        "addons": 0,
+        "total": round(float(total)),
+    }
+
+class FlightLookup:
+    """Flights by ID from the inventory, regenerated from the schedule if never persisted."""
+
+    def __init__(self, conn):
+        self.conn = conn
+        self._flights = {}
+
+    def get(self, fid):
+        if fid not in self._flights:
+            cur = self.conn.cursor()
+            cur.execute(FLIGHT_SQL, (fid,))
+            row = cur.fetchone()
+            cur.close()
+            self._flights[fid] = flight_data.flight_from_row(row) if row else flight_data.find_flight(fid)
+        return self._flights[fid]
+
+def stream_bookings(conn, where, params, fetch_size=FETCH_SIZE):
+    """
+    Yields (pnr, booking_date, total_amount, outbound_id, return_id, passengers) per booking.
+    Rows arrive ordered by PNR, so a booking is complete when the PNR changes.
+    """
+    cur = conn.cursor(name="reissue_bookings")   # named => server-side cursor
+    cur.itersize = fetch_size
+    cur.execute(BOOKINGS_SQL.format(where=where), params)
+    booking = None
+    for pnr, booked, total, out_id, ret_id, first, last, gender in cur:
+        if booking is None or booking[0] != pnr:
+            if booking is not None:
+                yield booking
+            booking = (pnr, booked, total, out_id, ret_id, [])
+        booking[5].append({'first_name': first, 'last_name': last, 'gender': gender})
+    if booking is not None:
+        yield booking
+    cur.close()
+
+def ticket_path(out_dir, pnr):
+    return os.path.join(out_dir, f"{pnr}.pdf")
+
+def render_to_file(booking_data, pnr, fare_breakdown, out_dir):
+    """Runs in a worker process; writes via a temp file so partial PDFs never look done."""
+    pdf_bytes = utils.generate_ticket_pdf(booking_data, pnr, fare_breakdown)
+    fd, tmp = tempfile.mkstemp(dir=out_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    os.replace(tmp, ticket_path(out_dir, pnr))
+    return pnr
+
+def count_bookings(conn, where, params):
+    cur = conn.cursor()
+    cur.execute(COUNT_SQL.format(where=where), params)
+    total = cur.fetchone()[0]
+    cur.close()
+    return total
+
+def reissue(conn, out_dir, where="TRUE", params=(), workers=None, progress=None):
+    """
+    Re-renders tickets for the matching bookings into `out_dir`.
+    Returns {'total', 'rendered', 'skipped', 'failed': [(pnr, error)]}.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    workers = workers or os.cpu_count() or 1
+    stats = {"total": count_bookings(conn, where, list(params)), "rendered": 0, "skipped": 0, "failed": []}
+    flights = FlightLookup(conn)
+    in_flight = {}
+    max_in_flight = workers * 4   # bounds memory however many bookings match
+
+    def collect(done):
+        for future in done:
+            pnr = in_flight.pop(future)
+            try:
+                future.result()
+                stats["rendered"] += 1
+            except Exception as e:
+                stats["failed"].append((pnr, e))
+        if progress:
+            progress(stats)
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        for pnr, booked, total, out_id, ret_id, passengers in stream_bookings(conn, where, list(params)):
+            if os.path.exists(ticket_path(out_dir, pnr)):
+                stats["skipped"] += 1
+                continue
+            booking_data = {
+                'selected_outbound': flights.get(out_id),
+                'selected_return': flights.get(ret_id),
+                'passenger_details': passengers,
+                'booking_date': booked,
+            }
+            if booking_data['selected_outbound'] is None or booking_data['selected_return'] is None:
+                stats["failed"].append((pnr, LookupError("flight not found")))
+                continue
+            fare_breakdown = fare_from_total(total, len(passengers))
+            future = pool.submit(render_to_file, booking_data, pnr, fare_breakdown, out_dir)
+            in_flight[future] = pnr
+            if len(in_flight) >= max_in_flight:
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            collect(done)
+    conn.commit()
+    return stats
+
+def write_archive(out_dir, archive_path):
+    """Packs every ticket in `out_dir` into a zip. Returns the number of files."""
+    names = sorted(n for n in os.listdir(out_dir) if n.endswith(".pdf"))
+    tmp = archive_path + ".tmp"
+    with zipfile.ZipFile(tmp, "w", zipfile.ZIP_DEFLATED) as zf:
+        for name in names:
+            zf.write(os.path.join(out_dir, name), name)
+    os.replace(tmp, archive_path)
+    return len(names)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-issue e-tickets in bulk.")
+    parser.add_argument("--out", required=True, help="Output directory (re-run with the same one to resume)")
+    parser.add_argument("--archive", help="Also pack the tickets into this .zip when done")
+    parser.add_argument("--flight", action="append", help="Re-issue bookings on this flight ID (repeatable)")
+    parser.add_argument("--pnr", action="append", help="Re-issue this PNR (repeatable)")
+    parser.add_argument("--since", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), help="Booked on/after (YYYY-MM-DD)")
+    parser.add_argument("--until", type=lambda s: datetime.strptime(s, "%Y-%m-%d"), help="Booked before (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Render processes (default: CPU count)")
+    args = parser.parse_args(argv)
+
+    where, params = booking_filter(args.flight, args.pnr, args.since, args.until)
+    conn = migrations.connect()
+    start = time.perf_counter()
+
+    def progress(stats):
+        done = stats["rendered"] + stats["skipped"] + len(stats["failed"])
+        rate = stats["rendered"] / max(time.perf_counter() - start, 1e-9)
+        print(f"\r{done}/{stats['total']} bookings: {stats['rendered']} rendered, {stats['skipped']} skipped, "
+              f"{len(stats['failed'])} failed ({rate:,.0f} tickets/s)", end="", flush=True)
+
+    try:
+        stats = reissue(conn, args.out, where, params, args.workers, progress)
+    finally:
+        conn.close()
+    progress(stats)
+    print(f"\nDone in {time.perf_counter() - start:.1f}s")
+    for pnr, error in stats["failed"]:
+        print(f"  {pnr}: {error}")
+    if args.archive:
+        print(f"Archived {write_archive(args.out, args.archive)} tickets to {args.archive}")
+    return 1 if stats["failed"] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
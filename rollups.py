@@ -0,0 +1,252 @@
+"""
+Revenue and load-factor rollups for the dashboards.
+
+revenue_daily (day x travel class) and flight_sales (flight x travel class x
+booking month) are kept current by the booking write itself (see
+db.SAVE_BOOKING_SQL), so the dashboard queries here read a few small rows
+instead of scanning bookings. `rebuild` recomputes both from scratch, e.g.
+after a manual fix to bookings. Months archived off the bookings table keep
+their rollups; `check` confirms that on a scratch schema by archiving and
+rebuilding there:
+
+    python rollups.py daily --start 2026-10-01 --end 2026-10-31
+    python rollups.py flights --date 2026-10-20
+    python rollups.py verify
+    python rollups.py rebuild
+    python rollups.py check
+"""
+import argparse
+import sys
+import tempfile
+from datetime import date, datetime, timedelta
+import archive_bookings
+import migrations
+import seat_inventory
+
+PASSENGER_COUNTS = "(SELECT pnr, count(*) AS n FROM passengers GROUP BY pnr)"
+
+# Must aggregate exactly like the rollup CTEs in db.SAVE_BOOKING_SQL
+DAILY_FROM_BOOKINGS = f"""
+    SELECT b.booking_date::date, COALESCE(b.travel_class, 'Unknown'), count(*),
+           COALESCE(sum(pc.n), 0), COALESCE(sum(b.total_amount), 0)
+    FROM bookings b
+    LEFT JOIN {PASSENGER_COUNTS} pc ON pc.pnr = b.pnr
+    GROUP BY 1, 2
+"""
+
+FLIGHTS_FROM_BOOKINGS = f"""
+    SELECT leg.flight_id, COALESCE(b.travel_class, 'Unknown'), date_trunc('month', b.booking_date)::date,
+           count(*), COALESCE(sum(pc.n), 0), COALESCE(sum(b.total_amount / 2), 0)
+    FROM bookings b
+    LEFT JOIN {PASSENGER_COUNTS} pc ON pc.pnr = b.pnr
+    CROSS JOIN LATERAL (VALUES (b.outbound_flight_id), (b.return_flight_id)) AS leg(flight_id)
+    WHERE leg.flight_id IS NOT NULL
+    GROUP BY 1, 2, 3
+"""
+
+# Archived months (archive_bookings.py) are gone from bookings but stay in the
+# rollups, so rebuild and verify only touch the months online bookings still
+# cover. A flight sold in both archived and online months keeps its archived
+# months' flight_sales rows.
+ONLINE_MONTHS = "(SELECT DISTINCT date_trunc('month', booking_date)::date FROM bookings)"
+ONLINE_DAYS = f"date_trunc('month', day)::date IN {ONLINE_MONTHS}"
+ONLINE_FLIGHTS = f"month IN {ONLINE_MONTHS}"
+
+def rebuild(conn):
+    """
+    Recomputes both rollups from online bookings in one transaction. The
+    table lock makes bookings written meanwhile wait and be added on top afterwards.
+    """
+    cur = conn.cursor()
+    try:
+        cur.execute("LOCK TABLE revenue_daily, flight_sales IN EXCLUSIVE MODE;")
+        cur.execute(f"DELETE FROM revenue_daily WHERE {ONLINE_DAYS};")
+        cur.execute("INSERT INTO revenue_daily (day, travel_class, bookings, passengers, revenue) "
+                    + DAILY_FROM_BOOKINGS + ";")
+        days = cur.rowcount
+        cur.execute(f"DELETE FROM flight_sales WHERE {ONLINE_FLIGHTS};")
+        cur.execute("INSERT INTO flight_sales (flight_id, travel_class, month, bookings, seats_sold, revenue) "
+                    + FLIGHTS_FROM_BOOKINGS + ";")
+        flights = cur.rowcount
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.close()
+    return days, flights
+
+def verify(conn):
+    """Rows where a rollup disagrees with a fresh aggregation: [(table, key, rollup, expected)]."""
+    checks = [
+        ("revenue_daily", ["day", "travel_class"], "bookings, passengers, revenue", ONLINE_DAYS,
+         DAILY_FROM_BOOKINGS),
+        ("flight_sales", ["flight_id", "travel_class", "month"], "bookings, seats_sold, revenue", ONLINE_FLIGHTS,
+         FLIGHTS_FROM_BOOKINGS),
+    ]
+    drift = []
+    cur = conn.cursor()
+    for table, keys, values, online, expected_sql in checks:
+        k = [f"k{i}" for i in range(len(keys))]
+        cur.execute(f"""
+            SELECT {", ".join(f"coalesce(r.{c}, e.{c})" for c in k)}, r.v1, r.v2, r.v3, e.v1, e.v2, e.v3
+            FROM (SELECT {", ".join(keys)}, {values} FROM {table} WHERE {online}) AS r({", ".join(k)}, v1, v2, v3)
+            FULL JOIN ({expected_sql}) AS e({", ".join(k)}, v1, v2, v3)
+                ON {" AND ".join(f"e.{c} = r.{c}" for c in k)}
+            WHERE (r.v1, r.v2, r.v3) IS DISTINCT FROM (e.v1, e.v2, e.v3);
+        """)
+        n = len(keys)
+        drift.extend((table, tuple(row[:n]), row[n:n + 3], row[n + 3:]) for row in cur.fetchall())
+    cur.close()
+    conn.rollback()
+    return drift
+
+def totals(conn):
+    """Grand totals of both rollups: {table: (bookings, passengers or seats sold, revenue)}."""
+    cur = conn.cursor()
+    result = {}
+    for table, columns in (("revenue_daily", "bookings, passengers, revenue"),
+                           ("flight_sales", "bookings, seats_sold, revenue")):
+        cur.execute(f"SELECT {', '.join(f'COALESCE(sum({c}), 0)' for c in columns.split(', '))} FROM {table};")
+        result[table] = cur.fetchone()
+    cur.close()
+    conn.rollback()
+    return result
+
+CHECK_SCHEMA = "rollups_check"
+
+def check_archive(conn, months=4, bookings_per_month=50, keep_months=2):
+    """
+    Books the same few flights across the last `months` months in a scratch
+    schema, archives all but `keep_months` of them and rebuilds the rollups.
+    Returns (totals before, totals after, drift after); the totals must match
+    and the drift be empty. Leaves the connection's search_path alone.
+    """
+    import db   # only this check writes bookings
+    cur = conn.cursor()
+    cur.execute(f"DROP SCHEMA IF EXISTS {CHECK_SCHEMA} CASCADE; CREATE SCHEMA {CHECK_SCHEMA};")
+    cur.execute(f"SET search_path TO {CHECK_SCHEMA};")
+    conn.commit()
+    try:
+        migrations.migrate(conn)
+        this_month = date.today().replace(day=1)
+        first_month = archive_bookings.add_months(this_month, 1 - months)
+        cur.execute("SELECT create_booking_partitions(%s, %s);", (first_month, this_month))
+        conn.commit()
+        for m in range(months):
+            month = archive_bookings.add_months(first_month, m)
+            for i in range(bookings_per_month):
+                db.write_booking_params(conn, {
+                    'pnr': f"R{m:02d}{i:04d}", 'idempotency_key': f"r{m}-{i}",
+                    'booking_date': datetime.combine(month, datetime.min.time()) + timedelta(hours=i),
+                    'outbound_flight_id': f"F{i % 5}", 'return_flight_id': f"G{i % 3}",
+                    'total_amount': 1000 + 37 * i, 'contact_email': "check@example.com",
+                    'contact_phone': "9999999999", 'status': "CONFIRMED",
+                    'travel_class': ("Economy", "Business")[i % 2],
+                    'first_names': ["A"] * (1 + i % 3), 'last_names': ["B"] * (1 + i % 3),
+                    'genders': ["Other"] * (1 + i % 3), 'seats_outbound': ["N/A"] * (1 + i % 3),
+                    'seats_return': ["N/A"] * (1 + i % 3),
+                })
+        before = totals(conn)
+        with tempfile.TemporaryDirectory() as out_dir:
+            archive_bookings.maintain(conn, out_dir, keep_months)
+        rebuild(conn)
+        return before, totals(conn), verify(conn)
+    finally:
+        conn.rollback()
+        cur.execute(f"DROP SCHEMA {CHECK_SCHEMA} CASCADE; RESET search_path;")
+        conn.commit()
+        cur.close()
+
+def revenue_by_day(conn, start, end):
+    """[(day, bookings, passengers, revenue)] for start <= day <= end, all classes summed."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT day, sum(bookings), sum(passengers), sum(revenue)
+        FROM revenue_daily
+        WHERE day BETWEEN %s AND %s
+        GROUP BY day ORDER BY day;
+    """, (start, end))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def revenue_by_class(conn, start, end):
+    """[(travel_class, bookings, passengers, revenue)] over start <= day <= end, highest revenue first."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT travel_class, sum(bookings), sum(passengers), sum(revenue)
+        FROM revenue_daily
+        WHERE day BETWEEN %s AND %s
+        GROUP BY travel_class ORDER BY sum(revenue) DESC;
+    """, (start, end))
+    rows = cur.fetchall()
+    cur.close()
+    return rows
+
+def flight_load(conn, departure_date=None, capacity=None):
+    """
+    [(flight_id, seats_sold, capacity, load_factor, revenue)], fullest first.
+    Optionally limited to flights departing on `departure_date` (flights
+    missing from the flights table are then left out).
+    """
+    capacity = capacity or seat_inventory.SeatLayout().num_seats
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT s.flight_id, sum(s.seats_sold), sum(s.revenue)
+        FROM flight_sales s
+        LEFT JOIN flights f ON f.id = s.flight_id
+        WHERE %(day)s::date IS NULL OR f.departure_date = %(day)s::date
+        GROUP BY s.flight_id ORDER BY sum(s.seats_sold) DESC, s.flight_id;
+    """, {'day': departure_date})
+    rows = [(flight_id, seats, capacity, seats / capacity, revenue) for flight_id, seats, revenue in cur.fetchall()]
+    cur.close()
+    return rows
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Revenue and load-factor rollups.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("rebuild", help="Recompute the rollups from bookings")
+    sub.add_parser("verify", help="Compare the rollups with a fresh aggregation")
+    sub.add_parser("check", help="Archive and rebuild in a scratch schema; totals must not change")
+    daily = sub.add_parser("daily", help="Revenue per day and per class")
+    daily.add_argument("--start", type=date.fromisoformat, default=date.today() - timedelta(days=30))
+    daily.add_argument("--end", type=date.fromisoformat, default=date.today())
+    flights = sub.add_parser("flights", help="Seats sold and load factor per flight")
+    flights.add_argument("--date", type=date.fromisoformat, help="Departure date")
+    flights.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    conn = migrations.connect()
+    try:
+        if args.command == "rebuild":
+            days, flight_rows = rebuild(conn)
+            print(f"Rebuilt {days} day/class rows and {flight_rows} flight/class rows")
+        elif args.command == "verify":
+            drift = verify(conn)
+            for table, key, rollup, expected in drift:
+                print(f"{table} {key}: rollup {rollup}, bookings say {expected}")
+            print("Rollups match bookings" if not drift else f"{len(drift)} row(s) drifted; run `rebuild`")
+            return 1 if drift else 0
+        elif args.command == "check":
+            before, after, drift = check_archive(conn)
+            for table in before:
+                print(f"{table}: before {tuple(before[table])}, after archive + rebuild {tuple(after[table])}")
+            ok = before == after and not drift
+            print("Archive and rebuild keep the totals" if ok else f"Totals changed; {len(drift)} row(s) drifted")
+            return 0 if ok else 1
+        elif args.command == "daily":
+            for day, bookings, passengers, revenue in revenue_by_day(conn, args.start, args.end):
+                print(f"{day}  {bookings:6,} bookings  {passengers:6,} pax  ₹{revenue:>14,.2f}")
+            print()
+            for travel_class, bookings, passengers, revenue in revenue_by_class(conn, args.start, args.end):
+                print(f"{travel_class:<16} {bookings:6,} bookings  {passengers:6,} pax  ₹{revenue:>14,.2f}")
+        else:
+            for flight_id, seats, capacity, load, revenue in flight_load(conn, args.date)[:args.limit]:
+                print(f"{flight_id:<28} {seats:4}/{capacity}  {load:6.1%}  ₹{revenue:>12,.2f}")
+    finally:
+        conn.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
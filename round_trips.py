@@ -0,0 +1,79 @@
+"""
+Best round-trip combinations of an outbound and a return result set.
+
+The total from pricing.calculate_total_fare only grows with outbound + return
+price (the fees are per passenger, GST a fixed share of the base fare), so the
+k cheapest trips are the k smallest price sums. Each leg's options are sorted
+once and the pairs taken in order from the (outbound, return) grid with a
+frontier heap: O(n log n + k log k) rather than the n x m product. Ranking by
+duration works the same way on flight time.
+"""
+import heapq
+from dataclasses import dataclass
+from datetime import timedelta
+import flight_data
+import pricing
+
+SORT_KEYS = ("price", "duration")
+# A return must leave at least this long after the outbound lands
+MIN_TURNAROUND = timedelta(hours=2)
+
+@dataclass(frozen=True, slots=True)
+class RoundTrip:
+    outbound: flight_data.Flight
+    return_flight: flight_data.Flight
+    outbound_price: int
+    return_price: int
+    fare: dict  # pricing.calculate_total_fare breakdown
+
+    @property
+    def total(self):
+        return self.fare["total"]
+
+    @property
+    def duration(self):
+        """Scheduled minutes of both flights together."""
+        return self.outbound.duration + self.return_flight.duration
+
+def top_round_trips(outbound, outbound_prices, returns, return_prices, passengers, k=10,
+                    sort_by="price", addons_cost=0, min_turnaround=MIN_TURNAROUND):
+    """
+    The `k` best RoundTrips, cheapest (ties: shortest) or shortest (ties:
+    cheapest) first. `*_prices` are per-passenger quotes aligned with the
+    flights (see pricing.price_flights); `passengers` is as for
+    calculate_total_fare.
+    """
+    if sort_by not in SORT_KEYS:
+        raise ValueError(f"sort_by must be one of {SORT_KEYS}")
+
+    def ranked(flights, prices):
+        legs = [((p, f.duration) if sort_by == "price" else (f.duration, p), f, p)
+                for f, p in zip(flights, prices)]
+        legs.sort(key=lambda leg: (leg[0], leg[1].id))
+        return legs
+
+    out, ret = ranked(outbound, outbound_prices), ranked(returns, return_prices)
+    if not out or not ret:
+        return []
+
+    def entry(i, j):
+        (a1, b1), (a2, b2) = out[i][0], ret[j][0]
+        return (a1 + a2, b1 + b2, i, j)
+
+    # Every (i, j) is pushed once: by (i, j - 1), or by (i - 1, 0) when j == 0
+    frontier = [entry(0, 0)]
+    trips = []
+    while frontier and len(trips) < k:
+        _, _, i, j = heapq.heappop(frontier)
+        if j + 1 < len(ret):
+            heapq.heappush(frontier, entry(i, j + 1))
+        if j == 0 and i + 1 < len(out):
+            heapq.heappush(frontier, entry(i + 1, 0))
+
+        _, outbound_flight, outbound_price = out[i]
+        _, return_flight, return_price = ret[j]
+        if return_flight.departure_time < outbound_flight.arrival_time + min_turnaround:
+            continue
+        fare = pricing.calculate_total_fare(outbound_price, return_price, passengers, addons_cost)
+        trips.append(RoundTrip(outbound_flight, return_flight, outbound_price, return_price, fare))
+    return trips
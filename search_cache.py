@@ -0,0 +1,100 @@
+"""
+Process-wide flight search cache shared by all sessions.
+
+Each (from_city, to_city, date) schedule is stored once, as a compact blob:
+flights become tuples of plain values (times as epoch minutes) packed with
+marshal, which is a fraction of the size of the live Flight objects. Entries are evicted least-recently-used
+beyond SEARCH_CACHE_MAX_ENTRIES or SEARCH_CACHE_MAX_MB, and expire after
+SEARCH_CACHE_TTL seconds. Concurrent misses on the same key load it once.
+"""
+import marshal
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+import cache
+import flight_data
+
+MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "4096"))
+MAX_BYTES = int(float(os.getenv("SEARCH_CACHE_MAX_MB", "32")) * 1024 * 1024)
+TTL = float(os.getenv("SEARCH_CACHE_TTL", "900"))
+WARM_DAYS = int(os.getenv("SEARCH_CACHE_WARM_DAYS", "14"))
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+
+def encode(flights):
+    """Flights -> bytes. Schedules are on whole minutes, so nothing is lost."""
+    return marshal.dumps(tuple(
+        (f.id, f.airline, f.flight_number, (f.departure_time - EPOCH) // MINUTE,
+         (f.arrival_time - EPOCH) // MINUTE, f.duration, f.stops, f.from_city, f.to_city, f.base_price)
+        for f in flights))
+
+def decode(blob):
+    """bytes -> Flights."""
+    return [flight_data.Flight(fid, airline, number, EPOCH + dep * MINUTE, EPOCH + arr * MINUTE,
+                               duration, stops, from_city, to_city, base_price)
+            for fid, airline, number, dep, arr, duration, stops, from_city, to_city, base_price
+            in marshal.loads(blob)]
+
+class FlightSearchCache:
+    """Caches `source(from_city, to_city, date)` results."""
+
+    def __init__(self, source, max_entries=MAX_ENTRIES, max_bytes=MAX_BYTES, ttl=TTL, clock=time.monotonic):
+        self.source = source
+        self._cache = cache.TTLCache(maxsize=max_entries, ttl=ttl, clock=clock, max_bytes=max_bytes)
+        self._loading = {}   # key -> Event set when the in-flight load finishes
+        self._lock = threading.Lock()
+        self.loads = 0
+        self.load_seconds = 0.0
+        self.warmed = 0
+
+    def get(self, from_city, to_city, date):
+        key = (from_city, to_city, date)
+        while True:
+            blob = self._cache.get(key)
+            if blob is not None:
+                return decode(blob)
+            with self._lock:
+                done = self._loading.get(key)
+                if done is None:
+                    done = self._loading[key] = threading.Event()
+                    break
+            # Another session is loading this key; wait for it rather than query again
+            done.wait()
+        try:
+            start = time.perf_counter()
+            flights = self.source(from_city, to_city, date)
+            blob = encode(flights)
+            self._cache.put(key, blob)
+            with self._lock:
+                self.loads += 1
+                self.load_seconds += time.perf_counter() - start
+        finally:
+            with self._lock:
+                del self._loading[key]
+            done.set()
+        return decode(blob)
+
+    def warm(self, routes, days=WARM_DAYS, start=None):
+        """Loads the next `days` days of each (from_city, to_city) route, nearest days first."""
+        start = start or datetime.now().date()
+        for i in range(days):
+            for from_city, to_city in routes:
+                self.get(from_city, to_city, start + timedelta(days=i))
+                self.warmed += 1
+
+    def start_warmup(self, routes, days=WARM_DAYS):
+        thread = threading.Thread(target=self.warm, args=(routes, days), daemon=True, name="search-cache-warmup")
+        thread.start()
+        return thread
+
+    def invalidate(self, from_city, to_city, date):
+        self._cache.invalidate((from_city, to_city, date))
+
+    def stats(self):
+        stats = self._cache.stats()
+        with self._lock:
+            stats.update(loads=self.loads, warmed=self.warmed,
+                         load_ms_avg=self.load_seconds * 1000 / self.loads if self.loads else 0.0)
+        return stats
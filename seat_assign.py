@@ -0,0 +1,223 @@
+"""
+Automatic seat assignment for a party.
+
+Works on the seat inventory's occupancy bitmap one row at a time: a row's
+free seats are a `len(columns)`-bit int, so "is this block free?" is a single
+AND against a precomputed block mask. Each party is packed into seating
+units (an adult with up to two children either side, or an adult alone) so
+no child is seated away from an adult, and the units are placed as:
+
+1. one block in a single row, else
+2. blocks in consecutive rows (fewest rows first), else
+3. one block per unit, anywhere in the cabin, else
+4. the first free seats from the front.
+
+Blocks are scored on aisles crossed, single seats left stranded in the row,
+the window/aisle preference and, last, closeness to the front.
+"""
+import functools
+import math
+
+PREFERENCES = (None, "window", "aisle")
+ADULT, CHILD = "adult", "child"
+# Score weights; lower is better
+CROSS_AISLE = 10
+STRANDED_SEAT = 3
+PREFERENCE_MET = -2
+ROW = 0.01
+# Row splits tried beyond the fewest possible
+EXTRA_SPLITS = 3
+HOLD_RETRIES = 3
+
+class CabinMasks:
+    """Per-row bitmasks for a SeatLayout (see cabin_masks)."""
+
+    def __init__(self, layout):
+        self.layout = layout
+        width = len(layout.columns)
+        self.width = width
+        self.row_mask = (1 << width) - 1
+        aisles = set(layout.aisles)
+        # Bit i set when seats i and i + 1 sit side by side (no aisle between)
+        self.pairs = sum(1 << i for i in range(width - 1) if i + 1 not in aisles)
+        self.window = 1 | 1 << (width - 1)
+        self.aisle = sum(1 << i for i in range(width) if i in aisles or i + 1 in aisles)
+        # size -> [(block mask, aisles crossed)] for every start column
+        self.blocks = {
+            size: [(((1 << size) - 1) << start, sum(1 for a in aisles if start < a < start + size))
+                   for start in range(width - size + 1)]
+            for size in range(1, width + 1)
+        }
+
+    def row_free(self, unavailable, row):
+        """Free seats of a 0-based row as a row bitmap."""
+        return ~(unavailable >> (row * self.width)) & self.row_mask
+
+    def stranded(self, free):
+        """Free seats with no free neighbour on their side of the aisle."""
+        paired = free & (free >> 1) & self.pairs
+        return (free & ~(paired | paired << 1)).bit_count()
+
+    def best_block(self, free, row, size, preference):
+        """(score, block mask) of the best free `size`-seat block in the row, or None."""
+        best = None
+        for block, crossed in self.blocks.get(size, ()):
+            if free & block != block:
+                continue
+            score = CROSS_AISLE * crossed + STRANDED_SEAT * self.stranded(free & ~block) + ROW * row
+            if preference == "window" and block & self.window or preference == "aisle" and block & self.aisle:
+                score += PREFERENCE_MET
+            if best is None or score < best[0]:
+                best = (score, block)
+        return best
+
+def seating_units(kinds, children_per_adult=2):
+    """
+    Passenger indices grouped so each child sits beside an adult:
+    [child, adult, child] around each adult while children remain (just
+    [child, adult] with children_per_adult=1), then lone adults. Children
+    beyond that are added to the last unit.
+    """
+    adults = [i for i, kind in enumerate(kinds) if kind != CHILD]
+    children = [i for i, kind in enumerate(kinds) if kind == CHILD]
+    if not adults:
+        return [children] if children else []
+    units = []
+    for adult in adults:
+        unit = [adult]
+        if children:
+            unit.insert(0, children.pop(0))
+        if children and children_per_adult > 1:
+            unit.append(children.pop(0))
+        units.append(unit)
+    units[-1].extend(children)
+    return units
+
+def split_units(units, rows):
+    """Packs units in order into about `rows` chunks of similar size. Returns [[passenger index]]."""
+    target = math.ceil(sum(map(len, units)) / rows)
+    chunks = [[]]
+    for unit in units:
+        if chunks[-1] and len(chunks[-1]) + len(unit) > target:
+            chunks.append([])
+        chunks[-1].extend(unit)
+    return chunks
+
+def block_seats(masks, row, block):
+    """Seat indices of a row block, left to right."""
+    start = row * masks.width
+    return [start + c for c in range(masks.width) if block >> c & 1]
+
+def place_units(masks, unavailable, units, preference):
+    """Seats each unit as its own block, anywhere in the cabin. Returns seat indices or None."""
+    seats = []
+    for unit in units:
+        picks = [(pick, r) for r in range(masks.layout.rows)
+                 if (pick := masks.best_block(masks.row_free(unavailable, r), r, len(unit), preference))]
+        if not picks:
+            return None
+        (_, block), row = min(picks)
+        seats.extend(block_seats(masks, row, block))
+        unavailable |= block << (row * masks.width)
+    return seats
+
+def place(masks, unavailable, kinds, preference=None):
+    """
+    Seat indices (SeatLayout bit positions) for each passenger, in `kinds`
+    order, or None if fewer seats are free than passengers.
+    """
+    if preference not in PREFERENCES:
+        raise ValueError(f"preference must be one of {PREFERENCES}")
+    n = len(kinds)
+    layout = masks.layout
+    if n == 0:
+        return []
+    if n > layout.num_seats - (unavailable & layout.all_mask).bit_count():
+        return None
+
+    units = seating_units(kinds)
+    order = [i for unit in units for i in unit]
+    free_rows = [masks.row_free(unavailable, r) for r in range(layout.rows)]
+    memo = {}
+
+    def best(row, size):
+        key = (row, size)
+        if key not in memo:
+            memo[key] = masks.best_block(free_rows[row], row, size, preference)
+        return memo[key]
+
+    seats = None
+    fewest = math.ceil(n / masks.width)
+    tried = set()
+    for rows in range(fewest, min(fewest + EXTRA_SPLITS, n) + 1):
+        chunks = split_units(units, rows) if rows > 1 else [order]
+        sizes = tuple(map(len, chunks))
+        if sizes in tried or max(sizes) > masks.width:
+            continue
+        tried.add(sizes)
+        placement = None
+        for first in range(layout.rows - len(sizes) + 1):
+            picks = [best(first + i, size) for i, size in enumerate(sizes)]
+            if None in picks:
+                continue
+            score = sum(score for score, _ in picks)
+            if placement is None or score < placement[0]:
+                placement = (score, first, picks)
+        if placement is not None:
+            _, first, picks = placement
+            seats = [seat for i, (_, block) in enumerate(picks) for seat in block_seats(masks, first + i, block)]
+            break
+
+    if seats is None:
+        seats = place_units(masks, unavailable, units, preference)
+    if seats is None and kinds.count(CHILD) <= n - kinds.count(CHILD):
+        # Smaller units (one child per adult) fit into a fuller cabin
+        units = seating_units(kinds, children_per_adult=1)
+        order = [i for unit in units for i in unit]
+        seats = place_units(masks, unavailable, units, preference)
+    if seats is None:
+        # No block layout fits: the first free seats, front to back
+        seats = []
+        for r, free in enumerate(free_rows):
+            seats.extend(block_seats(masks, r, free)[:n - len(seats)])
+            if len(seats) == n:
+                break
+
+    assigned = [None] * n
+    for passenger, seat in zip(order, seats):
+        assigned[passenger] = seat
+    return assigned
+
+@functools.lru_cache(maxsize=16)
+def cabin_masks(layout):
+    return CabinMasks(layout)
+
+def assign_seats(layout, unavailable, kinds, preference=None):
+    """
+    Seat labels for a party on a flight whose taken seats are the bitmap
+    `unavailable`. `kinds` lists each passenger as "adult" or "child"; the
+    result has one label per passenger in the same order, or is None if the
+    flight can't seat them all. `preference` is None, "window" or "aisle".
+    """
+    seats = place(cabin_masks(layout), unavailable, kinds, preference)
+    return None if seats is None else [layout.label(i) for i in seats]
+
+def auto_assign(inv, flight_id, session_id, kinds, preference=None):
+    """
+    Replaces the session's held seats on the flight with an automatic
+    assignment (its current seats count as free). Returns the seat labels in
+    passenger order, or None, keeping the current seats, if the party can't
+    be seated.
+    """
+    for _ in range(HOLD_RETRIES):
+        occupied, held_by_others, own = inv.snapshot(flight_id, session_id)
+        seats = assign_seats(inv.layout, occupied | held_by_others, kinds, preference)
+        if seats is None:
+            return None
+        # Another session may have taken one of them since the snapshot
+        if inv.hold(flight_id, session_id, seats):
+            dropped = inv.layout.seats(own & ~inv.layout.mask(seats))
+            if dropped:
+                inv.release(flight_id, session_id, dropped)
+            return seats
+    return None
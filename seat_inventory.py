@@ -0,0 +1,267 @@
+"""
+Seat inventory with holds.
+
+Each flight keeps two bitmaps (Python ints, one bit per seat): seats that are
+occupied (confirmed bookings) and seats currently held by a session. Holds are
+all-or-nothing, expire after a TTL and are cleared in bulk by a background
+sweeper. All operations on a flight run under that flight's lock, so two
+sessions can never hold or confirm the same seat.
+
+The inventory lives in one process and loads sold seats from bookings once
+per flight, so another process (or a restart while holds are live) can hand
+out the same seat. The database has the final say: saving a booking claims
+its seats in `seat_claims`, and a seat claimed already fails the checkout
+(storage.SeatTaken). The caller then unconfirms the party's seats and
+refreshes the flight from the loader.
+"""
+import hashlib
+import heapq
+import random
+import threading
+import time
+
+DEFAULT_ROWS = 10
+DEFAULT_COLUMNS = "ABCDEF"
+HOLD_TTL = 600         # seconds a selected seat stays reserved for a session
+SWEEP_INTERVAL = 15    # seconds between expiry sweeps
+PRESOLD_FRACTION = 0.15
+
+class SeatUnavailable(Exception):
+    """Raised for seat labels outside the cabin layout."""
+
+class SeatLayout:
+    """
+    Maps seat labels like '12C' to bit positions. `aisles` are the column
+    indices an aisle comes before, e.g. (3, 7) for a 3-4-3 "ABCDEFGHJK"
+    wide-body; by default a single aisle splits the row in half.
+    """
+
+    def __init__(self, rows=DEFAULT_ROWS, columns=DEFAULT_COLUMNS, aisles=None):
+        self.rows = rows
+        self.columns = columns
+        self.aisles = tuple(aisles) if aisles is not None else (len(columns) // 2,)
+        self.num_seats = rows * len(columns)
+        self.all_mask = (1 << self.num_seats) - 1
+
+    def index(self, seat):
+        row, col = seat[:-1], seat[-1]
+        try:
+            r = int(row)
+            c = self.columns.index(col)
+        except ValueError:
+            raise SeatUnavailable(f"Unknown seat {seat}")
+        if not 1 <= r <= self.rows:
+            raise SeatUnavailable(f"Unknown seat {seat}")
+        return (r - 1) * len(self.columns) + c
+
+    def label(self, idx):
+        r, c = divmod(idx, len(self.columns))
+        return f"{r + 1}{self.columns[c]}"
+
+    def mask(self, seats):
+        m = 0
+        for seat in seats:
+            m |= 1 << self.index(seat)
+        return m
+
+    def seats(self, mask):
+        out = []
+        while mask:
+            low = mask & -mask
+            out.append(self.label(low.bit_length() - 1))
+            mask ^= low
+        return out
+
+def presold_seats(flight_id, layout, fraction=PRESOLD_FRACTION):
+    """Deterministic mock pre-sold seats for a flight (stands in for other channels' sales)."""
+    rng = random.Random(int.from_bytes(hashlib.sha256(flight_id.encode()).digest()[:8], "big"))
+    return layout.seats(sum(1 << i for i in rng.sample(range(layout.num_seats), int(layout.num_seats * fraction))))
+
+class FlightSeats:
+    """Occupancy for one flight. Guarded by `lock`."""
+    __slots__ = ("occupied", "held", "holds", "lock")
+
+    def __init__(self, occupied=0):
+        self.occupied = occupied
+        self.held = 0
+        self.holds = {}  # session_id -> (mask, expires_at)
+        self.lock = threading.Lock()
+
+class SeatInventory:
+    """Process-wide seat inventory keyed by flight ID."""
+
+    def __init__(self, layout=None, hold_ttl=HOLD_TTL, loader=None, clock=time.monotonic):
+        """
+        `loader(flight_id)` returns seat labels already sold for a flight; it is
+        called once per flight on first access.
+        """
+        self.layout = layout or SeatLayout()
+        self.hold_ttl = hold_ttl
+        self.loader = loader
+        self.clock = clock
+        self._flights = {}
+        self._flights_lock = threading.Lock()
+        self._expiry = []  # heap of (expires_at, flight_id, session_id); stale entries are skipped
+        self._expiry_lock = threading.Lock()
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def _flight(self, flight_id):
+        fs = self._flights.get(flight_id)
+        if fs is None:
+            sold = self.loader(flight_id) if self.loader else []
+            occupied = self.layout.mask(s for s in sold if s and s != "N/A")
+            with self._flights_lock:
+                fs = self._flights.setdefault(flight_id, FlightSeats(occupied))
+        return fs
+
+    def _set_hold(self, fs, flight_id, session_id, mask, now, ttl):
+        if mask:
+            expires_at = now + (self.hold_ttl if ttl is None else ttl)
+            fs.holds[session_id] = (mask, expires_at)
+            with self._expiry_lock:
+                heapq.heappush(self._expiry, (expires_at, flight_id, session_id))
+        else:
+            fs.holds.pop(session_id, None)
+
+    def snapshot(self, flight_id, session_id=None):
+        """Returns (occupied_mask, held_by_others_mask, own_hold_mask)."""
+        fs = self._flight(flight_id)
+        with fs.lock:
+            own = fs.holds.get(session_id, (0, 0))[0]
+            return fs.occupied, fs.held & ~own, own
+
+    def hold(self, flight_id, session_id, seats, ttl=None):
+        """
+        Adds `seats` to the session's hold on the flight and refreshes its expiry.
+        All-or-nothing: returns False (holding nothing new) if any seat is taken.
+        """
+        mask = self.layout.mask(seats)
+        fs = self._flight(flight_id)
+        now = self.clock()
+        with fs.lock:
+            own = fs.holds.get(session_id, (0, 0))[0]
+            if mask & (fs.occupied | (fs.held & ~own)):
+                return False
+            own |= mask
+            fs.held |= mask
+            self._set_hold(fs, flight_id, session_id, own, now, ttl)
+            return True
+
+    def release(self, flight_id, session_id, seats=None):
+        """Releases some (or all) of the session's held seats on the flight."""
+        fs = self._flight(flight_id)
+        with fs.lock:
+            own, expires_at = fs.holds.get(session_id, (0, 0))
+            mask = own if seats is None else own & self.layout.mask(seats)
+            fs.held &= ~mask
+            if own & ~mask:
+                fs.holds[session_id] = (own & ~mask, expires_at)
+            else:
+                fs.holds.pop(session_id, None)
+            return self.layout.seats(mask)
+
+    def confirm(self, flight_id, session_id, seats):
+        """
+        Turns seats into occupied ones. Each seat must be held by this session
+        or still free (e.g. its hold expired and nobody took it). All-or-nothing.
+        """
+        mask = self.layout.mask(seats)
+        fs = self._flight(flight_id)
+        with fs.lock:
+            own, expires_at = fs.holds.get(session_id, (0, 0))
+            if mask & (fs.occupied | (fs.held & ~own)):
+                return False
+            fs.occupied |= mask
+            fs.held &= ~mask
+            if own & ~mask:
+                fs.holds[session_id] = (own & ~mask, expires_at)
+            else:
+                fs.holds.pop(session_id, None)
+            return True
+
+    def unconfirm(self, flight_id, seats):
+        """Frees confirmed seats again, e.g. when the booking that took them could not be saved."""
+        mask = self.layout.mask(seats)
+        fs = self._flight(flight_id)
+        with fs.lock:
+            fs.occupied &= ~mask
+
+    def refresh(self, flight_id):
+        """Marks seats the loader now reports as sold occupied, e.g. ones another process sold."""
+        fs = self._flight(flight_id)
+        sold = self.loader(flight_id) if self.loader else []
+        mask = self.layout.mask(s for s in sold if s and s != "N/A")
+        with fs.lock:
+            fs.occupied |= mask
+
+    def confirm_all(self, session_id, legs):
+        """
+        Confirms seats on several flights together; `legs` is [(flight_id, seats)].
+        Every leg is re-held first, so either all legs are confirmed or none.
+        """
+        added = []  # (flight_id, seats this call newly held), undone if a later leg fails
+        for flight_id, seats in legs:
+            _, _, own = self.snapshot(flight_id, session_id)
+            if not self.hold(flight_id, session_id, seats):
+                # Holds the session had before this call stay in place
+                for a_flight, a_seats in added:
+                    self.release(a_flight, session_id, a_seats)
+                return False
+            added.append((flight_id, self.layout.seats(self.layout.mask(seats) & ~own)))
+
+        confirmed = []
+        for flight_id, seats in legs:
+            if not self.confirm(flight_id, session_id, seats):
+                # A hold expired and the seat went to someone else in between:
+                # put the confirmed legs back on hold, then drop this call's holds
+                for c_flight, c_seats in confirmed:
+                    self.unconfirm(c_flight, c_seats)
+                    self.hold(c_flight, session_id, c_seats)
+                for a_flight, a_seats in added:
+                    self.release(a_flight, session_id, a_seats)
+                return False
+            confirmed.append((flight_id, seats))
+        return True
+
+    def expire_holds(self, now=None):
+        """Clears every hold whose TTL has passed. Returns the number of seats released."""
+        now = self.clock() if now is None else now
+        due = []
+        with self._expiry_lock:
+            while self._expiry and self._expiry[0][0] <= now:
+                due.append(heapq.heappop(self._expiry))
+
+        released = 0
+        for expires_at, flight_id, session_id in due:
+            fs = self._flights.get(flight_id)
+            if fs is None:
+                continue
+            with fs.lock:
+                hold = fs.holds.get(session_id)
+                # Skip entries superseded by a later refresh of the same hold
+                if hold is None or hold[1] != expires_at:
+                    continue
+                fs.held &= ~hold[0]
+                del fs.holds[session_id]
+                released += bin(hold[0]).count("1")
+        return released
+
+    def _sweep_loop(self, interval):
+        while not self._stop.wait(interval):
+            self.expire_holds()
+
+    def start_sweeper(self, interval=SWEEP_INTERVAL):
+        """Starts a daemon thread that expires stale holds every `interval` seconds."""
+        if self._sweeper is None or not self._sweeper.is_alive():
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, args=(interval,), daemon=True,
+                                             name="seat-hold-sweeper")
+            self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join()
+            self._sweeper = None
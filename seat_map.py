@@ -0,0 +1,152 @@
+"""
+Seat map for the seat selection step, rendered as one component.
+
+The cabin is sent as its layout plus two hex bitmaps in SeatInventory's bit
+order (seats unavailable to this session, seats it has selected), so the
+payload stays a few hundred bytes even for a wide-body. The map is drawn and
+toggled in the browser; each click sends back only the diff against the
+selection it was drawn with ({"add": [...], "remove": [...]}), which the
+server applies to the session's holds in one callback.
+"""
+import streamlit as st
+import seat_inventory
+
+HTML = '<div class="sm-root"></div>'
+
+CSS = """
+.sm-grid { display: grid; gap: 6px; justify-content: center; align-items: center; }
+.sm-label { text-align: center; font-weight: bold; color: #666; font-size: 0.85rem; }
+.sm-seat { height: 2.25rem; border-radius: 8px; border: 2px solid #e5e7eb; background: #ffffff; color: #4b5563;
+           font-weight: 600; font-size: 0.75rem; cursor: pointer; transition: all 0.2s; }
+.sm-seat:hover:not(:disabled) { border-color: #00529B; background: #f0f9ff; color: #00529B; }
+.sm-seat.mine { background: #10b981; border-color: #10b981; color: white; }
+.sm-seat:disabled { background: #ef4444; border-color: #ef4444; color: white; cursor: not-allowed; }
+.sm-note { min-height: 1.5rem; margin-top: 0.5rem; text-align: center; color: #b45309; font-size: 0.9rem; }
+"""
+
+JS = """
+export default function(component) {
+    const { data, parentElement, setTriggerValue } = component;
+    const root = parentElement.querySelector(".sm-root");
+    const columns = data.columns;
+    const aisles = new Set(data.aisles);
+    // Bit i of a hex bitmap, lowest bit = seat 1A
+    const bit = (hex, i) => {
+        const d = hex.length - 1 - (i >> 2);
+        return d >= 0 && ((parseInt(hex[d], 16) >> (i & 3)) & 1) === 1;
+    };
+    const label = (i) => `${Math.floor(i / columns.length) + 1}${columns[i % columns.length]}`;
+
+    const drawn = new Set();
+    let template = "2rem";
+    let cells = '<div></div>';
+    for (let c = 0; c < columns.length; c++) {
+        if (aisles.has(c)) { template += " 1rem"; cells += "<div></div>"; }
+        template += " minmax(2.25rem, 3rem)";
+        cells += `<div class="sm-label">${columns[c]}</div>`;
+    }
+    for (let r = 0; r < data.rows; r++) {
+        cells += `<div class="sm-label">${r + 1}</div>`;
+        for (let c = 0; c < columns.length; c++) {
+            if (aisles.has(c)) cells += "<div></div>";
+            const i = r * columns.length + c;
+            const seat = label(i);
+            if (bit(data.selected, i)) {
+                drawn.add(seat);
+                cells += `<button class="sm-seat mine" data-seat="${seat}" title="Seat ${seat} (Selected)">${seat} ✓</button>`;
+            } else if (bit(data.unavailable, i)) {
+                cells += `<button class="sm-seat" disabled title="Seat ${seat} (Occupied)">${seat}</button>`;
+            } else {
+                cells += `<button class="sm-seat" data-seat="${seat}" title="Seat ${seat} (Available)">${seat}</button>`;
+            }
+        }
+    }
+    root.innerHTML = `<div class="sm-grid" style="grid-template-columns: ${template}">${cells}</div>
+        <div class="sm-note"></div>`;
+
+    const mine = new Set(drawn);
+    root.querySelector(".sm-grid").onclick = (e) => {
+        const button = e.target.closest("button[data-seat]");
+        if (!button) return;
+        const seat = button.dataset.seat;
+        if (mine.has(seat)) {
+            mine.delete(seat);
+        } else if (mine.size >= data.max) {
+            root.querySelector(".sm-note").textContent = `You can only select ${data.max} seats.`;
+            return;
+        } else {
+            mine.add(seat);
+        }
+        root.querySelector(".sm-note").textContent = "";
+        button.classList.toggle("mine", mine.has(seat));
+        button.textContent = mine.has(seat) ? `${seat} ✓` : seat;
+        // The whole diff since this map was drawn, so a repeated send is harmless
+        setTriggerValue("diff", {
+            add: [...mine].filter((s) => !drawn.has(s)),
+            remove: [...drawn].filter((s) => !mine.has(s)),
+        });
+    };
+}
+"""
+
+_seat_map = st.components.v2.component("seat_map", html=HTML, css=CSS, js=JS)
+
+def apply_diff(inv, flight_id, session_id, selected, diff, max_seats):
+    """
+    Applies a seat map diff to the session's holds and to `selected` (its
+    seat list, updated in place). Returns warnings for the user.
+    """
+    notices = []
+    remove = [seat for seat in diff.get("remove") or [] if seat in selected]
+    if remove:
+        inv.release(flight_id, session_id, remove)
+        for seat in remove:
+            selected.remove(seat)
+    for seat in diff.get("add") or []:
+        if seat in selected:
+            continue
+        if len(selected) >= max_seats:
+            notices.append(f"You can only select {max_seats} seats.")
+            break
+        try:
+            held = inv.hold(flight_id, session_id, [seat])
+        except seat_inventory.SeatUnavailable:
+            continue
+        if held:
+            selected.append(seat)
+        else:
+            notices.append(f"Seat {seat} was just taken.")
+    return notices
+
+def render_seat_map(inv, flight_id, session_id, selected, max_seats, key):
+    """
+    Renders the cabin of `flight_id` from the shared seat inventory. `selected`
+    is the session's seat list for the flight; clicks update it and the holds.
+    """
+    notices = st.session_state.pop(f"{key}_notices", [])
+
+    # Refresh our holds; drop seats whose hold expired and were taken by someone else
+    if selected and not inv.hold(flight_id, session_id, selected):
+        lost = [seat for seat in selected if not inv.hold(flight_id, session_id, [seat])]
+        for seat in lost:
+            selected.remove(seat)
+        notices.append(f"Seat(s) {', '.join(lost)} are no longer available.")
+    for notice in notices:
+        st.warning(notice)
+
+    occupied, held_by_others, _ = inv.snapshot(flight_id, session_id)
+    layout = inv.layout
+
+    def changed():
+        diff = st.session_state[key].get("diff") or {}
+        st.session_state[f"{key}_notices"] = apply_diff(inv, flight_id, session_id, selected, diff, max_seats)
+
+    _seat_map(
+        key=key,
+        data={
+            "rows": layout.rows, "columns": layout.columns, "aisles": list(layout.aisles),
+            "unavailable": f"{occupied | held_by_others:x}", "selected": f"{layout.mask(selected):x}",
+            "max": max_seats,
+        },
+        on_diff_change=changed,
+    )
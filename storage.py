@@ -0,0 +1,505 @@
+"""
+Storage backends for bookings, seats, PNR blocks and the flight inventory.
+
+db.py picks a backend from DATABASE_URL: a `sqlite:///path/to.db` URL selects
+the embedded SQLiteStorage below, anything else the Postgres backend
+(db.PostgresStorage). Both take bookings as the flat parameter dicts built by
+db.booking_params.
+
+The SQLite backend runs in WAL mode with a single writer thread that
+group-commits: every write queued while the previous transaction was
+committing goes into the next one, so concurrent checkouts share a commit
+without a lone writer ever waiting for company.
+Readers use their own per-thread connections and never block the writer.
+"""
+import abc
+import queue
+import sqlite3
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+import flight_data
+
+SQLITE_BATCH = 256          # max writes per transaction
+SQLITE_BATCH_WAIT = 0       # extra seconds the writer may wait for more writes to batch
+PNR_BLOCK_SIZE = 1000
+
+class StorageUnavailable(Exception):
+    """Raised when the backend cannot be reached right now (try again later)."""
+
+class SeatTaken(Exception):
+    """Raised when a booking's seat was already sold, possibly by another process."""
+
+class Storage(abc.ABC):
+    """Interface shared by the Postgres and SQLite backends."""
+    name = "storage"
+
+    @abc.abstractmethod
+    def init(self):
+        """Creates or migrates the schema. Safe to call repeatedly."""
+
+    @abc.abstractmethod
+    def save_booking(self, params):
+        """
+        Writes one booking with its passengers. Returns (stored_pnr, created);
+        a reused idempotency key returns the original PNR with created=False.
+        Raises SeatTaken, writing nothing, if one of its seats is already claimed.
+        """
+
+    @abc.abstractmethod
+    def replay_bookings(self, params_list):
+        """
+        Writes a batch of journaled bookings idempotently; returns the ones refused
+        for any reason but the connection. Raises StorageUnavailable if unreachable.
+        """
+
+    @abc.abstractmethod
+    def booked_seats(self, flight_id):
+        """Seat labels already confirmed on a flight, outbound and return legs."""
+
+    @abc.abstractmethod
+    def reserve_pnr_block(self):
+        """Reserves (start, size) of PNR counters no other caller will receive."""
+
+    @abc.abstractmethod
+    def get_flights(self, from_city, to_city, date):
+        """Flights for one route/day, generating and persisting the day on a miss."""
+
+    @abc.abstractmethod
+    def get_booking(self, pnr):
+        """One booking with its passengers (see booking_from_rows), or None."""
+
+    @abc.abstractmethod
+    def find_bookings(self, email=None, phone=None, limit=20, after=None):
+        """
+        A page of booking summaries for a contact email or phone, newest first.
+        `after` is the cursor returned with the previous page. Returns
+        (summaries, next_cursor); next_cursor is None on the last page.
+        """
+
+    def close(self):
+        pass
+
+BOOKING_FIELDS = ["pnr", "booking_date", "status", "total_amount", "outbound_flight_id", "return_flight_id",
+                  "contact_email", "contact_phone"]
+PASSENGER_FIELDS = ["first_name", "last_name", "gender", "seat_outbound", "seat_return"]
+SUMMARY_FIELDS = ["pnr", "booking_date", "status", "total_amount", "outbound_flight_id", "return_flight_id",
+                  "passengers"]
+
+def booking_from_rows(rows):
+    """
+    Folds booking-LEFT JOIN-passengers rows (BOOKING_FIELDS + PASSENGER_FIELDS)
+    into {..booking fields.., 'passengers': [..]}; None if there are no rows.
+    """
+    if not rows:
+        return None
+    n = len(BOOKING_FIELDS)
+    booking = dict(zip(BOOKING_FIELDS, rows[0][:n]))
+    booking['passengers'] = [dict(zip(PASSENGER_FIELDS, r[n:])) for r in rows if r[n] is not None]
+    return booking
+
+def summary_page(rows, limit):
+    """Turns limit+1 fetched SUMMARY_FIELDS rows into (summaries, next_cursor)."""
+    page = [dict(zip(SUMMARY_FIELDS, r)) for r in rows[:limit]]
+    next_cursor = (page[-1]['booking_date'], page[-1]['pnr']) if len(rows) > limit else None
+    return page, next_cursor
+
+def sqlite_path(url):
+    """'sqlite:///data/app.db' -> 'data/app.db'; None for non-SQLite URLs."""
+    if url and url.startswith("sqlite:///"):
+        return url[len("sqlite:///"):]
+    return None
+
+SQLITE_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS bookings (
+        pnr TEXT PRIMARY KEY,
+        booking_date TEXT DEFAULT CURRENT_TIMESTAMP,
+        outbound_flight_id TEXT,
+        return_flight_id TEXT,
+        total_amount NUMERIC,
+        contact_email TEXT,
+        contact_phone TEXT,
+        status TEXT,
+        idempotency_key TEXT UNIQUE,
+        travel_class TEXT
+    );
+    CREATE TABLE IF NOT EXISTS passengers (
+        id INTEGER PRIMARY KEY,
+        pnr TEXT REFERENCES bookings(pnr),
+        first_name TEXT,
+        last_name TEXT,
+        gender TEXT,
+        seat_outbound TEXT,
+        seat_return TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_passengers_pnr ON passengers (pnr);
+    CREATE INDEX IF NOT EXISTS idx_bookings_booking_date ON bookings (booking_date);
+    CREATE INDEX IF NOT EXISTS idx_bookings_outbound_flight ON bookings (outbound_flight_id);
+    CREATE INDEX IF NOT EXISTS idx_bookings_return_flight ON bookings (return_flight_id);
+    CREATE INDEX IF NOT EXISTS idx_bookings_contact_email
+        ON bookings (lower(contact_email), booking_date DESC, pnr DESC);
+    CREATE INDEX IF NOT EXISTS idx_bookings_contact_phone
+        ON bookings (contact_phone, booking_date DESC, pnr DESC);
+
+    CREATE TABLE IF NOT EXISTS flights (
+        id TEXT PRIMARY KEY,
+        airline TEXT,
+        flight_number TEXT,
+        from_city TEXT NOT NULL,
+        to_city TEXT NOT NULL,
+        departure_date TEXT NOT NULL,
+        departure_time TEXT NOT NULL,
+        arrival_time TEXT NOT NULL,
+        duration INTEGER,
+        stops TEXT,
+        base_price INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_flights_route_date
+        ON flights (from_city, to_city, departure_date, departure_time);
+
+    CREATE TABLE IF NOT EXISTS seat_claims (
+        flight_id TEXT NOT NULL,
+        seat TEXT NOT NULL,
+        pnr TEXT NOT NULL,
+        PRIMARY KEY (flight_id, seat)
+    );
+
+    CREATE TABLE IF NOT EXISTS pnr_block (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        next_start INTEGER NOT NULL
+    );
+    INSERT OR IGNORE INTO pnr_block (id, next_start) VALUES (1, 0);
+
+    CREATE TABLE IF NOT EXISTS revenue_daily (
+        day TEXT NOT NULL,
+        travel_class TEXT NOT NULL,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        passengers INTEGER NOT NULL DEFAULT 0,
+        revenue NUMERIC NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, travel_class)
+    );
+    CREATE TABLE IF NOT EXISTS flight_sales (
+        flight_id TEXT NOT NULL,
+        travel_class TEXT NOT NULL,
+        month TEXT NOT NULL,
+        bookings INTEGER NOT NULL DEFAULT 0,
+        seats_sold INTEGER NOT NULL DEFAULT 0,
+        revenue NUMERIC NOT NULL DEFAULT 0,
+        PRIMARY KEY (flight_id, travel_class, month)
+    );
+"""
+
+class SQLiteStorage(Storage):
+    """Embedded backend: one WAL-mode database file, group-committed writes."""
+    name = "sqlite"
+
+    def __init__(self, path, batch_size=SQLITE_BATCH, batch_wait=SQLITE_BATCH_WAIT, synchronous="NORMAL"):
+        self.path = path
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait
+        self.synchronous = synchronous
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        self._writer_conn = self._connect()
+        # Before the writer starts: executescript commits any open transaction
+        self._create_schema(self._writer_conn)
+        self.transactions = 0
+        self.writes = 0
+        self._writer = threading.Thread(target=self._write_loop, daemon=True, name="sqlite-writer")
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, isolation_level=None, check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute(f"PRAGMA synchronous={self.synchronous};")
+        conn.execute("PRAGMA foreign_keys=ON;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        return conn
+
+    def _reader(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def init(self):
+        # The schema is created when the storage is opened, before the writer thread starts
+        pass
+
+    @staticmethod
+    def _create_schema(conn):
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(bookings);")]
+        if columns and "travel_class" not in columns:
+            # Files created before the rollups; CREATE IF NOT EXISTS won't add it
+            conn.execute("ALTER TABLE bookings ADD COLUMN travel_class TEXT;")
+        new_claims = conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'seat_claims';").fetchone() is None
+        sales_columns = [row[1] for row in conn.execute("PRAGMA table_info(flight_sales);")]
+        if sales_columns and "month" not in sales_columns:
+            # flight_sales from before it was kept per month; nothing is archived
+            # in SQLite, so it is simply recomputed from bookings below
+            conn.execute("DROP TABLE flight_sales;")
+        conn.executescript(SQLITE_SCHEMA)
+        if sales_columns and "month" not in sales_columns:
+            conn.execute("""
+                INSERT INTO flight_sales (flight_id, travel_class, month, bookings, seats_sold, revenue)
+                SELECT leg.flight_id, COALESCE(b.travel_class, 'Unknown'), strftime('%Y-%m-01', b.booking_date),
+                       count(*), COALESCE(sum(pc.n), 0), COALESCE(sum(b.total_amount / 2.0), 0)
+                FROM bookings b
+                LEFT JOIN (SELECT pnr, count(*) AS n FROM passengers GROUP BY pnr) pc ON pc.pnr = b.pnr
+                JOIN (SELECT pnr, outbound_flight_id AS flight_id FROM bookings
+                      UNION ALL SELECT pnr, return_flight_id FROM bookings) leg ON leg.pnr = b.pnr
+                WHERE leg.flight_id IS NOT NULL
+                GROUP BY 1, 2, 3;
+            """)
+        if columns and new_claims:
+            # Files created before seat claims; the earlier booking keeps a seat sold twice
+            conn.execute("""
+                INSERT OR IGNORE INTO seat_claims (flight_id, seat, pnr)
+                SELECT leg.flight_id, leg.seat, leg.pnr FROM (
+                    SELECT b.outbound_flight_id AS flight_id, p.seat_outbound AS seat, p.pnr, b.booking_date, p.id
+                    FROM passengers p JOIN bookings b ON b.pnr = p.pnr
+                    UNION ALL
+                    SELECT b.return_flight_id, p.seat_return, p.pnr, b.booking_date, p.id
+                    FROM passengers p JOIN bookings b ON b.pnr = p.pnr
+                ) AS leg
+                WHERE leg.flight_id IS NOT NULL AND leg.seat IS NOT NULL AND leg.seat <> 'N/A'
+                ORDER BY leg.booking_date, leg.id;
+            """)
+
+    # --- writer thread ---
+
+    def _submit(self, fn, *args):
+        future = Future()
+        self._queue.put((fn, args, future))
+        return future
+
+    def _write_loop(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            batch = [item]
+            try:
+                # Everything queued while the last transaction committed joins this one
+                while len(batch) < self.batch_size:
+                    nxt = self._queue.get(timeout=self.batch_wait) if self.batch_wait else self._queue.get_nowait()
+                    if nxt is None:
+                        self._queue.put(None)
+                        break
+                    batch.append(nxt)
+            except queue.Empty:
+                pass
+            self._commit_batch(batch)
+
+    def _commit_batch(self, batch):
+        conn = self._writer_conn
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE;")
+            for i, (fn, args, _) in enumerate(batch):
+                # A savepoint per write, so one refused booking doesn't sink the batch
+                conn.execute(f"SAVEPOINT w{i};")
+                try:
+                    results.append((fn(conn, *args), None))
+                    conn.execute(f"RELEASE w{i};")
+                except Exception as e:
+                    # Any error, not just sqlite3's: an escaping one would kill the writer thread
+                    conn.execute(f"ROLLBACK TO w{i};")
+                    conn.execute(f"RELEASE w{i};")
+                    results.append((None, e))
+            conn.execute("COMMIT;")
+        except Exception as e:
+            try:
+                if conn.in_transaction:
+                    conn.execute("ROLLBACK;")
+            except sqlite3.Error:
+                pass
+            for _, _, future in batch:
+                future.set_exception(StorageUnavailable(f"SQLite commit failed: {e}"))
+            return
+        self.transactions += 1
+        self.writes += len(batch)
+        # Acknowledge only after COMMIT
+        for (_, _, future), (value, error) in zip(batch, results):
+            if error is None:
+                future.set_result(value)
+            else:
+                future.set_exception(error)
+
+    @staticmethod
+    def _insert_booking(conn, params):
+        params.setdefault('travel_class', None)
+        params.setdefault('booking_date', None)   # journal records written before booking_params set it
+        booking_date = params['booking_date']
+        if isinstance(booking_date, datetime):
+            booking_date = booking_date.isoformat(sep=" ")
+        cur = conn.execute("""
+            INSERT INTO bookings (pnr, booking_date, outbound_flight_id, return_flight_id, total_amount,
+                                  contact_email, contact_phone, status, idempotency_key, travel_class)
+            VALUES (:pnr, COALESCE(:booking_date, datetime('now', 'localtime')), :outbound_flight_id,
+                    :return_flight_id, :total_amount, :contact_email, :contact_phone, :status,
+                    :idempotency_key, :travel_class)
+            ON CONFLICT (idempotency_key) DO NOTHING;
+        """, {**params, 'booking_date': booking_date})
+        if cur.rowcount == 0:
+            row = conn.execute("SELECT pnr FROM bookings WHERE idempotency_key = ?;",
+                               (params['idempotency_key'],)).fetchone()
+            return row[0], False
+        conn.executemany("""
+            INSERT INTO passengers (pnr, first_name, last_name, gender, seat_outbound, seat_return)
+            VALUES (?, ?, ?, ?, ?, ?);
+        """, [(params['pnr'], *p) for p in zip(params['first_names'], params['last_names'], params['genders'],
+                                               params['seats_outbound'], params['seats_return'])])
+        SQLiteStorage._claim_seats(conn, params)
+        SQLiteStorage._add_to_rollups(conn, params)
+        return params['pnr'], True
+
+    @staticmethod
+    def _claim_seats(conn, params):
+        """Same claims as the Postgres seat_claim CTE; a clash undoes the booking's savepoint."""
+        claims = [(flight_id, seat, params['pnr'])
+                  for flight_id, seats in ((params['outbound_flight_id'], params['seats_outbound']),
+                                           (params['return_flight_id'], params['seats_return']))
+                  if flight_id
+                  for seat in seats if seat != "N/A"]
+        try:
+            conn.executemany("INSERT INTO seat_claims (flight_id, seat, pnr) VALUES (?, ?, ?);", claims)
+        except sqlite3.IntegrityError as e:
+            raise SeatTaken(f"Seat already sold: {e}") from e
+
+    @staticmethod
+    def _add_to_rollups(conn, params):
+        """Same aggregates as the Postgres rollup CTEs, inside the booking's savepoint."""
+        travel_class = params['travel_class'] or 'Unknown'
+        passengers = len(params['first_names'])
+        total = float(params['total_amount'])
+        conn.execute("""
+            INSERT INTO revenue_daily (day, travel_class, bookings, passengers, revenue)
+            SELECT date(booking_date), ?, 1, ?, ? FROM bookings WHERE pnr = ?
+            ON CONFLICT (day, travel_class) DO UPDATE
+                SET bookings = bookings + 1, passengers = passengers + excluded.passengers,
+                    revenue = revenue + excluded.revenue;
+        """, (travel_class, passengers, total, params['pnr']))
+        conn.executemany("""
+            INSERT INTO flight_sales (flight_id, travel_class, month, bookings, seats_sold, revenue)
+            SELECT ?, ?, strftime('%Y-%m-01', booking_date), 1, ?, ? FROM bookings WHERE pnr = ?
+            ON CONFLICT (flight_id, travel_class, month) DO UPDATE
+                SET bookings = bookings + 1, seats_sold = seats_sold + excluded.seats_sold,
+                    revenue = revenue + excluded.revenue;
+        """, [(flight_id, travel_class, passengers, total / 2, params['pnr'])
+              for flight_id in (params['outbound_flight_id'], params['return_flight_id']) if flight_id])
+
+    @staticmethod
+    def _reserve_block(conn, size):
+        start = conn.execute("UPDATE pnr_block SET next_start = next_start + ? WHERE id = 1 "
+                             "RETURNING next_start - ?;", (size, size)).fetchone()[0]
+        return start, size
+
+    @staticmethod
+    def _insert_flights(conn, flights):
+        conn.executemany("""
+            INSERT OR IGNORE INTO flights (id, airline, flight_number, from_city, to_city, departure_date,
+                                           departure_time, arrival_time, duration, stops, base_price)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
+        """, [(f.id, f.airline, f.flight_number, f.from_city, f.to_city,
+               f.departure_time.date().isoformat(), f.departure_time.isoformat(sep=' '),
+               f.arrival_time.isoformat(sep=' '), f.duration, f.stops, f.base_price)
+              for f in flights])
+        return len(flights)
+
+    # --- Storage interface ---
+
+    def save_booking(self, params):
+        return self._submit(self._insert_booking, params).result()
+
+    def save_bookings(self, params_list):
+        """Queues several bookings at once; they share transactions. Returns [(stored_pnr, created)]."""
+        futures = [self._submit(self._insert_booking, p) for p in params_list]
+        return [f.result() for f in futures]
+
+    def replay_bookings(self, params_list):
+        futures = [(p, self._submit(self._insert_booking, p)) for p in params_list]
+        rejected = []
+        for params, future in futures:
+            try:
+                future.result()
+            except StorageUnavailable:
+                raise
+            except Exception:
+                # Refused by the database or malformed; the savepoint undid just this one
+                rejected.append(params)
+        return rejected
+
+    def booked_seats(self, flight_id):
+        rows = self._reader().execute("""
+            SELECT p.seat_outbound FROM passengers p JOIN bookings b ON b.pnr = p.pnr
+            WHERE b.outbound_flight_id = ?
+            UNION ALL
+            SELECT p.seat_return FROM passengers p JOIN bookings b ON b.pnr = p.pnr
+            WHERE b.return_flight_id = ?;
+        """, (flight_id, flight_id)).fetchall()
+        return [r[0] for r in rows]
+
+    def reserve_pnr_block(self):
+        return self._submit(self._reserve_block, PNR_BLOCK_SIZE).result()
+
+    def get_flights(self, from_city, to_city, date):
+        day = date.date() if isinstance(date, datetime) else date
+        rows = self._reader().execute("""
+            SELECT id, airline, flight_number, departure_time, arrival_time, duration, stops,
+                   from_city, to_city, base_price
+            FROM flights
+            WHERE from_city = ? AND to_city = ? AND departure_date = ?
+            ORDER BY departure_time, id;
+        """, (from_city, to_city, day.isoformat())).fetchall()
+        if not rows:
+            flights = flight_data.generate_flights(from_city, to_city, date)
+            self._submit(self._insert_flights, flights).result()
+            return flights
+        return [flight_data.flight_from_row((*r[:3], datetime.fromisoformat(r[3]), datetime.fromisoformat(r[4]),
+                                             *r[5:]))
+                for r in rows]
+
+    def get_booking(self, pnr):
+        rows = self._reader().execute(f"""
+            SELECT {", ".join("b." + c for c in BOOKING_FIELDS)}, {", ".join("p." + c for c in PASSENGER_FIELDS)}
+            FROM bookings b LEFT JOIN passengers p ON p.pnr = b.pnr
+            WHERE b.pnr = ?
+            ORDER BY p.id;
+        """, (pnr,)).fetchall()
+        booking = booking_from_rows(rows)
+        if booking is not None:
+            booking['booking_date'] = datetime.fromisoformat(booking['booking_date'])
+        return booking
+
+    def find_bookings(self, email=None, phone=None, limit=20, after=None):
+        if email:
+            where, params = "lower(b.contact_email) = lower(?)", [email]
+        elif phone:
+            where, params = "b.contact_phone = ?", [phone]
+        else:
+            raise ValueError("find_bookings needs an email or a phone number")
+        if after is not None:
+            # Keyset pagination: resume below the last row of the previous page
+            where += " AND (b.booking_date, b.pnr) < (?, ?)"
+            params += [after[0].isoformat(sep=" "), after[1]]
+        rows = self._reader().execute(f"""
+            SELECT b.pnr, b.booking_date, b.status, b.total_amount, b.outbound_flight_id, b.return_flight_id,
+                   (SELECT count(*) FROM passengers p WHERE p.pnr = b.pnr)
+            FROM bookings b
+            WHERE {where}
+            ORDER BY b.booking_date DESC, b.pnr DESC
+            LIMIT ?;
+        """, params + [limit + 1]).fetchall()
+        # booking_date is stored as text; hand it out as a datetime like Postgres does
+        return summary_page([(r[0], datetime.fromisoformat(r[1])) + tuple(r[2:]) for r in rows], limit)
+
+    def stats(self):
+        return {"transactions": self.transactions, "writes": self.writes,
+                "writes_per_transaction": self.writes / self.transactions if self.transactions else 0.0,
+                "queued": self._queue.qsize()}
+
+    def close(self):
+        self._queue.put(None)
+        self._writer.join()
+        self._writer_conn.close()
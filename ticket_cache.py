@@ -0,0 +1,148 @@
+"""
+Content-addressed on-disk cache for ticket PDFs.
+
+A ticket is stored under the SHA-256 of (template version, PNR, the booking
+fields the template prints), so a rerun, re-download or re-issue of an
+unchanged booking is served from disk without running FPDF. Bumping
+`utils.TICKET_TEMPLATE_VERSION` changes every key; tickets rendered with the
+old template are never served again and age out through LRU eviction.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import utils
+
+# Defaults (override with env vars of the same name)
+TICKET_CACHE_DIR = ".ticket_cache"
+TICKET_CACHE_MAX_MB = 256
+
+def ticket_key(booking_data, pnr, fare_breakdown, template_version=None):
+    """Hex digest identifying one rendered ticket."""
+    payload = {
+        "template": utils.TICKET_TEMPLATE_VERSION if template_version is None else template_version,
+        "pnr": pnr,
+        "ticket": utils.ticket_payload(booking_data, fare_breakdown),
+    }
+    # default=str covers the datetimes in flight records
+    blob = json.dumps(payload, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(blob.encode()).hexdigest()
+
+class TicketCache:
+    """
+    Size-bounded PDF store, evicting least recently used files. Reads bump a
+    file's mtime, so recency survives restarts; the index is rebuilt from the
+    directory on startup.
+    """
+
+    def __init__(self, directory=None, max_bytes=None):
+        self.directory = directory or os.environ.get("TICKET_CACHE_DIR", TICKET_CACHE_DIR)
+        if max_bytes is None:
+            max_bytes = int(float(os.environ.get("TICKET_CACHE_MAX_MB", TICKET_CACHE_MAX_MB)) * 1024 * 1024)
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._index = {}   # key -> (size, last_used), ordered by insertion; sorted on eviction
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self._scan()
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".pdf")
+
+    def _scan(self):
+        for sub in os.listdir(self.directory):
+            subdir = os.path.join(self.directory, sub)
+            if not os.path.isdir(subdir):
+                continue
+            for name in os.listdir(subdir):
+                if not name.endswith(".pdf"):
+                    continue
+                st = os.stat(os.path.join(subdir, name))
+                self._index[name[:-4]] = (st.st_size, st.st_mtime)
+                self._bytes += st.st_size
+        self._evict()
+
+    def get(self, key):
+        """PDF bytes for `key`, or None on a miss."""
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                if key in self._index:
+                    self._bytes -= self._index.pop(key)[0]
+            return None
+        now = _touch(path)
+        with self._lock:
+            self.hits += 1
+            if key not in self._index:
+                self._bytes += len(data)
+            self._index[key] = (len(data), now)
+        return data
+
+    def put(self, key, data):
+        """Stores a rendered PDF (atomically, so readers never see half a file)."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        except BaseException:
+            os.unlink(tmp)
+            raise
+        now = _touch(path)
+        with self._lock:
+            old = self._index.get(key)
+            self._bytes += len(data) - (old[0] if old else 0)
+            self._index[key] = (len(data), now)
+            self._evict()
+
+    def get_or_render(self, booking_data, pnr, fare_breakdown, render=utils.generate_ticket_pdf):
+        """Cached PDF for the booking, rendering and storing it on a miss."""
+        key = ticket_key(booking_data, pnr, fare_breakdown)
+        data = self.get(key)
+        if data is None:
+            data = render(booking_data, pnr, fare_breakdown)
+            self.put(key, data)
+        return data
+
+    def _evict(self):
+        # Caller holds the lock (or is the constructor)
+        if self._bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda kv: kv[1][1]):
+            if self._bytes <= self.max_bytes:
+                break
+            try:
+                os.unlink(self._path(key))
+            except FileNotFoundError:
+                pass
+            del self._index[key]
+            self._bytes -= size
+            self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                "entries": len(self._index),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+def _touch(path):
+    try:
+        os.utime(path)
+        return os.stat(path).st_mtime
+    except FileNotFoundError:
+        return 0.0
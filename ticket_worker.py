@@ -0,0 +1,172 @@
+"""
+Background ticket rendering.
+
+FPDF layout is CPU-bound, so tickets are rendered in a process pool instead
+of inside the "Pay & Book" click. Callers submit a booking and poll for the
+PDF by PNR; the confirmation and PNR can be shown right away. With a
+TicketCache attached, tickets already on disk skip the pool entirely.
+"""
+import multiprocessing
+import sys
+import threading
+import time
+import types
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import ticket_cache
+import utils
+
+DEFAULT_WORKERS = 2
+MAX_RESULTS = 1000   # rendered PDFs kept in memory for download
+TIMING_WINDOW = 500  # render times kept for the percentile metrics
+
+def _render_ticket(booking_data, pnr, fare_breakdown):
+    """Runs in a worker process. Returns (pdf bytes, render seconds)."""
+    start = time.perf_counter()
+    pdf_bytes = utils.generate_ticket_pdf(booking_data, pnr, fare_breakdown)
+    return pdf_bytes, time.perf_counter() - start
+
+@contextmanager
+def _plain_main_module():
+    """
+    Streamlit executes the app script as __main__, and spawn re-runs __main__
+    in every new worker. Hide it while workers start (they start inside submit()).
+    """
+    main = sys.modules.get('__main__')
+    sys.modules['__main__'] = types.ModuleType('__main__')
+    try:
+        yield
+    finally:
+        sys.modules['__main__'] = main
+
+def _percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+class TicketRenderer:
+    """Renders ticket PDFs on a process pool and keeps the results by PNR."""
+
+    def __init__(self, max_workers=DEFAULT_WORKERS, max_results=MAX_RESULTS, cache=None):
+        self.max_workers = max_workers
+        self.max_results = max_results
+        self.cache = cache
+        self._executor = self._new_executor()
+        self._lock = threading.Lock()
+        self._pending = {}            # pnr -> (future, submitted_at, args, cache key)
+        self._results = OrderedDict() # pnr -> pdf bytes
+        self._errors = {}             # pnr -> exception
+        self._render_times = deque(maxlen=TIMING_WINDOW)
+        self._turnaround_times = deque(maxlen=TIMING_WINDOW)
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._pool_restarts = 0
+
+    def _new_executor(self):
+        # spawn: forking a threaded server process is unsafe
+        return ProcessPoolExecutor(max_workers=self.max_workers,
+                                   mp_context=multiprocessing.get_context("spawn"))
+
+    def submit(self, booking_data, pnr, fare_breakdown):
+        """Queues a ticket for rendering; a PNR already rendered or queued is not resubmitted."""
+        args = (booking_data, pnr, fare_breakdown)
+        with self._lock:
+            if pnr in self._pending or pnr in self._results:
+                return
+        key = None
+        if self.cache is not None:
+            key = ticket_cache.ticket_key(booking_data, pnr, fare_breakdown)
+            pdf_bytes = self.cache.get(key)
+            if pdf_bytes is not None:
+                with self._lock:
+                    self._store(pnr, pdf_bytes)
+                return
+        with self._lock:
+            if pnr in self._pending or pnr in self._results:
+                return
+            self._errors.pop(pnr, None)
+            with _plain_main_module():
+                try:
+                    future = self._executor.submit(_render_ticket, *args)
+                except BrokenProcessPool:
+                    self._executor = self._new_executor()
+                    self._pool_restarts += 1
+                    future = self._executor.submit(_render_ticket, *args)
+            self._pending[pnr] = (future, time.perf_counter(), args, key)
+            self._submitted += 1
+        future.add_done_callback(lambda f, pnr=pnr: self._on_done(pnr, f))
+
+    def _on_done(self, pnr, future):
+        with self._lock:
+            _, submitted_at, args, key = self._pending.pop(pnr)
+        try:
+            pdf_bytes, render_seconds = future.result()
+        except BrokenProcessPool:
+            # A worker died; render in-process rather than leave the customer without a ticket
+            try:
+                pdf_bytes, render_seconds = _render_ticket(*args)
+            except Exception as e:
+                self._record_error(pnr, e)
+                return
+        except Exception as e:
+            self._record_error(pnr, e)
+            return
+
+        if key is not None:
+            try:
+                self.cache.put(key, pdf_bytes)
+            except OSError:
+                pass  # a full or read-only disk only costs a re-render later
+
+        with self._lock:
+            self._store(pnr, pdf_bytes)
+            self._render_times.append(render_seconds)
+            self._turnaround_times.append(time.perf_counter() - submitted_at)
+            self._completed += 1
+
+    def _store(self, pnr, pdf_bytes):
+        # Caller holds the lock
+        self._results[pnr] = pdf_bytes
+        self._results.move_to_end(pnr)
+        while len(self._results) > self.max_results:
+            self._results.popitem(last=False)
+
+    def _record_error(self, pnr, error):
+        with self._lock:
+            self._errors[pnr] = error
+            self._failed += 1
+
+    def result(self, pnr):
+        """PDF bytes if rendered, else None (still pending, or failed - see error())."""
+        with self._lock:
+            return self._results.get(pnr)
+
+    def error(self, pnr):
+        """The exception that made rendering fail, or None."""
+        with self._lock:
+            return self._errors.get(pnr)
+
+    def is_pending(self, pnr):
+        with self._lock:
+            return pnr in self._pending
+
+    def stats(self):
+        with self._lock:
+            return {
+                "queue_depth": len(self._pending),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "pool_restarts": self._pool_restarts,
+                "render_time_p50": _percentile(self._render_times, 50),
+                "render_time_p95": _percentile(self._render_times, 95),
+                "turnaround_p50": _percentile(self._turnaround_times, 50),
+                "turnaround_p95": _percentile(self._turnaround_times, 95),
+            }
+
+    def shutdown(self, wait=True):
+        self._executor.shutdown(wait=wait)
@@ -21,6 +21,21 @@ def get_day_name(date_obj):
     """Returns the day name for a given date."""
     return date_obj.strftime("%A")
 
+# Bump whenever generate_ticket_pdf's layout or content changes: cached tickets are keyed on it
+TICKET_TEMPLATE_VERSION = 2
+
+def ticket_payload(booking_data, fare_breakdown):
+    """The booking fields printed on the ticket (what the ticket cache hashes)."""
+    flight_fields = ('airline', 'flight_number', 'from_city', 'to_city', 'departure_time', 'arrival_time')
+    return {
+        'outbound': {k: getattr(booking_data['selected_outbound'], k) for k in flight_fields},
+        'return': {k: getattr(booking_data['selected_return'], k) for k in flight_fields},
+        'passengers': [[p['first_name'], p['last_name'], p['gender']] for p in booking_data['passenger_details']],
+        'booking_date': booking_data['booking_date'].strftime("%Y-%m-%d"),
+        'fare': {k: fare_breakdown[k] for k in ('base_fare', 'convenience_fee', 'psf', 'fuel_surcharge',
+                                                 'gst', 'addons', 'total')},
+    }
+
 def generate_ticket_pdf(booking_data, pnr, fare_breakdown):
     """Generates a PDF ticket for the booking."""
     class PDF(FPDF):
@@ -47,7 +62,7 @@ def generate_ticket_pdf(booking_data, pnr, fare_breakdown):
     pdf.set_text_color(0, 0, 0)
     pdf.cell(0, 10, f'Booking Confirmation - PNR: {pnr}', 0, 1)
     pdf.set_font('Arial', '', 10)
-    pdf.cell(0, 5, f'Date: {datetime.now().strftime("%Y-%m-%d")}', 0, 1)
+    pdf.cell(0, 5, f'Date: {booking_data["booking_date"].strftime("%Y-%m-%d")}', 0, 1)
     pdf.ln(5)
     
     # Flight Details
@@ -57,14 +72,14 @@ def generate_ticket_pdf(booking_data, pnr, fare_breakdown):
         pdf.cell(0, 8, title, 1, 1, 'L', 1)
         pdf.set_font('Arial', '', 10)
         
-        pdf.cell(40, 8, f"Airline: {flight['airline']}", 0, 0)
-        pdf.cell(40, 8, f"Flight: {flight['flight_number']}", 0, 1)
+        pdf.cell(40, 8, f"Airline: {flight.airline}", 0, 0)
+        pdf.cell(40, 8, f"Flight: {flight.flight_number}", 0, 1)
         
-        pdf.cell(40, 8, f"From: {flight['from_city']}", 0, 0)
-        pdf.cell(40, 8, f"To: {flight['to_city']}", 0, 1)
+        pdf.cell(40, 8, f"From: {flight.from_city}", 0, 0)
+        pdf.cell(40, 8, f"To: {flight.to_city}", 0, 1)
         
-        pdf.cell(40, 8, f"Dep: {flight['departure_time'].strftime('%Y-%m-%d %H:%M')}", 0, 0)
-        pdf.cell(40, 8, f"Arr: {flight['arrival_time'].strftime('%Y-%m-%d %H:%M')}", 0, 1)
+        pdf.cell(40, 8, f"Dep: {flight.departure_time.strftime('%Y-%m-%d %H:%M')}", 0, 0)
+        pdf.cell(40, 8, f"Arr: {flight.arrival_time.strftime('%Y-%m-%d %H:%M')}", 0, 1)
         pdf.ln(5)
 
     add_flight_section("Outbound Flight", booking_data['selected_outbound'])
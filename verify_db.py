@@ -1,6 +1,4 @@
-import os
-import psycopg2
-import streamlit as st
+import migrations
 
 # Load secrets
 try:
@@ -14,7 +12,7 @@ except Exception as e:
 print(f"Connecting to: {db_url.split('@')[1]}") # Print host only for security
 
 try:
-    conn = psycopg2.connect(db_url, sslmode='require')
+    conn = migrations.connect(db_url)
     cur = conn.cursor()
     
     # Check tables
@@ -29,33 +27,15 @@ try:
         print(f"- {t[0]}")
         
     if not tables:
-        print("\nNo tables found! Attempting to create them...")
-        # Copy-paste init logic from db.py
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS bookings (
-                pnr VARCHAR(10) PRIMARY KEY,
-                booking_date TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                outbound_flight_id VARCHAR(50),
-                return_flight_id VARCHAR(50),
-                total_amount DECIMAL(10, 2),
-                contact_email VARCHAR(100),
-                contact_phone VARCHAR(20),
-                status VARCHAR(20)
-            );
-        """)
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS passengers (
-                id SERIAL PRIMARY KEY,
-                pnr VARCHAR(10) REFERENCES bookings(pnr),
-                first_name VARCHAR(50),
-                last_name VARCHAR(50),
-                gender VARCHAR(20),
-                seat_outbound VARCHAR(10),
-                seat_return VARCHAR(10)
-            );
-        """)
-        conn.commit()
-        print("Tables created successfully.")
+        print("\nNo tables found! Applying migrations...")
+    applied = migrations.migrate(conn)
+    if applied:
+        print(f"Applied migrations: {', '.join(str(v) for v in applied)}")
+    # Same as migrations.py: monthly booking partitions for the months ahead
+    created = migrations.ensure_partitions(conn)
+    if created:
+        print(f"Created {created} monthly booking partition(s)")
+    print(f"Schema version: {migrations.current_version(conn)}")
         
     # Check for data
     cur.execute("SELECT count(*) FROM bookings;")
@@ -63,7 +43,7 @@ try:
     print(f"\nTotal Bookings: {count}")
     
     if count > 0:
-        cur.execute("SELECT * FROM bookings LIMIT 5;")
+        cur.execute("SELECT * FROM bookings ORDER BY booking_date DESC LIMIT 5;")
         rows = cur.fetchall()
         print("\nRecent Bookings:")
         for r in rows: